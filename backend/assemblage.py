@@ -0,0 +1,173 @@
+from fastapi.concurrency import run_in_threadpool
+
+from db import connection
+
+# Candidate parcels in the bbox; {table} and {rzlt} are fixed SQL from this codebase, never request input
+CANDIDATES_SQL = """
+SELECT p.ogc_fid, p.area_sqm
+FROM {table} p
+WHERE p.geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+  AND p.area_sqm <= %s
+  {rzlt}
+"""
+
+# Each undirected edge once (a < b) between two candidates
+EDGES_SQL = """
+WITH candidates AS ({candidates})
+SELECT e.a, e.b
+FROM parcel_adjacency e
+JOIN candidates ca ON ca.ogc_fid = e.a
+JOIN candidates cb ON cb.ogc_fid = e.b
+WHERE e.parcel_type = %s AND e.a < e.b AND e.shared_edge_m >= %s
+"""
+
+# Shape metrics for the chosen groups, from the dissolved ITM geometry
+SHAPES_SQL = """
+WITH members AS (
+    SELECT * FROM unnest(%s::int[], %s::int[]) AS m(k, ogc_fid)
+),
+merged AS (
+    SELECT m.k, ST_Union(p.geom_itm) AS geom
+    FROM members m
+    JOIN {table} p ON p.ogc_fid = m.ogc_fid
+    GROUP BY m.k
+)
+SELECT
+    k,
+    ST_Area(geom),
+    ST_Perimeter(geom),
+    4 * PI() * ST_Area(geom) / NULLIF(POWER(ST_Perimeter(geom), 2), 0),
+    ST_NumGeometries(ST_Multi(geom)),
+    ST_X(ST_Transform(ST_Centroid(geom), 4326)),
+    ST_Y(ST_Transform(ST_Centroid(geom), 4326)),
+    ST_AsGeoJSON(ST_Transform(geom, 4326))::json
+FROM merged
+"""
+
+# rzlt_ogc_fid is stored on each parcel by scripts/build_parcel_keys.sh
+RZLT_FILTER = "AND p.rzlt_ogc_fid IS NOT NULL"
+# Until the keys are built, fall back to the spatial probe the key replaces
+RZLT_PROBE = "AND EXISTS (SELECT 1 FROM rzlt r WHERE ST_Intersects(r.geom, p.geom))"
+
+HAS_RZLT_KEY_SQL = """
+SELECT EXISTS (
+    SELECT 1 FROM pg_attribute
+    WHERE attrelid = %s::regclass AND attname = 'rzlt_ogc_fid' AND NOT attisdropped
+)
+"""
+
+
+class UnionFind:
+    """Disjoint sets over parcel ids, with path halving and union by size."""
+
+    def __init__(self, ids):
+        self.parent = {i: i for i in ids}
+        self.size = {i: 1 for i in ids}
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def groups(self) -> dict[int, list[int]]:
+        out: dict[int, list[int]] = {}
+        for i in self.parent:
+            out.setdefault(self.find(i), []).append(i)
+        return out
+
+
+def group_parcels(
+    areas: dict[int, float],
+    edges: list[tuple[int, int]],
+    min_area_sqm: float,
+    min_parcels: int = 2,
+) -> list[dict]:
+    """Connected groups of parcels with at least min_parcels members and min_area_sqm, largest first."""
+    uf = UnionFind(areas)
+    for a, b in edges:
+        uf.union(a, b)
+
+    groups = []
+    for members in uf.groups().values():
+        if len(members) < min_parcels:
+            continue
+        total = sum(areas[i] for i in members)
+        if total >= min_area_sqm:
+            groups.append({"member_ids": sorted(members), "total_area_sqm": total})
+    groups.sort(key=lambda g: g["total_area_sqm"], reverse=True)
+    return groups
+
+
+async def find_assemblages(
+    table: str,
+    parcel_type: str,
+    bbox: tuple[float, float, float, float],
+    min_area_sqm: float,
+    max_parcel_sqm: float,
+    min_shared_edge_m: float,
+    rzlt_only: bool,
+    limit: int,
+) -> tuple[int, list[dict]]:
+    """Contiguous groups of small parcels in a bbox that together reach min_area_sqm.
+
+    Pulls the candidate parcels and the adjacency edges between them in two set-based
+    queries, groups them with union-find in Python, then measures the best `limit`
+    groups in one more query. Returns (number of qualifying groups, measured groups).
+    """
+    candidate_params = [*bbox, max_parcel_sqm]
+
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            rzlt = ""
+            if rzlt_only:
+                await cur.execute(HAS_RZLT_KEY_SQL, (table,))
+                rzlt = RZLT_FILTER if (await cur.fetchone())[0] else RZLT_PROBE
+            candidates_sql = CANDIDATES_SQL.format(table=table, rzlt=rzlt)
+            await cur.execute(candidates_sql, candidate_params)
+            areas = {r[0]: float(r[1] or 0) for r in await cur.fetchall()}
+            await cur.execute(
+                EDGES_SQL.format(candidates=candidates_sql),
+                candidate_params + [parcel_type, min_shared_edge_m],
+            )
+            edges = await cur.fetchall()
+
+    groups = await run_in_threadpool(group_parcels, areas, edges, min_area_sqm)
+    top = groups[:limit]
+    if not top:
+        return len(groups), []
+
+    keys = [k for k, g in enumerate(top) for _ in g["member_ids"]]
+    ids = [i for g in top for i in g["member_ids"]]
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(SHAPES_SQL.format(table=table), (keys, ids))
+            shapes = {r[0]: r[1:] for r in await cur.fetchall()}
+
+    results = []
+    for k, g in enumerate(top):
+        area, perimeter, compactness, parts, lng, lat, geometry = shapes[k]
+        results.append({
+            "parcel_count": len(g["member_ids"]),
+            "member_ids": g["member_ids"],
+            "total_area_sqm": round(g["total_area_sqm"], 1),
+            "total_area_acres": round(g["total_area_sqm"] / 4046.86, 3),
+            "merged_area_sqm": round(area, 1),
+            "perimeter_m": round(perimeter, 1),
+            "compactness": round(compactness, 3) if compactness is not None else None,
+            "parts": parts,
+            "lng": lng,
+            "lat": lat,
+            "geometry": geometry,
+        })
+    return len(groups), results
@@ -1,25 +1,68 @@
 import os
-import psycopg2
-from psycopg2 import pool
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "host=localhost port=5433 dbname=landos user=postgres password=postgres"
 )
 
-_pool: pool.SimpleConnectionPool | None = None
+# Pool sizing: every concurrent request (and every in-flight AI hypothesis query) holds one connection
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+# Seconds a request waits for a free connection before failing with PoolTimeout (-> 503)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Idle connections above min size are closed after this many seconds
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+# Server-side prepare a query after it has run this many times on a connection (tiles, bbox
+# endpoints and enrichment run the same statements constantly)
+DB_PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD", "5"))
+
+_pool: AsyncConnectionPool | None = None
 
 
-def get_pool() -> pool.SimpleConnectionPool:
+def get_pool() -> AsyncConnectionPool:
     global _pool
     if _pool is None:
-        _pool = pool.SimpleConnectionPool(1, 10, DATABASE_URL)
+        _pool = AsyncConnectionPool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT,
+            max_idle=DB_POOL_MAX_IDLE,
+            # Health check on checkout: a connection dropped by Postgres is replaced, not handed out
+            check=AsyncConnectionPool.check_connection,
+            kwargs={"prepare_threshold": DB_PREPARE_THRESHOLD},
+            name="landos",
+            open=False,
+        )
     return _pool
 
 
-def get_conn():
-    return get_pool().getconn()
+async def open_pool():
+    await get_pool().open(wait=True)
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def connection():
+    """Borrow a pooled connection: `async with connection() as conn`.
+
+    The transaction is committed when the block exits normally and rolled back on error.
+    """
+    return get_pool().connection()
+
+
+def pool_stats() -> dict:
+    return get_pool().get_stats()
 
 
-def put_conn(conn):
-    get_pool().putconn(conn)
+def connect() -> psycopg.Connection:
+    """Open a standalone sync connection for CLI scripts that run outside the API's event loop."""
+    return psycopg.connect(DATABASE_URL, autocommit=True, prepare_threshold=DB_PREPARE_THRESHOLD)
@@ -0,0 +1,123 @@
+import json
+import os
+from collections.abc import AsyncIterator, Callable
+
+from psycopg import sql
+
+from db import connection
+
+# Rows pulled from the server-side cursor per round trip; memory stays O(chunk) per export
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+# Per-FETCH timeout for exports of AI-written SQL (layer exports are plain index scans)
+EXPORT_QUERY_TIMEOUT = os.getenv("EXPORT_QUERY_TIMEOUT", "60s")
+
+# format → (media type, file extension, record prefix). GeoJSONSeq is RFC 8142: RS ... LF
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson", ""),
+    "geojsonseq": ("application/geo+json-seq", "geojsons", "\x1e"),
+}
+
+
+def layer_export_sql(layer: dict, area: str | None) -> sql.Composed:
+    """One GeoJSON Feature (as text) per row of a registered layer, optionally clipped to an area.
+
+    `area` is "bbox" (four params: west, south, east, north), "polygon" (one GeoJSON
+    geometry param in EPSG:4326) or None for the whole layer.
+    """
+    if area == "bbox":
+        where = sql.SQL("WHERE t.geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)")
+    elif area == "polygon":
+        where = sql.SQL(
+            "CROSS JOIN (SELECT ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326) AS g) a "
+            "WHERE t.geom && a.g AND ST_Intersects(t.geom, a.g)"
+        )
+    else:
+        where = sql.SQL("")
+
+    return sql.SQL(
+        """
+        SELECT json_build_object(
+            'type', 'Feature',
+            'id', t.{id_column},
+            'geometry', ST_AsGeoJSON(t.geom)::json,
+            'properties', to_jsonb(t) - 'geom' - 'geom_itm'
+        )::text
+        FROM {table} t
+        {where}
+        """
+    ).format(
+        id_column=sql.Identifier(layer["id_column"]),
+        table=sql.Identifier(layer["table_name"]),
+        where=where,
+    )
+
+
+def query_export_sql(query: str) -> sql.Composed:
+    """Each row of a (validated, read-only) AI query as JSON text; see row_to_feature."""
+    return sql.SQL("SELECT row_to_json(q)::text FROM ({}) q").format(sql.SQL(query.strip().rstrip(";")))
+
+
+def row_to_feature(row_json: str) -> str:
+    """Turn an AI result row into a Feature: its `geometry` column, else a point from lng/lat."""
+    props = json.loads(row_json)
+    geometry = props.pop("geometry", None)
+    if geometry is None and props.get("lng") is not None and props.get("lat") is not None:
+        geometry = {"type": "Point", "coordinates": [props["lng"], props["lat"]]}
+    return json.dumps({"type": "Feature", "geometry": geometry, "properties": props}, default=str)
+
+
+async def stream_features(
+    query: sql.Composable,
+    params: list | None,
+    fmt: str,
+    read_only: bool = False,
+    transform: Callable[[str], str] | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield features from a named (server-side) cursor, EXPORT_CHUNK_ROWS at a time.
+
+    The pooled connection is held for the life of the stream and released when the
+    client finishes or disconnects. `params` is None when the query has no placeholders,
+    so a literal % in AI-written SQL is not read as one.
+    """
+    prefix = EXPORT_FORMATS[fmt][2]
+    async with connection() as conn:
+        async with conn.transaction():
+            if read_only:
+                await conn.execute("SET TRANSACTION READ ONLY")
+                await conn.execute(
+                    sql.SQL("SET LOCAL statement_timeout = {}").format(sql.Literal(EXPORT_QUERY_TIMEOUT))
+                )
+            async with conn.cursor(name="export") as cur:
+                await cur.execute(query, params)
+                while True:
+                    rows = await cur.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    lines = (transform(r[0]) if transform else r[0] for r in rows)
+                    yield "".join(f"{prefix}{line}\n" for line in lines).encode()
+
+
+async def open_feature_stream(
+    query: sql.Composable,
+    params: list | None,
+    fmt: str,
+    read_only: bool = False,
+    transform: Callable[[str], str] | None = None,
+) -> AsyncIterator[bytes]:
+    """Start stream_features and pull its first chunk before any response is sent.
+
+    The query is declared and first fetched here, so a SQL error raises to the endpoint
+    (and becomes a 4xx/5xx) instead of cutting off a stream that already answered 200.
+    """
+    stream = stream_features(query, params, fmt, read_only=read_only, transform=transform)
+    try:
+        first = await anext(stream)
+    except StopAsyncIteration:
+        first = b""
+
+    async def resumed() -> AsyncIterator[bytes]:
+        yield first
+        async for chunk in stream:
+            yield chunk
+
+    return resumed()
@@ -0,0 +1,86 @@
+from psycopg import sql
+
+from db import connection
+
+GEOJSON_MEDIA_TYPE = "application/json"
+
+# A property is (name, SQL expression over the source row aliased `t`). Plain strings are
+# trusted SQL fragments written in this codebase, never user input.
+Property = tuple[str, str | sql.Composable]
+
+
+def _expr(expr: str | sql.Composable) -> sql.Composable:
+    return sql.SQL(expr) if isinstance(expr, str) else expr
+
+
+def feature_collection_sql(
+    table: str,
+    properties: list[Property],
+    where: str | None = None,
+    limit: int = 2000,
+    id_column: str = "ogc_fid",
+    keyset: bool = False,
+) -> sql.Composed:
+    """Build a query returning one page of a bbox FeatureCollection as UTF-8 bytes, assembled in PostGIS.
+
+    Takes the bbox as four positional params (west, south, east, north), then with
+    keyset=True the last id of the previous page. Features are ordered by id and every
+    feature carries `id` both as the GeoJSON id and as its first property. `next` is the
+    id to pass back for the following page, or null on the last page.
+    """
+    select_list = [
+        sql.SQL("t.{} AS id").format(sql.Identifier(id_column)),
+        *(sql.SQL("{} AS {}").format(_expr(expr), sql.Identifier(name)) for name, expr in properties),
+        sql.SQL("t.geom"),
+    ]
+    json_props = [sql.SQL("'id', f.id")]
+    for name, _ in properties:
+        json_props.append(sql.SQL("{}, f.{}").format(sql.Literal(name), sql.Identifier(name)))
+
+    return sql.SQL(
+        """
+        SELECT convert_to(json_build_object(
+            'type', 'FeatureCollection',
+            'features', COALESCE(json_agg(json_build_object(
+                'type', 'Feature',
+                'id', f.id,
+                'geometry', ST_AsGeoJSON(f.geom)::json,
+                'properties', json_build_object({json_props})
+            ) ORDER BY f.id), '[]'::json),
+            'next', CASE WHEN COUNT(*) = {limit} THEN MAX(f.id) END
+        )::text, 'UTF8')
+        FROM (
+            SELECT {select_list}
+            FROM {table} t
+            WHERE t.geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+            {where}
+            {keyset}
+            ORDER BY t.{id_column}
+            LIMIT {limit}
+        ) f
+        """
+    ).format(
+        json_props=sql.SQL(", ").join(json_props),
+        select_list=sql.SQL(", ").join(select_list),
+        table=sql.Identifier(table),
+        where=sql.SQL("AND ({})").format(sql.SQL(where)) if where else sql.SQL(""),
+        keyset=sql.SQL("AND t.{} > %s").format(sql.Identifier(id_column)) if keyset else sql.SQL(""),
+        id_column=sql.Identifier(id_column),
+        limit=sql.Literal(limit),
+    )
+
+
+async def query_feature_collection(
+    table: str,
+    properties: list[Property],
+    bbox: tuple[float, float, float, float],
+    after: int | None = None,
+    **kwargs,
+) -> bytes:
+    """Run feature_collection_sql for a bbox page and return the GeoJSON body untouched by Python."""
+    query = feature_collection_sql(table, properties, keyset=after is not None, **kwargs)
+    params = (*bbox, after) if after is not None else tuple(bbox)
+    async with connection() as conn:
+        cur = await conn.execute(query, params)
+        body = (await cur.fetchone())[0]
+    return bytes(body)
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import random
+
+import httpx
+
+# One long-lived client per upstream so TLS sessions and HTTP/2 connections are reused
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "60"))
+GEOCODER_TIMEOUT_S = float(os.getenv("GEOCODER_TIMEOUT_S", "10"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "120"))
+
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF_S = float(os.getenv("HTTP_RETRY_BACKOFF_S", "0.5"))
+HTTP_RETRY_MAX_DELAY_S = 20.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+UPSTREAMS = {
+    "gemini": {"timeout": GEMINI_TIMEOUT_S, "headers": {}},
+    "nominatim": {
+        "timeout": GEOCODER_TIMEOUT_S,
+        "headers": {"User-Agent": "LandOS/1.0 (local development)"},
+    },
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def make_client(timeout: float, headers: dict) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        headers=headers,
+        timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT_S),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+    )
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream (created by open_clients at startup)."""
+    if upstream not in _clients:
+        _clients[upstream] = make_client(**UPSTREAMS[upstream])
+    return _clients[upstream]
+
+
+async def open_clients():
+    for upstream in UPSTREAMS:
+        get_client(upstream)
+
+
+async def close_clients():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def retry_delay(attempt: int, resp: httpx.Response | None = None) -> float:
+    """Honour Retry-After when the upstream sends one, else exponential backoff with jitter."""
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_RETRY_MAX_DELAY_S)
+    delay = HTTP_RETRY_BACKOFF_S * 2 ** attempt
+    return min(delay + random.uniform(0, HTTP_RETRY_BACKOFF_S), HTTP_RETRY_MAX_DELAY_S)
+
+
+async def request_with_retry(upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request on the shared client, retrying 429/5xx and dropped connections.
+
+    Timeouts are not retried: a slow upstream would otherwise multiply the wait.
+    """
+    client = get_client(upstream)
+    for attempt in range(HTTP_MAX_RETRIES):
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.TimeoutException:
+            raise
+        except httpx.TransportError:
+            await asyncio.sleep(retry_delay(attempt))
+            continue
+        if resp.status_code not in RETRY_STATUSES:
+            return resp
+        await asyncio.sleep(retry_delay(attempt, resp))
+    return await client.request(method, url, **kwargs)
@@ -0,0 +1,364 @@
+"""Stream an INSPIRE cadastral parcels GML file into PostGIS.
+
+Run from the backend directory:
+    python ingest_cadastral.py ../CP_IE_TE_CadastralParcelsFreehold.gml
+    python ingest_cadastral.py parcels.gml --table cadastral_leasehold --extent -6.45 53.22 -6.05 53.45
+    python ingest_cadastral.py parcels.gml --restart        # discard a half-finished load
+    python ingest_cadastral.py parcels.gml --no-swap        # leave the indexed table in shadow
+
+The file is read once with iterparse, so memory stays flat however large it is.
+Parcels whose coordinates fall outside the extent are dropped while parsing; the
+rest go in batches to worker processes that COPY them into an UNLOGGED staging
+table (shadow.<table>) and compute geom (EPSG:4326), geom_itm and area_sqm in one
+set-based INSERT. Each batch commits together with its row in ingest_checkpoint,
+so a failed load re-run with the same file, extent and batch size skips every batch
+already loaded. Because the staging table is unlogged, a database crash empties it
+while the checkpoints survive; a resume whose staged row count no longer matches
+its checkpoints therefore starts over instead of swapping in a partial table. When
+all batches are in, the staging table is indexed, analyzed and swapped for the
+live table by swap_shadow_table() (scripts/shadow_tables.sh): readers see the old
+parcels or the new ones, never an empty table. With --no-swap the indexed table
+is left in shadow so the caller can add derived columns (parcel keys, generalized
+copies) before swapping it in with scripts/shadow_tables.sh.
+
+ogc_fid is the parcel's 1-based position in the file, not a sequence value, so the
+ids do not depend on which worker committed first and a re-run of the same file
+gives every parcel the same id.
+"""
+import argparse
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import psycopg
+from psycopg import sql
+
+from db import connect
+
+# Matches DUBLIN_W/S/E/N in scripts/load_data.sh
+DUBLIN_BBOX = (-6.45, 53.22, -6.05, 53.45)
+
+# Schema tables are built in before swap_shadow_table() moves them into public
+SHADOW_SCHEMA = "shadow"
+
+BATCH_SIZE = 5000
+PROGRESS_EVERY_S = 2.0
+
+# INSPIRE cadastral data is ETRS89 (EPSG:4258) unless the geometry says otherwise
+DEFAULT_SRID = 4258
+# Geographic CRSs whose URN/URL srsNames put latitude first in posList
+LAT_LON_SRIDS = {4258, 4326}
+
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+  target TEXT NOT NULL,
+  source TEXT NOT NULL,
+  batch_no INTEGER NOT NULL,
+  parcels INTEGER NOT NULL,
+  loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (target, batch_no)
+)
+"""
+
+STAGING_DDL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS {staging} (
+  ogc_fid INTEGER PRIMARY KEY,
+  gml_id TEXT,
+  nationalcadastralreference TEXT,
+  area_sqm DOUBLE PRECISION,
+  geom geometry(Geometry, 4326),
+  geom_itm geometry(Geometry, 2157) GENERATED ALWAYS AS (ST_Transform(geom, 2157)) STORED
+)
+"""
+
+# Per-session scratch table the raw GML of one batch is COPY'd into
+BATCH_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS ingest_batch (
+  ogc_fid INTEGER,
+  gml_id TEXT,
+  nationalcadastralreference TEXT,
+  srid INTEGER,
+  gml TEXT
+) ON COMMIT DELETE ROWS
+"""
+
+BATCH_INSERT_SQL = """
+INSERT INTO {staging} (ogc_fid, gml_id, nationalcadastralreference, area_sqm, geom)
+SELECT ogc_fid, gml_id, nationalcadastralreference, ST_Area(ST_Transform(g, 2157)), g
+FROM (
+  SELECT ogc_fid, gml_id, nationalcadastralreference,
+         ST_Transform(ST_GeomFromGML(gml, srid), 4326) AS g
+  FROM ingest_batch
+) b
+WHERE ST_Intersects(g, ST_MakeEnvelope(%(west)s, %(south)s, %(east)s, %(north)s, 4326))
+"""
+
+_worker_conn: psycopg.Connection | None = None
+_worker_staging: sql.Identifier | None = None
+
+
+def init_worker(table: str):
+    # One sync connection (and one scratch table) per worker process
+    global _worker_conn, _worker_staging
+    _worker_conn = connect()
+    _worker_conn.execute(BATCH_DDL)
+    _worker_staging = sql.Identifier(SHADOW_SCHEMA, table)
+
+
+def load_batch(task: tuple[str, str, int, tuple, list[tuple]]) -> tuple[int, int]:
+    """COPY one batch into staging and record it in ingest_checkpoint, atomically."""
+    target, source, batch_no, extent, rows = task
+    west, south, east, north = extent
+    with _worker_conn.transaction():
+        with _worker_conn.cursor() as cur:
+            with cur.copy(
+                "COPY ingest_batch (ogc_fid, gml_id, nationalcadastralreference, srid, gml) FROM STDIN"
+            ) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            cur.execute(
+                sql.SQL(BATCH_INSERT_SQL).format(staging=_worker_staging),
+                {"west": west, "south": south, "east": east, "north": north},
+            )
+            loaded = cur.rowcount
+            cur.execute(
+                "INSERT INTO ingest_checkpoint (target, source, batch_no, parcels) VALUES (%s, %s, %s, %s)",
+                (target, source, batch_no, loaded),
+            )
+    return batch_no, loaded
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def srid_of(srs_name: str | None) -> int:
+    # "EPSG:4258", "urn:ogc:def:crs:EPSG::4258", "http://www.opengis.net/def/crs/EPSG/0/4258"
+    if not srs_name:
+        return DEFAULT_SRID
+    digits = srs_name.rstrip("/").replace("::", ":").replace("/", ":").rsplit(":", 1)[-1]
+    return int(digits) if digits.isdigit() else DEFAULT_SRID
+
+
+def lat_lon_order(srs_name: str | None, srid: int) -> bool:
+    # Only the URN/URL forms follow the EPSG axis order; "EPSG:4258" is lon/lat by convention
+    return srid in LAT_LON_SRIDS and (srs_name is None or not srs_name.startswith("EPSG:"))
+
+
+def coordinate_bounds(geometry: ET.Element, lat_first: bool) -> tuple[float, float, float, float] | None:
+    """(min x, min y, max x, max y) of every posList/pos under a GML geometry, in source axis units."""
+    xs: list[float] = []
+    ys: list[float] = []
+    for el in geometry.iter():
+        if local_name(el.tag) in ("posList", "pos") and el.text:
+            values = [float(v) for v in el.text.split()]
+            firsts, seconds = values[0::2], values[1::2]
+            if lat_first:
+                firsts, seconds = seconds, firsts
+            xs.extend(firsts)
+            ys.extend(seconds)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def source_extent(conn: psycopg.Connection, extent: tuple, srid: int) -> tuple[float, float, float, float]:
+    """The EPSG:4326 extent's bounding box in the source CRS, for the parse-time prefilter."""
+    # Segmentize first so the transformed envelope follows the curved edges of the box
+    return conn.execute(
+        """
+        SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+        FROM (SELECT ST_Extent(ST_Transform(ST_Segmentize(ST_MakeEnvelope(%s, %s, %s, %s, 4326), 0.01), %s)) AS e) x
+        """,
+        (*extent, srid),
+    ).fetchone()
+
+
+def parse_parcels(
+    path: str, conn: psycopg.Connection, extent: tuple
+) -> Iterator[tuple[int, tuple[str | None, str | None, int, str]]]:
+    """Yield (parcel index, (gml_id, national ref, srid, geometry GML)) for parcels that may touch the extent.
+
+    The index counts every parcel in the file, clipped or not, so batch boundaries
+    are the same on every run over the same file.
+    """
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    index = -1
+    prefilter: dict[tuple[str | None, int], tuple] = {}
+
+    for event, el in context:
+        if event != "end" or local_name(el.tag) != "CadastralParcel":
+            continue
+        index += 1
+        gml_id = next((v for k, v in el.attrib.items() if local_name(k) == "id"), None)
+        ref = None
+        geometry = None
+        for child in el:
+            name = local_name(child.tag)
+            if name == "nationalCadastralReference":
+                ref = (child.text or "").strip() or None
+            elif name == "geometry" and len(child):
+                geometry = child[0]
+
+        if geometry is not None:
+            srs_name = geometry.get("srsName")
+            srid = srid_of(srs_name)
+            key = (srs_name, srid)
+            if key not in prefilter:
+                prefilter[key] = (source_extent(conn, extent, srid), lat_lon_order(srs_name, srid))
+            (min_x, min_y, max_x, max_y), lat_first = prefilter[key]
+            bounds = coordinate_bounds(geometry, lat_first)
+            if bounds and bounds[0] <= max_x and bounds[2] >= min_x and bounds[1] <= max_y and bounds[3] >= min_y:
+                yield index, (gml_id, ref, srid, ET.tostring(geometry, encoding="unicode"))
+
+        # Drop the finished parcel (and its featureMember) so memory stays flat
+        el.clear()
+        root.clear()
+
+
+def source_key(path: str, extent: tuple, batch_size: int) -> str:
+    """Identifies one version of the input file and how it is batched.
+
+    Batch numbers only mean the same records for the same file, extent and batch
+    size; checkpoints written under any other combination are discarded.
+    """
+    st = os.stat(path)
+    bbox = ",".join(f"{v:g}" for v in extent)
+    return f"{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}:{bbox}:{batch_size}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream a cadastral parcels GML file into PostGIS.")
+    parser.add_argument("gml", help="INSPIRE CadastralParcels GML file")
+    parser.add_argument("--table", default="cadastral_freehold", help="table to replace (default: %(default)s)")
+    parser.add_argument("--extent", type=float, nargs=4, default=DUBLIN_BBOX, metavar=("W", "S", "E", "N"))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--restart", action="store_true", help="discard checkpoints and staged rows first")
+    parser.add_argument("--no-swap", action="store_true", help="index the staged table but leave it in shadow")
+    return parser.parse_args()
+
+
+def staged_rows_lost(conn: psycopg.Connection, table: str) -> bool:
+    """True when checkpointed parcels are missing from staging (a crash truncates UNLOGGED tables)."""
+    checkpointed = conn.execute(
+        "SELECT COALESCE(SUM(parcels), 0) FROM ingest_checkpoint WHERE target = %s", (table,)
+    ).fetchone()[0]
+    if not checkpointed:
+        return False
+    if conn.execute("SELECT to_regclass(%s)", (f"{SHADOW_SCHEMA}.{table}",)).fetchone()[0] is None:
+        return True
+    staged = conn.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(SHADOW_SCHEMA, table))).fetchone()[0]
+    return staged != checkpointed
+
+
+def prepare(conn: psycopg.Connection, table: str, source: str, restart: bool) -> set[int]:
+    """Create staging/checkpoint tables; return the batch numbers an earlier run already loaded."""
+    staging = sql.Identifier(SHADOW_SCHEMA, table)
+    conn.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(SHADOW_SCHEMA)))
+    conn.execute(CHECKPOINT_DDL)
+    stale = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM ingest_checkpoint WHERE target = %s AND source <> %s)", (table, source)
+    ).fetchone()[0]
+    lost = not stale and staged_rows_lost(conn, table)
+    if restart or stale or lost:
+        if stale and not restart:
+            print(f"==> {table}: checkpoints are for a different input file, extent or batch size, starting over")
+        if lost and not restart:
+            print(f"==> {table}: staged rows do not match the checkpoints (database restarted?), starting over")
+        conn.execute("DELETE FROM ingest_checkpoint WHERE target = %s", (table,))
+        conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging))
+    conn.execute(sql.SQL(STAGING_DDL).format(staging=staging))
+
+    done = {r[0] for r in conn.execute("SELECT batch_no FROM ingest_checkpoint WHERE target = %s", (table,))}
+    if done:
+        print(f"==> Resuming {table}: {len(done)} batches already staged")
+    return done
+
+
+def finish_staging(conn: psycopg.Connection, table: str):
+    """Make the staging table durable, then index and analyze it."""
+    s = sql.Identifier(SHADOW_SCHEMA, table)
+    print(f"==> Indexing {SHADOW_SCHEMA}.{table}...")
+    conn.execute(sql.SQL("ALTER TABLE {} SET LOGGED").format(s))
+    # Same index names the loaders and add_itm_geometry.sh use; they move into public with the table
+    conn.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING GIST (geom)").format(
+        sql.Identifier(f"idx_{table}_geom"), s))
+    conn.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING GIST (geom_itm)").format(
+        sql.Identifier(f"idx_{table}_geom_itm"), s))
+    conn.execute(sql.SQL("ANALYZE {}").format(s))
+
+
+def swap_in(conn: psycopg.Connection, table: str):
+    """Replace the live table with the staging table in one transaction."""
+    print(f"==> Swapping {SHADOW_SCHEMA}.{table} in as {table}...")
+    with conn.transaction():
+        conn.execute("SELECT swap_shadow_table(%s)", (table,))
+        conn.execute("DELETE FROM ingest_checkpoint WHERE target = %s", (table,))
+
+
+def main():
+    args = parse_args()
+    table = args.table
+    extent = tuple(args.extent)
+    source = source_key(args.gml, extent, args.batch_size)
+
+    conn = connect()
+    done = prepare(conn, table, source, args.restart)
+
+    started = time.monotonic()
+    last_report = 0.0
+    parsed = staged = loaded = 0
+
+    def batches() -> Iterator[tuple[int, list[tuple]]]:
+        # Batch n holds parcels n*batch_size .. (n+1)*batch_size-1 of the file that fall in the extent
+        nonlocal parsed
+        batch_no, rows = None, []
+        for index, row in parse_parcels(args.gml, conn, extent):
+            parsed = index + 1
+            no = index // args.batch_size
+            if rows and no != batch_no:
+                yield batch_no, rows
+                rows = []
+            batch_no = no
+            if no not in done:
+                # ogc_fid: the parcel's position in the file, the same on every run
+                rows.append((index + 1, *row))
+        if rows:
+            yield batch_no, rows
+
+    # Bounded in-flight queue: the parser never runs more than two batches per worker ahead
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(table,)) as pool:
+        pending = set()
+        for batch_no, rows in batches():
+            pending.add(pool.submit(load_batch, (table, source, batch_no, extent, rows)))
+            staged += len(rows)
+            if len(pending) >= args.workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                loaded += sum(f.result()[1] for f in finished)
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_EVERY_S:
+                last_report = now
+                rate = parsed / max(now - started, 1e-6)
+                print(f"    {parsed:,} parsed, {staged:,} in extent, {loaded:,} loaded ({rate:,.0f} parcels/s)")
+        for f in wait(pending).done:
+            loaded += f.result()[1]
+
+    print(f"==> Staged {loaded:,} parcels this run from {parsed:,} in the file")
+    finish_staging(conn, table)
+    if args.no_swap:
+        # Checkpoints stay until swap_shadow_table(), so a failure before it resumes without re-parsing
+        schema = SHADOW_SCHEMA
+    else:
+        swap_in(conn, table)
+        schema = "public"
+    count = conn.execute(sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(schema, table))).fetchone()[0]
+    print(f"==> {schema}.{table}: {count:,} parcels ({time.monotonic() - started:.0f}s)")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Merge a freshly loaded planning register into its live table, touching only what changed.
+
+Run by scripts/refresh_planning.sh after it loads the source file into shadow.<table>:
+    python ingest_planning.py --table dlr_planning_polygons --key plan_ref
+    python ingest_planning.py --table sd_planning_register --key regref
+
+Every record is hashed (its key, attributes and geometry) on both sides. Live rows
+whose hash is gone are deleted and incoming rows with a new hash are inserted, in one
+transaction, so unchanged applications keep their ogc_fid and are never rewritten.
+Each new/changed/withdrawn reference is logged in planning_changes. Only the vector
+tiles and precomputed aggregates (parcel_context, side_site_scores) overlapping a
+change are invalidated; the layer's data_version is left alone so the rest of its
+cached and archived tiles stay valid. layers.change_version is bumped instead, which
+retires cached AI results that read the table.
+
+Exits with SCHEMA_CHANGED_EXIT when the live table is missing or its columns differ
+from the incoming ones; the caller then swaps the whole table in.
+"""
+import argparse
+import os
+
+import psycopg
+from psycopg import sql
+
+from db import connect
+from layers import read_registry
+from tile_archive import TILE_ARCHIVE_PATH, open_archive, read_coverage, tms_row
+from tile_cache import get_tile_cache
+from tiles import MVT_BUFFER, MVT_EXTENT, lonlat_to_tile, tile_bytes, tile_query, tiles_in_bbox
+
+SHADOW_SCHEMA = "shadow"
+SCHEMA_CHANGED_EXIT = 3
+
+# Highest zoom the frontend requests tiles for (TILE_MAX_ZOOM in frontend/app.js)
+TILE_MAX_ZOOM = 17
+
+# Planning tables read by the precomputed aggregates, and how far a change reaches:
+# parcel_context.nearby_planning looks 500m out; side_site_scores.has_planning is an
+# overlap test, padded so parcels centred just outside a changed polygon are rescored
+AGGREGATE_INPUTS = {"dlr_planning_polygons"}
+CONTEXT_RADIUS_M = 500
+SIDE_SITE_PAD_M = 50
+
+CHANGES_DDL = """
+CREATE TABLE IF NOT EXISTS planning_changes (
+  id BIGSERIAL PRIMARY KEY,
+  table_name TEXT NOT NULL,
+  ref TEXT,
+  change TEXT NOT NULL,  -- insert | update | delete
+  old_geom geometry(Geometry, 4326),
+  new_geom geometry(Geometry, 4326),
+  changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_planning_changes_table ON planning_changes (table_name, changed_at DESC);
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS change_version INTEGER NOT NULL DEFAULT 0;
+-- Same table as scripts/shadow_tables.sh bump
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 1,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Retires cached AI results over a derived table rewritten in place
+BUMP_TABLE_VERSION_SQL = """
+INSERT INTO table_versions (table_name) VALUES (%s)
+ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1, updated_at = now()
+"""
+
+COLUMNS_SQL = """
+SELECT column_name FROM information_schema.columns
+WHERE table_schema = %s AND table_name = %s
+  AND is_generated = 'NEVER' AND column_name NOT IN ('ogc_fid', 'geom')
+ORDER BY column_name
+"""
+
+HASHES_SQL = """
+CREATE TEMP TABLE {name} ON COMMIT DROP AS
+SELECT t.ogc_fid, t.{key}::text AS ref,
+       md5(ROW({columns})::text || encode(ST_AsBinary(t.geom), 'hex')) AS h
+FROM {table} t
+"""
+
+# Rows on one side whose (ref, hash) has no match on the other
+DIFF_SQL = """
+CREATE TEMP TABLE {name} ON COMMIT DROP AS
+SELECT a.ogc_fid, a.ref FROM {side} a
+WHERE NOT EXISTS (SELECT 1 FROM {other} b WHERE b.h = a.h AND b.ref IS NOT DISTINCT FROM a.ref)
+"""
+
+LOG_SQL = """
+INSERT INTO planning_changes (table_name, ref, change, old_geom, new_geom)
+SELECT %(table)s, COALESCE(r.ref, a.ref),
+       CASE WHEN r.ref IS NULL THEN 'insert' WHEN a.ref IS NULL THEN 'delete' ELSE 'update' END,
+       r.geom, a.geom
+FROM (
+  SELECT d.ref, ST_Collect(t.geom) AS geom FROM removed d JOIN {live} t USING (ogc_fid) GROUP BY d.ref
+) r
+FULL JOIN (
+  SELECT d.ref, ST_Collect(t.geom) AS geom FROM added d JOIN {incoming} t USING (ogc_fid) GROUP BY d.ref
+) a ON COALESCE(a.ref, '') = COALESCE(r.ref, '')
+RETURNING id, change
+"""
+
+CHANGE_BOUNDS_SQL = """
+SELECT ST_XMin(b), ST_YMin(b), ST_XMax(b), ST_YMax(b)
+FROM (SELECT Box2D(ST_Collect(ARRAY[old_geom, new_geom])) AS b FROM planning_changes WHERE id = ANY(%s)) x
+WHERE b IS NOT NULL
+"""
+
+# {refresh} runs once per connected patch around the changes, so each call stays an index lookup
+REFRESH_AROUND_CHANGES_SQL = """
+SELECT COALESCE(SUM({refresh}), 0)
+FROM ST_Dump((
+  SELECT ST_Union(ST_Buffer(ST_Transform(ST_Envelope(ST_Collect(ARRAY[old_geom, new_geom])), 2157), %(pad)s))
+  FROM planning_changes WHERE id = ANY(%(ids)s)
+)) d,
+LATERAL (SELECT ST_Transform(d.geom, 4326) AS area) a
+"""
+
+
+def table_columns(conn: psycopg.Connection, schema: str, table: str) -> list[str]:
+    return [r[0] for r in conn.execute(COLUMNS_SQL, (schema, table))]
+
+
+def merge(conn: psycopg.Connection, table: str, key: str, columns: list[str]) -> list[tuple[int, str]]:
+    """Apply the incoming rows' differences to the live table; return the logged (id, change) rows."""
+    live, incoming = sql.Identifier(table), sql.Identifier(SHADOW_SCHEMA, table)
+    hashed = sql.SQL(", ").join(sql.Identifier("t", c) for c in columns)
+    plain = sql.SQL(", ").join(map(sql.Identifier, columns))
+
+    for name, source in (("live_hashes", live), ("incoming_hashes", incoming)):
+        conn.execute(sql.SQL(HASHES_SQL).format(
+            name=sql.Identifier(name), key=sql.Identifier(key), columns=hashed, table=source))
+    conn.execute(sql.SQL(DIFF_SQL).format(
+        name=sql.Identifier("removed"), side=sql.Identifier("live_hashes"), other=sql.Identifier("incoming_hashes")))
+    conn.execute(sql.SQL(DIFF_SQL).format(
+        name=sql.Identifier("added"), side=sql.Identifier("incoming_hashes"), other=sql.Identifier("live_hashes")))
+
+    changes = conn.execute(sql.SQL(LOG_SQL).format(live=live, incoming=incoming), {"table": table}).fetchall()
+    if not changes:
+        return []
+    conn.execute(sql.SQL("DELETE FROM {} WHERE ogc_fid IN (SELECT ogc_fid FROM removed)").format(live))
+    conn.execute(sql.SQL(
+        "INSERT INTO {live} ({columns}, geom) SELECT {columns}, geom FROM {incoming} "
+        "WHERE ogc_fid IN (SELECT ogc_fid FROM added)"
+    ).format(live=live, incoming=incoming, columns=plain))
+    conn.execute("UPDATE layers SET change_version = change_version + 1 WHERE table_name = %s", (table,))
+    return changes
+
+
+def affected_tiles(bounds: list[tuple], min_zoom: int) -> set[tuple[int, int, int]]:
+    """Every (z, x, y) from min_zoom to TILE_MAX_ZOOM whose buffered extent touches a change."""
+    tiles = set()
+    for z in range(min_zoom, TILE_MAX_ZOOM + 1):
+        # The tile buffer in degrees of longitude; wider than the latitude buffer this far north
+        pad = 360.0 / 2 ** z * MVT_BUFFER / MVT_EXTENT
+        for west, south, east, north in bounds:
+            tiles.update(tiles_in_bbox(west - pad, south - pad, east + pad, north + pad, z))
+    return tiles
+
+
+def refresh_archive(conn: psycopg.Connection, layer: dict, tiles: set[tuple[int, int, int]]) -> int:
+    """Re-render archived tiles of the layer that a change touched; returns how many."""
+    if not os.path.exists(TILE_ARCHIVE_PATH):
+        return 0
+    db = open_archive(TILE_ARCHIVE_PATH)
+    cov = read_coverage(db).get(layer["name"])
+    rendered = 0
+    if cov and cov["version"] == layer["data_version"]:
+        west, south, east, north = cov["bbox"]
+        for z, x, y in sorted(tiles):
+            x0, y0 = lonlat_to_tile(west, north, z)
+            x1, y1 = lonlat_to_tile(east, south, z)
+            if not (cov["minzoom"] <= z <= cov["maxzoom"] and x0 <= x <= x1 and y0 <= y <= y1):
+                continue
+            query = tile_query(layer, z, x, y)
+            data = tile_bytes(conn.execute(*query).fetchone()) if query else b""
+            if data:
+                db.execute(
+                    "INSERT OR REPLACE INTO tiles (layer, zoom_level, tile_column, tile_row, tile_data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (layer["name"], z, x, tms_row(z, y), data),
+                )
+            else:
+                # No row inside the coverage means "known empty"
+                db.execute(
+                    "DELETE FROM tiles WHERE layer = ? AND zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                    (layer["name"], z, x, tms_row(z, y)),
+                )
+            rendered += 1
+        db.commit()
+    db.close()
+    return rendered
+
+
+def invalidate_tiles(conn: psycopg.Connection, table: str, change_ids: list[int]):
+    bounds = conn.execute(CHANGE_BOUNDS_SQL, (change_ids,)).fetchall()
+    cache = get_tile_cache()
+    for layer in read_registry(conn).values():
+        if layer["table_name"] != table:
+            continue
+        tiles = affected_tiles(bounds, layer["min_zoom"])
+        if cache:
+            cache.invalidate(layer["name"], sorted(tiles))
+        rendered = refresh_archive(conn, layer, tiles)
+        print(f"    {layer['name']}: {len(tiles)} cached tiles invalidated, {rendered} archived tiles re-rendered")
+
+
+def refresh_aggregates(conn: psycopg.Connection, change_ids: list[int]):
+    """Recompute parcel context and side-site scores around the changes only."""
+    if conn.execute("SELECT to_regproc('refresh_parcel_context') IS NOT NULL").fetchone()[0]:
+        for p_type in ("freehold", "leasehold"):
+            n = conn.execute(
+                sql.SQL(REFRESH_AROUND_CHANGES_SQL).format(refresh=sql.SQL("refresh_parcel_context(%(type)s, a.area)")),
+                {"type": p_type, "pad": CONTEXT_RADIUS_M, "ids": change_ids},
+            ).fetchone()[0]
+            print(f"    parcel_context ({p_type}): {n} parcels refreshed")
+        conn.execute(BUMP_TABLE_VERSION_SQL, ("parcel_context",))
+    if conn.execute(
+        "SELECT to_regproc('refresh_side_site_scores') IS NOT NULL AND to_regclass('public.side_site_scores') IS NOT NULL"
+    ).fetchone()[0]:
+        n = conn.execute(
+            sql.SQL(REFRESH_AROUND_CHANGES_SQL).format(refresh=sql.SQL("refresh_side_site_scores(a.area)")),
+            {"pad": SIDE_SITE_PAD_M, "ids": change_ids},
+        ).fetchone()[0]
+        print(f"    side_site_scores: {n} candidates rescored")
+        conn.execute(BUMP_TABLE_VERSION_SQL, ("side_site_scores",))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge shadow.<table> into a live planning table.")
+    parser.add_argument("--table", required=True, help="planning table, e.g. dlr_planning_polygons")
+    parser.add_argument("--key", required=True, help="application reference column (plan_ref, regref)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect()
+    conn.execute(CHANGES_DDL)
+
+    columns = table_columns(conn, SHADOW_SCHEMA, args.table)
+    if not columns or args.key not in columns:
+        raise SystemExit(f"{SHADOW_SCHEMA}.{args.table} has not been loaded with a {args.key} column")
+    if table_columns(conn, "public", args.table) != columns:
+        print(f"==> {args.table}: live table missing or its columns changed, falling back to a full swap")
+        raise SystemExit(SCHEMA_CHANGED_EXIT)
+
+    with conn.transaction():
+        changes = merge(conn, args.table, args.key, columns)
+    counts = {kind: sum(1 for _, c in changes if c == kind) for kind in ("insert", "update", "delete")}
+    print(f"==> {args.table}: {counts['insert']} new, {counts['update']} changed, {counts['delete']} withdrawn")
+
+    if changes:
+        change_ids = [c[0] for c in changes]
+        invalidate_tiles(conn, args.table, change_ids)
+        if args.table in AGGREGATE_INPUTS:
+            refresh_aggregates(conn, change_ids)
+        conn.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(args.table)))
+    conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(SHADOW_SCHEMA, args.table)))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
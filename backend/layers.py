@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import psycopg
+
+from db import connection
+
+# How long the in-process copy of the `layers` table is trusted before re-reading it.
+REGISTRY_TTL_S = 30
+
+_registry: dict[str, dict] = {}
+_loaded_at = 0.0
+_lock = asyncio.Lock()
+
+# Versions of precomputed tables outside the registry (parcel_context, ...), bumped by their build scripts
+_table_versions: dict[str, int] = {}
+_versions_loaded_at = 0.0
+
+REGISTRY_SQL = """
+SELECT
+    l.name,
+    l.table_name,
+    l.min_zoom,
+    COALESCE(l.id_column, 'ogc_fid'),
+    COALESCE(l.tile_columns, ARRAY[]::text[]),
+    COALESCE(l.data_version, 1),
+    COALESCE(l.change_version, 0),
+    -- Only generalized copies that actually exist (see scripts/build_generalized.sh)
+    ARRAY(
+        SELECT gz FROM unnest(COALESCE(l.generalized_zooms, ARRAY[]::int[])) gz
+        WHERE to_regclass('public.' || l.table_name || '_z' || gz) IS NOT NULL
+        ORDER BY gz
+    ),
+    json_object_agg(c.column_name, c.data_type)
+FROM layers l
+JOIN information_schema.columns c
+  ON c.table_schema = 'public' AND c.table_name = l.table_name
+GROUP BY l.id, l.name, l.table_name, l.min_zoom, l.id_column, l.tile_columns, l.data_version,
+         l.change_version, l.generalized_zooms
+ORDER BY l.id
+"""
+
+
+def registry_from_rows(rows: list[tuple]) -> dict[str, dict]:
+    registry = {}
+    for (name, table_name, min_zoom, id_column, tile_columns, data_version, change_version,
+         generalized_zooms, column_types) in rows:
+        if "geom" not in column_types or id_column not in column_types:
+            continue
+        registry[name] = {
+            "name": name,
+            "table_name": table_name,
+            "min_zoom": min_zoom or 0,
+            "id_column": id_column,
+            # Unknown columns are dropped so a stale list never breaks tile rendering
+            "tile_columns": [c for c in tile_columns if c in column_types and c != "geom"],
+            "column_types": column_types,
+            # Bumped by loader scripts on every reload; keys all derived caches
+            "data_version": data_version,
+            # Bumped by incremental merges (ingest_planning.py), which invalidate tiles themselves
+            "change_version": change_version,
+            # Zoom levels with a simplified <table>_z<zoom> copy, ascending
+            "generalized_zooms": generalized_zooms,
+        }
+    return registry
+
+
+async def load_registry() -> dict[str, dict]:
+    """Read every registered layer whose table exists, with its column types."""
+    async with connection() as conn:
+        cur = await conn.execute(REGISTRY_SQL)
+        return registry_from_rows(await cur.fetchall())
+
+
+def read_registry(conn: psycopg.Connection) -> dict[str, dict]:
+    """Sync variant of load_registry for CLI scripts (see db.connect)."""
+    return registry_from_rows(conn.execute(REGISTRY_SQL).fetchall())
+
+
+async def get_registry() -> dict[str, dict]:
+    """Return the cached layer registry, re-reading the `layers` table every REGISTRY_TTL_S."""
+    global _registry, _loaded_at
+    async with _lock:
+        if time.monotonic() - _loaded_at > REGISTRY_TTL_S:
+            _registry = await load_registry()
+            _loaded_at = time.monotonic()
+        return _registry
+
+
+async def load_table_versions() -> dict[str, int]:
+    async with connection() as conn:
+        cur = await conn.execute("SELECT to_regclass('public.table_versions') IS NOT NULL")
+        if not (await cur.fetchone())[0]:
+            return {}
+        cur = await conn.execute("SELECT table_name, version FROM table_versions")
+        return dict(await cur.fetchall())
+
+
+async def get_table_versions() -> dict[str, int]:
+    """Return the cached `table_versions` rows, re-read every REGISTRY_TTL_S like the registry."""
+    global _table_versions, _versions_loaded_at
+    async with _lock:
+        if time.monotonic() - _versions_loaded_at > REGISTRY_TTL_S:
+            _table_versions = await load_table_versions()
+            _versions_loaded_at = time.monotonic()
+        return _table_versions
+
+
+async def get_layer(name: str) -> dict | None:
+    return (await get_registry()).get(name)
+
+
+def table_for_zoom(layer: dict, zoom: float | None) -> str:
+    """Return the coarsest table whose detail is sufficient at `zoom` (full table if None)."""
+    if zoom is not None:
+        for gz in layer["generalized_zooms"]:
+            if zoom <= gz:
+                return f"{layer['table_name']}_z{gz}"
+    return layer["table_name"]
+
+
+async def source_table(name: str, zoom: float | None) -> str:
+    """Table to read layer `name` from at `zoom`; unregistered layers read their own table."""
+    layer = await get_layer(name)
+    return table_for_zoom(layer, zoom) if layer else name
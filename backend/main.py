@@ -1,17 +1,31 @@
+import asyncio
 import json
 import os
 import re
-from contextlib import asynccontextmanager
+from collections.abc import Callable
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
 
-import httpx
+import psycopg
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from psycopg_pool import PoolTimeout
 from pydantic import BaseModel
 
-from db import get_conn, put_conn
+from assemblage import find_assemblages
+from db import close_pool, connection, open_pool, pool_stats
+from export import EXPORT_FORMATS, layer_export_sql, open_feature_stream, query_export_sql, row_to_feature
+from geojson_sql import GEOJSON_MEDIA_TYPE, query_feature_collection
+from http_client import close_clients, open_clients, request_with_retry
+from layers import get_layer, get_registry, get_table_versions, source_table
+from response_cache import cache_key, get_llm_cache, get_sql_cache
+from scoring import PROFILES, get_feature_matrix, parse_weights, rank
+from tile_archive import get_tile_archive
+from tile_cache import get_tile_cache, tile_etag
+from tiles import TILE_CACHE_CONTROL, TILE_MEDIA_TYPE, render_tile, tile_in_range
 
 # Load .env from backend directory
 load_dotenv(Path(__file__).parent / ".env")
@@ -25,10 +39,12 @@ GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_M
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Warm the connection pool on startup
-    conn = get_conn()
-    put_conn(conn)
+    # Open the connection pool (min_size connections) and the shared HTTP clients on startup
+    await open_pool()
+    await open_clients()
     yield
+    await close_clients()
+    await close_pool()
 
 
 app = FastAPI(title="LandOS API", lifespan=lifespan)
@@ -38,9 +54,16 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc: PoolTimeout):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT seconds
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry shortly"})
+
+
 PARCEL_TABLES = {
     "freehold": "cadastral_freehold",
     "leasehold": "cadastral_leasehold",
@@ -54,274 +77,195 @@ def parse_bbox(bbox: str):
     return parts
 
 
-def query_parcels_bbox(table: str, parcel_type: str, west, south, east, north):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                f"""
-                SELECT
-                    ogc_fid AS id,
-                    nationalcadastralreference,
-                    gml_id,
-                    area_sqm,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM {table}
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 2000
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
+PARCEL_PROPERTIES = [
+    ("national_ref", "nationalcadastralreference"),
+    ("inspire_id", "gml_id"),
+    ("area_sqm", "round(area_sqm::numeric, 1)"),
+    ("area_acres", "round(area_sqm::numeric / 4046.86, 3)"),
+]
 
-    features = []
-    for row in rows:
-        parcel_id, national_ref, inspire_id, area_sqm, geometry = row
-        area_sqm_val = round(area_sqm, 1) if area_sqm is not None else None
-        area_acres = round(area_sqm / 4046.86, 3) if area_sqm is not None else None
-        features.append(
-            {
-                "type": "Feature",
-                "id": parcel_id,
-                "geometry": geometry,
-                "properties": {
-                    "id": parcel_id,
-                    "national_ref": national_ref,
-                    "inspire_id": inspire_id,
-                    "area_sqm": area_sqm_val,
-                    "area_acres": area_acres,
-                    "type": parcel_type,
-                },
-            }
-        )
-    return features
+
+async def query_parcels_bbox(table: str, parcel_type: str, west, south, east, north, after=None) -> bytes:
+    # parcel_type is always a PARCEL_TABLES key, never request input
+    properties = [*PARCEL_PROPERTIES, ("type", f"'{parcel_type}'::text")]
+    return await query_feature_collection(table, properties, (west, south, east, north), after=after)
 
 
 @app.get("/api/parcels")
-def get_parcels(bbox: str = Query(..., description="west,south,east,north")):
+async def get_parcels(
+    bbox: str = Query(..., description="west,south,east,north"),
+    zoom: float | None = Query(None, description="map zoom; selects simplified geometry"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return freehold parcels within the bounding box as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-    features = query_parcels_bbox("cadastral_freehold", "freehold", west, south, east, north)
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_parcels_bbox(await source_table("cadastral_freehold", zoom), "freehold", west, south, east, north, after)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
 
 
 @app.get("/api/parcels_leasehold")
-def get_parcels_leasehold(bbox: str = Query(..., description="west,south,east,north")):
+async def get_parcels_leasehold(
+    bbox: str = Query(..., description="west,south,east,north"),
+    zoom: float | None = Query(None, description="map zoom; selects simplified geometry"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return leasehold parcels within the bounding box as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-    features = query_parcels_bbox("cadastral_leasehold", "leasehold", west, south, east, north)
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_parcels_bbox(await source_table("cadastral_leasehold", zoom), "leasehold", west, south, east, north, after)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
+
+
+# ── Vector tiles (MVT) ───────────────────────────────────────────────────────
+
+@app.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+async def get_tile(layer: str, z: int, x: int, y: int, if_none_match: str | None = Header(None)):
+    """Return a Mapbox Vector Tile for any layer registered in the `layers` table.
+
+    Feature properties are the layer's `tile_columns`; the feature id is its `id_column`.
+    Lookup order: the pre-seeded archive (seed_tiles.py), the on-disk tile cache, then PostGIS.
+    Archived and cached tiles are only used if they match the layer's current data_version.
+    """
+    entry = await get_layer(layer)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tile layer: {layer}")
+    if not tile_in_range(z, x, y):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+
+    version = entry["data_version"]
+    archive = get_tile_archive()
+    # Archive and cache reads are blocking SQLite calls: keep them off the event loop
+    archived = await run_in_threadpool(archive.get, layer, version, z, x, y) if archive else None
+    cache = get_tile_cache()
+    cached = await run_in_threadpool(cache.get, layer, version, z, x, y) if cache and archived is None else None
+    if archived is not None:
+        tile, etag = archived, tile_etag(version, archived)
+    elif cached:
+        tile, etag = cached
+    else:
+        tile = await render_tile(entry, z, x, y)
+        if cache:
+            # SQLite write + possible LRU eviction: keep it off the event loop
+            etag = await run_in_threadpool(cache.put, layer, version, z, x, y, tile)
+        else:
+            etag = tile_etag(version, tile)
+
+    headers = {"Cache-Control": TILE_CACHE_CONTROL, "ETag": etag}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile, media_type=TILE_MEDIA_TYPE, headers=headers)
+
+
+@app.get("/api/tiles/cache")
+async def get_tile_cache_stats():
+    """Return tile cache size and occupancy."""
+    cache = get_tile_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await run_in_threadpool(cache.stats))}
+
+
+RZLT_PROPERTIES = [
+    ("zone_desc", "zone_desc"),
+    ("zone_gzt", "zone_gzt"),
+    ("gzt_desc", "gzt_desc"),
+    ("site_area", "site_area"),
+    ("local_authority", "local_authority_name"),
+]
 
 
 @app.get("/api/rzlt")
-def get_rzlt(bbox: str = Query(..., description="west,south,east,north")):
+async def get_rzlt(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return RZLT (Residential Zoned Land Tax) sites within the bounding box as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    ogc_fid AS id,
-                    zone_desc,
-                    zone_gzt,
-                    gzt_desc,
-                    site_area,
-                    local_authority_name,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM rzlt
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 2000
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        parcel_id, zone_desc, zone_gzt, gzt_desc, site_area, local_auth, geometry = row
-        features.append(
-            {
-                "type": "Feature",
-                "id": parcel_id,
-                "geometry": geometry,
-                "properties": {
-                    "id": parcel_id,
-                    "zone_desc": zone_desc,
-                    "zone_gzt": zone_gzt,
-                    "gzt_desc": gzt_desc,
-                    "site_area": site_area,
-                    "local_authority": local_auth,
-                },
-            }
-        )
-
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_feature_collection("rzlt", RZLT_PROPERTIES, (west, south, east, north), after=after)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
+
+
+CENSUS_SA_PROPERTIES = [
+    ("sa_code", "sa_pub2022"),
+    ("urban_area", "sa_urban_area_name"),
+    ("county", "county_english"),
+    ("total_population", "total_population"),
+    ("total_households", "total_households"),
+    ("avg_household_size", "avg_household_size::float8"),
+    ("apartment_pct", "apartment_pct::float8"),
+    ("owner_occupied_pct", "owner_occupied_pct::float8"),
+    ("rented_pct", "rented_pct::float8"),
+    ("vacancy_rate", "vacancy_rate::float8"),
+    ("employment_rate", "employment_rate::float8"),
+    ("third_level_pct", "third_level_pct::float8"),
+    ("wfh_pct", "wfh_pct::float8"),
+    ("population_density", "population_density::float8"),
+    ("avg_rooms", "avg_rooms::float8"),
+    ("health_good_pct", "health_good_pct::float8"),
+    ("built_pre_1919", "built_pre_1919"),
+    ("built_2016_plus", "built_2016_plus"),
+    ("area_sqm", "round(area_sqm::numeric, 1)"),
+]
 
 
 @app.get("/api/census_small_areas")
-def get_census_small_areas(bbox: str = Query(..., description="west,south,east,north")):
+async def get_census_small_areas(
+    bbox: str = Query(..., description="west,south,east,north"),
+    zoom: float | None = Query(None, description="map zoom; selects simplified geometry"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return Census 2022 Small Area polygons with demographic stats as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    body = await query_feature_collection(
+        await source_table("census_small_areas", zoom), CENSUS_SA_PROPERTIES, (west, south, east, north),
+        where="total_population IS NOT NULL", after=after,
+    )
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
 
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    ogc_fid AS id,
-                    sa_pub2022,
-                    sa_urban_area_name,
-                    county_english,
-                    total_population,
-                    total_households,
-                    avg_household_size,
-                    apartment_pct,
-                    owner_occupied_pct,
-                    rented_pct,
-                    vacancy_rate,
-                    employment_rate,
-                    third_level_pct,
-                    wfh_pct,
-                    population_density,
-                    avg_rooms,
-                    health_good_pct,
-                    built_pre_1919,
-                    built_2016_plus,
-                    area_sqm,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM census_small_areas
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                  AND total_population IS NOT NULL
-                LIMIT 2000
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        (
-            fid, sa_code, urban_area, county, pop, households, hh_size,
-            apt_pct, owner_pct, rent_pct, vac_rate, emp_rate, edu_pct,
-            wfh, pop_density, avg_rooms, health_pct,
-            pre_1919, post_2016, area_sqm, geometry,
-        ) = row
-        features.append(
-            {
-                "type": "Feature",
-                "id": fid,
-                "geometry": geometry,
-                "properties": {
-                    "id": fid,
-                    "sa_code": sa_code,
-                    "urban_area": urban_area,
-                    "county": county,
-                    "total_population": pop,
-                    "total_households": households,
-                    "avg_household_size": float(hh_size) if hh_size else None,
-                    "apartment_pct": float(apt_pct) if apt_pct else None,
-                    "owner_occupied_pct": float(owner_pct) if owner_pct else None,
-                    "rented_pct": float(rent_pct) if rent_pct else None,
-                    "vacancy_rate": float(vac_rate) if vac_rate else None,
-                    "employment_rate": float(emp_rate) if emp_rate else None,
-                    "third_level_pct": float(edu_pct) if edu_pct else None,
-                    "wfh_pct": float(wfh) if wfh else None,
-                    "population_density": float(pop_density) if pop_density else None,
-                    "avg_rooms": float(avg_rooms) if avg_rooms else None,
-                    "health_good_pct": float(health_pct) if health_pct else None,
-                    "built_pre_1919": pre_1919,
-                    "built_2016_plus": post_2016,
-                    "area_sqm": round(area_sqm, 1) if area_sqm else None,
-                },
-            }
-        )
 
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+URBAN_AREA_PROPERTIES = [
+    ("urban_area_name", "urban_area_name"),
+    ("urban_area_code", "urban_area_code"),
+    ("county", "county"),
+]
 
 
 @app.get("/api/urban_areas")
-def get_urban_areas(bbox: str = Query(..., description="west,south,east,north")):
+async def get_urban_areas(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return Urban Area boundary polygons as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    ogc_fid AS id,
-                    urban_area_name,
-                    urban_area_code,
-                    county,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM urban_areas
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 500
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        fid, name, code, county, geometry = row
-        features.append(
-            {
-                "type": "Feature",
-                "id": fid,
-                "geometry": geometry,
-                "properties": {
-                    "id": fid,
-                    "urban_area_name": name,
-                    "urban_area_code": code,
-                    "county": county,
-                },
-            }
-        )
-
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_feature_collection("urban_areas", URBAN_AREA_PROPERTIES, (west, south, east, north), after=after, limit=500)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
 
 
 @app.get("/api/census_stats")
-def get_census_stats(
+async def get_census_stats(
     lng: float = Query(...),
     lat: float = Query(...),
     radius: float = Query(500, description="Radius in metres"),
 ):
     """Return aggregated census demographics for Small Areas within a circle."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
+    async with connection() as conn:
+        async with conn.cursor() as cur:
             center_sql = "ST_Transform(ST_SetSRID(ST_MakePoint(%s, %s), 4326), 2157)"
-            cur.execute(
+            await cur.execute(
                 f"""
                 SELECT
                     COUNT(*) AS sa_count,
@@ -344,7 +288,7 @@ def get_census_stats(
                     COALESCE(SUM(age_65_plus), 0) AS age_65_plus
                 FROM census_small_areas
                 WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
+                    geom_itm,
                     {center_sql},
                     %s
                 )
@@ -353,9 +297,7 @@ def get_census_stats(
                 """,
                 (lng, lat, radius),
             )
-            row = cur.fetchone()
-    finally:
-        put_conn(conn)
+            row = await cur.fetchone()
 
     (
         sa_count, total_pop, total_hh, avg_hh_size, avg_apt_pct,
@@ -390,281 +332,137 @@ def get_census_stats(
     }
 
 
-def query_planning_apps_bbox(table: str, west, south, east, north):
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                f"""
-                SELECT
-                    ogc_fid AS id,
-                    plan_ref,
-                    county,
-                    plan_auth,
-                    reg_date,
-                    descrptn,
-                    location,
-                    stage,
-                    decision,
-                    app_dec,
-                    dec_date,
-                    more_info,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM {table}
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 2000
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        (
-            fid, plan_ref, county, plan_auth, reg_date, descrptn,
-            location, stage, decision, app_dec, dec_date, more_info, geometry,
-        ) = row
-        features.append(
-            {
-                "type": "Feature",
-                "id": fid,
-                "geometry": geometry,
-                "properties": {
-                    "id": fid,
-                    "plan_ref": plan_ref,
-                    "county": county,
-                    "plan_auth": plan_auth,
-                    "reg_date": reg_date,
-                    "descrptn": descrptn,
-                    "location": location,
-                    "stage": stage,
-                    "decision": decision,
-                    "app_dec": app_dec,
-                    "dec_date": dec_date,
-                    "more_info": more_info,
-                },
-            }
-        )
-    return features
+PLANNING_APP_PROPERTIES = [
+    (name, name) for name in (
+        "plan_ref", "county", "plan_auth", "reg_date", "descrptn", "location",
+        "stage", "decision", "app_dec", "dec_date", "more_info",
+    )
+]
 
 
 @app.get("/api/planning_apps")
-def get_planning_apps(bbox: str = Query(..., description="west,south,east,north")):
+async def get_planning_apps(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return DLR planning application polygons within the bounding box as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-    features = query_planning_apps_bbox("dlr_planning_polygons", west, south, east, north)
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_feature_collection("dlr_planning_polygons", PLANNING_APP_PROPERTIES, (west, south, east, north), after=after)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
 
 
 @app.get("/api/planning_apps_points")
-def get_planning_apps_points(bbox: str = Query(..., description="west,south,east,north")):
+async def get_planning_apps_points(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return DLR planning application points within the bounding box as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-    features = query_planning_apps_bbox("dlr_planning_points", west, south, east, north)
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_feature_collection("dlr_planning_points", PLANNING_APP_PROPERTIES, (west, south, east, north), after=after)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
+
+
+LAP_BOUNDARY_PROPERTIES = [
+    ("objective", "objective"),
+    ("map_number", "map_number"),
+    ("feature_type", "feature_type1"),
+    ("hyperlink", "hyperlink"),
+    ("area_ha", "area__ha_::float8"),
+]
 
 
 @app.get("/api/lap_boundaries")
-def get_lap_boundaries(bbox: str = Query(..., description="west,south,east,north")):
+async def get_lap_boundaries(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return South Dublin Local Area Plan boundaries as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    body = await query_feature_collection("sd_lap_boundaries", LAP_BOUNDARY_PROPERTIES, (west, south, east, north), after=after, limit=500)
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
 
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    ogc_fid AS id,
-                    objective,
-                    map_number,
-                    feature_type1 AS feature_type,
-                    hyperlink,
-                    area__ha_ AS area_ha,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM sd_lap_boundaries
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 500
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
 
-    features = []
-    for row in rows:
-        fid, objective, map_number, feature_type, hyperlink, area_ha, geometry = row
-        features.append(
-            {
-                "type": "Feature",
-                "id": fid,
-                "geometry": geometry,
-                "properties": {
-                    "id": fid,
-                    "objective": objective,
-                    "map_number": map_number,
-                    "feature_type": feature_type,
-                    "hyperlink": hyperlink,
-                    "area_ha": float(area_ha) if area_ha else None,
-                },
-            }
-        )
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+SD_PLANNING_REGISTER_PROPERTIES = [
+    ("ref", "ref"),
+    ("regref", "regref"),
+    ("link", "link"),
+    ("location", "location"),
+    ("applicant_name", "NULLIF(btrim(applicantname), '')"),
+    ("status", "status"),
+]
 
 
 @app.get("/api/sd_planning_register")
-def get_sd_planning_register(bbox: str = Query(..., description="west,south,east,north")):
+async def get_sd_planning_register(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return South Dublin Planning Register applications within the bounding box as GeoJSON."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    ogc_fid AS id,
-                    ref,
-                    regref,
-                    link,
-                    location,
-                    applicantname AS applicant_name,
-                    status,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM sd_planning_register
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 2000
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        fid, ref, regref, link, location, applicant_name, status, geometry = row
-        features.append(
-            {
-                "type": "Feature",
-                "id": fid,
-                "geometry": geometry,
-                "properties": {
-                    "id": fid,
-                    "ref": ref,
-                    "regref": regref,
-                    "link": link,
-                    "location": location,
-                    "applicant_name": (applicant_name or "").strip() or None,
-                    "status": status,
-                },
-            }
-        )
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_feature_collection(
+        "sd_planning_register", SD_PLANNING_REGISTER_PROPERTIES, (west, south, east, north), after=after,
+    )
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
+
+
+SOLD_PROPERTY_PROPERTIES = [
+    ("address", "address"),
+    ("sale_price", "sale_price"),
+    ("asking_price", "asking_price"),
+    ("beds", "beds"),
+    ("baths", "baths"),
+    ("property_type", "property_type"),
+    ("energy_rating", "energy_rating"),
+    ("agent_name", "agent_name"),
+    ("sale_date", "sale_date::text"),
+    ("floor_area_m2", "floor_area_m2"),
+    ("price_per_sqm", "CASE WHEN sale_price > 0 AND floor_area_m2 > 0 "
+                      "THEN round(sale_price::numeric / floor_area_m2::numeric) END"),
+    ("url", "url"),
+]
 
 
 @app.get("/api/sold_properties")
-def get_sold_properties(bbox: str = Query(..., description="west,south,east,north")):
+async def get_sold_properties(
+    bbox: str = Query(..., description="west,south,east,north"),
+    after: int | None = Query(None, description="'next' from the previous page"),
+):
     """Return sold properties within the bounding box as GeoJSON points."""
     try:
         west, south, east, north = parse_bbox(bbox)
     except ValueError:
         raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
-
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                    id,
-                    address,
-                    sale_price,
-                    asking_price,
-                    beds,
-                    baths,
-                    property_type,
-                    energy_rating,
-                    agent_name,
-                    sale_date::text,
-                    floor_area_m2,
-                    url,
-                    ST_AsGeoJSON(geom)::json AS geometry
-                FROM sold_properties
-                WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-                LIMIT 2000
-                """,
-                (west, south, east, north),
-            )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        (
-            fid, address, sale_price, asking_price, beds, baths,
-            property_type, energy_rating, agent_name, sale_date,
-            floor_area, url, geometry,
-        ) = row
-        price_per_sqm = None
-        if sale_price and floor_area:
-            price_per_sqm = round(sale_price / floor_area)
-        features.append(
-            {
-                "type": "Feature",
-                "id": fid,
-                "geometry": geometry,
-                "properties": {
-                    "id": fid,
-                    "address": address,
-                    "sale_price": sale_price,
-                    "asking_price": asking_price,
-                    "beds": beds,
-                    "baths": baths,
-                    "property_type": property_type,
-                    "energy_rating": energy_rating,
-                    "agent_name": agent_name,
-                    "sale_date": sale_date,
-                    "floor_area_m2": floor_area,
-                    "price_per_sqm": price_per_sqm,
-                    "url": url,
-                },
-            }
-        )
-
-    return JSONResponse({"type": "FeatureCollection", "features": features})
+    body = await query_feature_collection(
+        "sold_properties", SOLD_PROPERTY_PROPERTIES, (west, south, east, north), id_column="id", after=after,
+    )
+    return Response(content=body, media_type=GEOJSON_MEDIA_TYPE)
 
 
 @app.get("/api/sold_stats")
-def get_sold_stats(
+async def get_sold_stats(
     lng: float = Query(...),
     lat: float = Query(...),
     radius: float = Query(500, description="Radius in metres"),
 ):
     """Return aggregate stats for sold properties within a circle."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
+    async with connection() as conn:
+        async with conn.cursor() as cur:
             center_sql = "ST_Transform(ST_SetSRID(ST_MakePoint(%s, %s), 4326), 2157)"
 
             # Aggregates (exclude outliers: sale_price 0 or > €10M for robust stats)
-            cur.execute(
+            await cur.execute(
                 f"""
                 SELECT
                     COUNT(*) AS cnt,
@@ -680,7 +478,7 @@ def get_sold_stats(
                     COALESCE(ROUND(AVG(baths)::numeric, 1), 0) AS avg_baths
                 FROM sold_properties
                 WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
+                    geom_itm,
                     {center_sql},
                     %s
                 )
@@ -688,15 +486,15 @@ def get_sold_stats(
                 """,
                 (lng, lat, radius),
             )
-            agg = cur.fetchone()
+            agg = await cur.fetchone()
 
             # Property type breakdown (same outlier filter)
-            cur.execute(
+            await cur.execute(
                 f"""
                 SELECT COALESCE(property_type, 'Unknown'), COUNT(*)
                 FROM sold_properties
                 WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
+                    geom_itm,
                     {center_sql},
                     %s
                 )
@@ -706,10 +504,10 @@ def get_sold_stats(
                 """,
                 (lng, lat, radius),
             )
-            type_rows = cur.fetchall()
+            type_rows = await cur.fetchall()
 
             # Individual properties (for sidebar list, same outlier filter)
-            cur.execute(
+            await cur.execute(
                 f"""
                 SELECT
                     id, address, sale_price, asking_price, beds, baths,
@@ -717,7 +515,7 @@ def get_sold_stats(
                     ST_AsGeoJSON(geom)::json AS geometry
                 FROM sold_properties
                 WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
+                    geom_itm,
                     {center_sql},
                     %s
                 )
@@ -727,9 +525,7 @@ def get_sold_stats(
                 """,
                 (lng, lat, radius),
             )
-            prop_rows = cur.fetchall()
-    finally:
-        put_conn(conn)
+            prop_rows = await cur.fetchall()
 
     (
         count, avg_sale, min_sale, max_sale, median_sale, stddev_sale,
@@ -768,16 +564,15 @@ def get_sold_stats(
 
 
 @app.get("/api/parcel/{parcel_id}")
-def get_parcel(parcel_id: int, parcel_type: str = Query("freehold")):
+async def get_parcel(parcel_id: int, parcel_type: str = Query("freehold")):
     """Return full detail for a single parcel. Use ?parcel_type=leasehold for leasehold."""
     table = PARCEL_TABLES.get(parcel_type)
     if not table:
         raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
 
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 f"""
                 SELECT
                     ogc_fid AS id,
@@ -789,9 +584,7 @@ def get_parcel(parcel_id: int, parcel_type: str = Query("freehold")):
                 """,
                 (parcel_id,),
             )
-            row = cur.fetchone()
-    finally:
-        put_conn(conn)
+            row = await cur.fetchone()
 
     if row is None:
         raise HTTPException(status_code=404, detail="Parcel not found")
@@ -810,182 +603,25 @@ def get_parcel(parcel_id: int, parcel_type: str = Query("freehold")):
     }
 
 
-ENRICHMENT_RADIUS_M = 500
-
-
-@app.get("/api/parcel/{parcel_id}/enriched")
-def get_parcel_enriched(parcel_id: int, parcel_type: str = Query("freehold")):
-    """Return parcel details plus spatial enrichment: RZLT overlap, nearby planning, sales, census."""
-    table = PARCEL_TABLES.get(parcel_type)
-    if not table:
-        raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
-
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            # 1) Fetch parcel basics + geometry centroid + full geom for overlap queries
-            cur.execute(
-                f"""
-                SELECT
-                    ogc_fid,
-                    nationalcadastralreference,
-                    gml_id,
-                    area_sqm,
-                    ST_X(ST_Centroid(geom)) AS centroid_lng,
-                    ST_Y(ST_Centroid(geom)) AS centroid_lat,
-                    geom
-                FROM {table}
-                WHERE ogc_fid = %s
-                """,
-                (parcel_id,),
-            )
-            row = cur.fetchone()
-            if row is None:
-                raise HTTPException(status_code=404, detail="Parcel not found")
-
-            ogc_fid, national_ref, gml_id, area_sqm, centroid_lng, centroid_lat, parcel_geom = row
-            area_sqm_val = round(area_sqm, 1) if area_sqm is not None else None
-            area_acres = round(area_sqm / 4046.86, 3) if area_sqm is not None else None
-
-            centroid_2157 = "ST_Transform(ST_SetSRID(ST_MakePoint(%s, %s), 4326), 2157)"
+# Enrichment is precomputed (500m radius) by scripts/build_parcel_context.sh
+PARCEL_CONTEXT_COLUMNS = """
+    parcel_id, national_ref, inspire_id, area_sqm, centroid_lng, centroid_lat,
+    rzlt_overlap, nearby_planning,
+    sales_count, avg_sale_price, median_sale_price, avg_price_per_sqm, recent_sales,
+    census
+"""
 
-            # 2) RZLT overlap — does any RZLT zone intersect this parcel?
-            cur.execute(
-                f"""
-                SELECT zone_desc, site_area, local_authority_name, zone_gzt
-                FROM rzlt
-                WHERE ST_Intersects(geom, (SELECT geom FROM {table} WHERE ogc_fid = %s))
-                LIMIT 5
-                """,
-                (parcel_id,),
-            )
-            rzlt_rows = cur.fetchall()
-            rzlt_overlap = [
-                {"zone_desc": r[0], "site_area": r[1], "local_authority_name": r[2], "zone_gzt": r[3]}
-                for r in rzlt_rows
-            ]
-
-            # 3) Nearby planning apps within radius (sorted by distance)
-            cur.execute(
-                f"""
-                SELECT
-                    plan_ref,
-                    decision,
-                    descrptn,
-                    reg_date::text AS registered_date,
-                    dec_date::text AS decision_date,
-                    ROUND(ST_Distance(
-                        ST_Transform(geom, 2157),
-                        {centroid_2157}
-                    )::numeric, 0) AS distance_m
-                FROM dlr_planning_polygons
-                WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
-                    {centroid_2157},
-                    %s
-                )
-                ORDER BY distance_m
-                LIMIT 5
-                """,
-                (centroid_lng, centroid_lat, centroid_lng, centroid_lat, ENRICHMENT_RADIUS_M),
-            )
-            planning_rows = cur.fetchall()
-            nearby_planning = [
-                {
-                    "plan_ref": r[0], "decision": r[1], "description": r[2],
-                    "registered_date": r[3], "decision_date": r[4],
-                    "distance_m": int(r[5]) if r[5] is not None else None,
-                }
-                for r in planning_rows
-            ]
-
-            # 4) Sold property stats within radius
-            cur.execute(
-                f"""
-                SELECT
-                    COUNT(*) AS cnt,
-                    COALESCE(ROUND(AVG(sale_price)), 0) AS avg_sale,
-                    COALESCE(ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY sale_price)), 0) AS median_sale,
-                    COALESCE(ROUND(AVG(CASE WHEN floor_area_m2 > 0 THEN sale_price / floor_area_m2 END)), 0) AS avg_price_sqm
-                FROM sold_properties
-                WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
-                    {centroid_2157},
-                    %s
-                )
-                AND sale_price > 0 AND sale_price < 10000000
-                """,
-                (centroid_lng, centroid_lat, ENRICHMENT_RADIUS_M),
-            )
-            sales_agg = cur.fetchone()
-            sales_count, avg_sale, median_sale, avg_psm = sales_agg
 
-            # Top 5 nearest recent sales
-            cur.execute(
-                f"""
-                SELECT
-                    address, sale_price, sale_date::text, property_type,
-                    ROUND(ST_Distance(
-                        ST_Transform(geom, 2157),
-                        {centroid_2157}
-                    )::numeric, 0) AS distance_m
-                FROM sold_properties
-                WHERE ST_DWithin(
-                    ST_Transform(geom, 2157),
-                    {centroid_2157},
-                    %s
-                )
-                AND sale_price > 0 AND sale_price < 10000000
-                ORDER BY sale_date DESC NULLS LAST
-                LIMIT 5
-                """,
-                (centroid_lng, centroid_lat, centroid_lng, centroid_lat, ENRICHMENT_RADIUS_M),
-            )
-            recent_sales = [
-                {
-                    "address": r[0], "sale_price": r[1], "sale_date": r[2],
-                    "property_type": r[3], "distance_m": int(r[4]) if r[4] is not None else None,
-                }
-                for r in cur.fetchall()
-            ]
-
-            # 5) Census — small area containing this parcel centroid
-            cur.execute(
-                """
-                SELECT
-                    sa_pub2022,
-                    total_population,
-                    population_density,
-                    owner_occupied_pct,
-                    rented_pct,
-                    vacancy_rate,
-                    employment_rate,
-                    third_level_pct,
-                    avg_household_size
-                FROM census_small_areas
-                WHERE ST_Intersects(geom, ST_SetSRID(ST_MakePoint(%s, %s), 4326))
-                AND total_population IS NOT NULL
-                LIMIT 1
-                """,
-                (centroid_lng, centroid_lat),
-            )
-            census_row = cur.fetchone()
-            census = None
-            if census_row:
-                census = {
-                    "small_area_id": census_row[0],
-                    "total_population": census_row[1],
-                    "population_density": float(census_row[2]) if census_row[2] else None,
-                    "owner_occupied_pct": float(census_row[3]) if census_row[3] else None,
-                    "rented_pct": float(census_row[4]) if census_row[4] else None,
-                    "vacancy_rate": float(census_row[5]) if census_row[5] else None,
-                    "employment_rate": float(census_row[6]) if census_row[6] else None,
-                    "third_level_pct": float(census_row[7]) if census_row[7] else None,
-                    "avg_household_size": float(census_row[8]) if census_row[8] else None,
-                }
-
-    finally:
-        put_conn(conn)
+def enriched_payload(row: tuple, parcel_type: str) -> dict:
+    """Shape a parcel_context row as the enriched-parcel response."""
+    (
+        ogc_fid, national_ref, gml_id, area_sqm, centroid_lng, centroid_lat,
+        rzlt_overlap, nearby_planning,
+        sales_count, avg_sale, median_sale, avg_psm, recent_sales,
+        census,
+    ) = row
+    area_sqm_val = round(area_sqm, 1) if area_sqm is not None else None
+    area_acres = round(area_sqm / 4046.86, 3) if area_sqm is not None else None
 
     return {
         "parcel": {
@@ -1001,29 +637,275 @@ def get_parcel_enriched(parcel_id: int, parcel_type: str = Query("freehold")):
         "nearby_planning": nearby_planning,
         "nearby_sales": {
             "count": sales_count,
-            "avg_sale_price": int(avg_sale),
-            "median_sale_price": int(median_sale),
-            "avg_price_per_sqm": int(avg_psm),
+            "avg_sale_price": avg_sale,
+            "median_sale_price": median_sale,
+            "avg_price_per_sqm": avg_psm,
             "recent": recent_sales,
         },
         "census": census,
     }
 
 
+@app.get("/api/parcel/{parcel_id}/enriched")
+async def get_parcel_enriched(parcel_id: int, parcel_type: str = Query("freehold")):
+    """Return parcel details plus spatial enrichment: RZLT overlap, nearby planning, sales, census.
+
+    One round trip: the precomputed parcel_context row, or the same row computed live
+    for parcels the context build hasn't reached yet.
+    """
+    if parcel_type not in PARCEL_TABLES:
+        raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
+
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                (SELECT {PARCEL_CONTEXT_COLUMNS}
+                 FROM parcel_context
+                 WHERE parcel_type = %s AND parcel_id = %s)
+                UNION ALL
+                (SELECT {PARCEL_CONTEXT_COLUMNS}
+                 FROM parcel_context_rows(%s, NULL, ARRAY[%s]::int[]))
+                LIMIT 1
+                """,
+                (parcel_type, parcel_id, parcel_type, parcel_id),
+            )
+            row = await cur.fetchone()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Parcel not found")
+    return enriched_payload(row, parcel_type)
+
+
+ENRICHED_BATCH_MAX_IDS = 1000
+ENRICHED_BATCH_CHUNK = 100  # parcels computed live per query, so lines stream as chunks finish
+
+
+class EnrichedBatchRequest(BaseModel):
+    ids: list[int]
+    parcel_type: str = "freehold"
+
+
+async def fetch_parcel_context(query: str, params: tuple) -> list[tuple]:
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(query, params)
+            return await cur.fetchall()
+
+
+@app.post("/api/parcels/enriched")
+async def get_parcels_enriched(req: EnrichedBatchRequest):
+    """Enrich many parcels at once, streamed as NDJSON (one enriched payload per line).
+
+    Precomputed rows come back from a single parcel_context query. Parcels not in it
+    are computed set-based by parcel_context_rows in chunks. Unknown ids get a
+    {"id": ..., "error": "not_found"} line, so every requested id appears once.
+    """
+    parcel_type = req.parcel_type
+    if parcel_type not in PARCEL_TABLES:
+        raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
+    ids = list(dict.fromkeys(req.ids))
+    if len(ids) > ENRICHED_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {ENRICHED_BATCH_MAX_IDS} ids per request")
+
+    def line(payload: dict) -> bytes:
+        return (json.dumps(payload, default=str) + "\n").encode()
+
+    async def ndjson_stream():
+        pending = set(ids)
+        rows = await fetch_parcel_context(
+            f"""
+            SELECT {PARCEL_CONTEXT_COLUMNS}
+            FROM parcel_context
+            WHERE parcel_type = %s AND parcel_id = ANY(%s::int[])
+            """,
+            (parcel_type, ids),
+        )
+        for row in rows:
+            pending.discard(row[0])
+            yield line(enriched_payload(row, parcel_type))
+
+        missing = [i for i in ids if i in pending]
+        for start in range(0, len(missing), ENRICHED_BATCH_CHUNK):
+            rows = await fetch_parcel_context(
+                f"SELECT {PARCEL_CONTEXT_COLUMNS} FROM parcel_context_rows(%s, NULL, %s::int[])",
+                (parcel_type, missing[start:start + ENRICHED_BATCH_CHUNK]),
+            )
+            for row in rows:
+                pending.discard(row[0])
+                yield line(enriched_payload(row, parcel_type))
+
+        for parcel_id in missing:
+            if parcel_id in pending:
+                yield line({"id": parcel_id, "type": parcel_type, "error": "not_found"})
+
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+
+# ── Parcel adjacency (scripts/build_parcel_adjacency.sh) ──────────────────────
+
+ASSEMBLAGE_MAX_PARCELS = 500
+
+
+@app.get("/api/parcel/{parcel_id}/neighbours")
+async def get_parcel_neighbours(
+    parcel_id: int,
+    parcel_type: str = Query("freehold"),
+    min_shared_edge_m: float = Query(0, description="Ignore contacts shorter than this (0 keeps corner touches)"),
+):
+    """Parcels sharing a boundary with this one, longest shared edge first."""
+    table = PARCEL_TABLES.get(parcel_type)
+    if not table:
+        raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    f"""
+                    SELECT e.b, p.nationalcadastralreference, p.area_sqm, e.shared_edge_m
+                    FROM parcel_adjacency e
+                    JOIN {table} p ON p.ogc_fid = e.b
+                    WHERE e.parcel_type = %s AND e.a = %s AND e.shared_edge_m >= %s
+                    ORDER BY e.shared_edge_m DESC
+                    """,
+                    (parcel_type, parcel_id, min_shared_edge_m),
+                )
+                rows = await cur.fetchall()
+    except psycopg.errors.UndefinedTable:
+        raise HTTPException(503, "Adjacency graph not built yet (run scripts/build_parcel_adjacency.sh)")
+
+    return {
+        "id": parcel_id,
+        "type": parcel_type,
+        "count": len(rows),
+        "neighbours": [
+            {
+                "id": r[0],
+                "national_ref": r[1],
+                "area_sqm": round(r[2], 1) if r[2] is not None else None,
+                "shared_edge_m": round(r[3], 1),
+            }
+            for r in rows
+        ],
+    }
+
+
+@app.get("/api/parcel/{parcel_id}/assemblage")
+async def get_parcel_assemblage(
+    parcel_id: int,
+    parcel_type: str = Query("freehold"),
+    min_shared_edge_m: float = Query(1.0, description="Minimum shared boundary to count as joined"),
+    max_parcels: int = Query(200, ge=1, le=ASSEMBLAGE_MAX_PARCELS),
+):
+    """The connected block of parcels reachable from this one through shared boundaries."""
+    table = PARCEL_TABLES.get(parcel_type)
+    if not table:
+        raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
+
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cur:
+                # UNION drops already-visited parcels, so the walk ends; the LIMIT stops it early
+                await cur.execute(
+                    f"""
+                    WITH RECURSIVE component(id) AS (
+                        SELECT %s::int
+                        UNION
+                        SELECT e.b
+                        FROM component c
+                        JOIN parcel_adjacency e ON e.parcel_type = %s AND e.a = c.id
+                        WHERE e.shared_edge_m >= %s
+                    ),
+                    members AS (SELECT id FROM component LIMIT %s)
+                    SELECT
+                        COUNT(*),
+                        array_agg(p.ogc_fid ORDER BY p.ogc_fid),
+                        SUM(p.area_sqm),
+                        ST_AsGeoJSON(ST_Union(p.geom))::json
+                    FROM members m
+                    JOIN {table} p ON p.ogc_fid = m.id
+                    """,
+                    (parcel_id, parcel_type, min_shared_edge_m, max_parcels),
+                )
+                count, member_ids, total_area, geometry = await cur.fetchone()
+    except psycopg.errors.UndefinedTable:
+        raise HTTPException(503, "Adjacency graph not built yet (run scripts/build_parcel_adjacency.sh)")
+
+    if count == 0:
+        raise HTTPException(status_code=404, detail="Parcel not found")
+
+    return {
+        "id": parcel_id,
+        "type": parcel_type,
+        "parcel_count": count,
+        "truncated": count >= max_parcels,
+        "member_ids": member_ids,
+        "total_area_sqm": round(total_area, 1) if total_area is not None else None,
+        "total_area_acres": round(total_area / 4046.86, 3) if total_area is not None else None,
+        "geometry": geometry,
+    }
+
+
+ASSEMBLAGE_LIMIT = 50
+
+
+@app.get("/api/assemblages")
+async def get_assemblages(
+    bbox: str = Query(..., description="west,south,east,north"),
+    parcel_type: str = Query("freehold"),
+    min_acres: float = Query(0.5, description="Minimum combined area of the group"),
+    max_parcel_sqm: float = Query(2000, description="Only consider parcels up to this size"),
+    min_shared_edge_m: float = Query(1.0, description="Minimum shared boundary to count as joined"),
+    rzlt_only: bool = Query(False, description="Only parcels on RZLT land"),
+    limit: int = Query(25, ge=1, le=ASSEMBLAGE_LIMIT),
+):
+    """Find contiguous groups of small parcels in a bbox that together form a developable block."""
+    table = PARCEL_TABLES.get(parcel_type)
+    if not table:
+        raise HTTPException(status_code=400, detail="parcel_type must be freehold or leasehold")
+    try:
+        west, south, east, north = parse_bbox(bbox)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+
+    try:
+        total, results = await find_assemblages(
+            table,
+            parcel_type,
+            (west, south, east, north),
+            min_area_sqm=min_acres * 4046.86,
+            max_parcel_sqm=max_parcel_sqm,
+            min_shared_edge_m=min_shared_edge_m,
+            rzlt_only=rzlt_only,
+            limit=limit,
+        )
+    except psycopg.errors.UndefinedTable:
+        raise HTTPException(
+            503, "Adjacency graph not built yet (run scripts/build_parcel_adjacency.sh)"
+        )
+
+    return {"count": len(results), "total_found": total, "assemblages": results}
+
+
 @app.get("/api/search")
 async def search_location(q: str = Query(..., description="Location name or address")):
     """Geocode a location string using Nominatim (OpenStreetMap)."""
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            "https://nominatim.openstreetmap.org/search",
-            params={
-                "q": q,
-                "format": "json",
-                "limit": 5,
-                "countrycodes": "ie",
-            },
-            headers={"User-Agent": "LandOS/1.0 (local development)"},
-        )
+    resp = await request_with_retry(
+        "nominatim",
+        "GET",
+        "https://nominatim.openstreetmap.org/search",
+        params={
+            "q": q,
+            "format": "json",
+            "limit": 5,
+            "countrycodes": "ie",
+        },
+    )
     if resp.status_code != 200:
         raise HTTPException(status_code=502, detail="Geocoder request failed")
 
@@ -1045,21 +927,18 @@ async def search_location(q: str = Query(..., description="Location name or addr
 
 
 @app.get("/api/layers")
-def get_layers():
+async def get_layers():
     """Return all available map layers from the layers metadata table."""
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
                 """
                 SELECT id, name, display_name, table_name, is_active, min_zoom, style
                 FROM layers
                 ORDER BY id
                 """
             )
-            rows = cur.fetchall()
-    finally:
-        put_conn(conn)
+            rows = await cur.fetchall()
 
     return {
         "layers": [
@@ -1077,115 +956,190 @@ def get_layers():
     }
 
 
+# ── Bulk export (streamed from a server-side cursor) ─────────────────────────
+
+def export_response(stream, fmt: str, filename: str) -> StreamingResponse:
+    media_type, ext, _ = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{ext}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@app.get("/api/export/{layer_name}")
+async def export_layer(
+    layer_name: str,
+    bbox: str = Query(None, description="west,south,east,north"),
+    polygon: str = Query(None, description="GeoJSON Polygon/MultiPolygon geometry (EPSG:4326)"),
+    format: str = Query("ndjson", description=f"One of: {', '.join(EXPORT_FORMATS)}"),
+):
+    """Stream every feature of a layer (optionally within a bbox or polygon), uncapped."""
+    layer = await get_layer(layer_name)
+    if layer is None:
+        raise HTTPException(status_code=404, detail=f"Unknown layer: {layer_name}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    area, params = None, None
+    if bbox:
+        try:
+            params = parse_bbox(bbox)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+        area = "bbox"
+    elif polygon:
+        try:
+            geometry = json.loads(polygon)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="polygon must be a GeoJSON geometry")
+        if not isinstance(geometry, dict) or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            raise HTTPException(status_code=400, detail="polygon must be a GeoJSON Polygon or MultiPolygon")
+        area, params = "polygon", [polygon]
+
+    try:
+        stream = await open_feature_stream(layer_export_sql(layer, area), params, format)
+    except PoolTimeout:
+        raise
+    except psycopg.Error as e:
+        raise HTTPException(500, f"Export failed: {e}")
+    return export_response(stream, format, layer_name)
+
+
+class ExportQueryRequest(BaseModel):
+    sql: str
+    format: str = "ndjson"
+
+
+@app.post("/api/export/query")
+async def export_query(req: ExportQueryRequest):
+    """Stream the full result of an AI hypothesis query, without the 25-row preview limit."""
+    if req.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    error = validate_sql(req.sql)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    try:
+        stream = await open_feature_stream(
+            query_export_sql(req.sql), None, req.format, read_only=True, transform=row_to_feature
+        )
+    except PoolTimeout:
+        raise
+    except psycopg.Error as e:
+        # The SQL is the client's (AI-written): a bad query or a timeout is a 400
+        raise HTTPException(400, f"Query failed: {e}")
+    return export_response(stream, req.format, "landos_results")
+
+
 @app.get("/health")
-def health():
-    return {"status": "ok"}
+async def health():
+    return {"status": "ok", "db_pool": pool_stats()}
 
 
 # ── Side-site / infill detection endpoint ─────────────────────────────────────
 
-SIDE_SITE_SQL = """
-WITH candidates AS (
-    SELECT
-        f.ogc_fid,
-        f.nationalcadastralreference,
-        f.area_sqm,
-        f.geom,
-        4 * PI() * ST_Area(ST_Transform(f.geom, 2157))
-            / NULLIF(POWER(ST_Perimeter(ST_Transform(f.geom, 2157)), 2), 0)
-            AS compactness,
-        (SELECT COUNT(*) FROM cadastral_freehold n
-         WHERE n.geom && ST_Expand(f.geom, 0.0001)
-           AND ST_Touches(n.geom, f.geom)
-           AND n.ogc_fid != f.ogc_fid) AS neighbor_count
-    FROM cadastral_freehold f
-    WHERE f.geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
-      AND f.area_sqm BETWEEN 80 AND 500
-),
-with_planning AS (
-    SELECT c.*,
-        EXISTS (
-            SELECT 1 FROM dlr_planning_polygons p
-            WHERE ST_Intersects(p.geom, c.geom)
-        ) AS has_planning
-    FROM candidates c
-),
-with_rzlt AS (
-    SELECT wp.*,
-        EXISTS (
-            SELECT 1 FROM rzlt r
-            WHERE ST_Intersects(r.geom, wp.geom)
-        ) AS on_rzlt
-    FROM with_planning wp
-),
-with_census AS (
-    SELECT wr.*,
-        cs.owner_occupied_pct,
-        cs.total_population,
-        cs.vacancy_rate
-    FROM with_rzlt wr
-    LEFT JOIN census_small_areas cs ON ST_Intersects(cs.geom, ST_Centroid(wr.geom))
-),
-scored AS (
-    SELECT *,
-        -- Size score: peaks at 150-350 sqm
-        CASE
-            WHEN area_sqm BETWEEN 150 AND 350 THEN 1.0
-            WHEN area_sqm BETWEEN 80 AND 150 THEN (area_sqm - 80.0) / 70.0
-            ELSE (500.0 - area_sqm) / 150.0
-        END * 0.20
-        -- Shape score: lower compactness = more elongated = higher score
-        + CASE
-            WHEN compactness < 0.3 THEN 1.0
-            WHEN compactness < 0.5 THEN (0.5 - compactness) / 0.2
-            ELSE 0.0
-        END * 0.20
-        -- Neighbor score
-        + CASE
-            WHEN neighbor_count >= 3 THEN 1.0
-            WHEN neighbor_count = 2 THEN 0.7
-            WHEN neighbor_count = 1 THEN 0.3
-            ELSE 0.0
-        END * 0.15
-        -- No planning = likely undeveloped
-        + CASE WHEN NOT has_planning THEN 1.0 ELSE 0.0 END * 0.15
-        -- RZLT = motivated seller
-        + CASE WHEN on_rzlt THEN 1.0 ELSE 0.0 END * 0.15
-        -- Residential context
-        + CASE WHEN COALESCE(owner_occupied_pct, 0) > 50 THEN 1.0 ELSE 0.3 END * 0.15
-        AS score
-    FROM with_census
-)
-SELECT
-    ogc_fid AS id,
-    nationalcadastralreference AS national_ref,
-    ROUND(area_sqm::numeric, 1) AS area_sqm,
-    ROUND(area_sqm::numeric / 4046.86, 3) AS area_acres,
-    ROUND(compactness::numeric, 3) AS compactness,
-    neighbor_count,
-    has_planning,
-    on_rzlt,
-    ROUND(COALESCE(owner_occupied_pct, 0)::numeric, 1) AS owner_occupied_pct,
-    ROUND(COALESCE(vacancy_rate, 0)::numeric, 1) AS vacancy_rate,
-    ROUND(score::numeric, 3) AS score,
-    ST_AsGeoJSON(geom)::json AS geometry,
-    ST_X(ST_Centroid(geom)) AS lng,
-    ST_Y(ST_Centroid(geom)) AS lat
-FROM scored
-WHERE score > 0.3
-ORDER BY score DESC
-LIMIT 50;
-"""
+# Scores are precomputed citywide by scripts/build_side_site_scores.sh; this pages
+# through them best-first. Keyset paging on (score, id) stays cheap at any depth.
+SIDE_SITE_PAGE_LIMIT = 50
+SIDE_SITE_MAX_PAGE_LIMIT = 500
+SIDE_SITE_KEYSET_CLAUSE = "AND (score, id) < (%s::numeric, %s)"
+
+
+def side_site_page_sql(keyset: bool) -> str:
+    """FeatureCollection of one page of side_site_scores, plus count and the next-page token."""
+    return f"""
+    WITH page AS (
+        SELECT *
+        FROM side_site_scores
+        WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+          AND score > %s
+          {SIDE_SITE_KEYSET_CLAUSE if keyset else ""}
+        ORDER BY score DESC, id DESC
+        LIMIT %s
+    )
+    SELECT convert_to(json_build_object(
+        'type', 'FeatureCollection',
+        'features', COALESCE(json_agg(json_build_object(
+            'type', 'Feature',
+            'geometry', ST_AsGeoJSON(s.geom)::json,
+            'properties', to_jsonb(s) - 'geom' - 'computed_at'
+        ) ORDER BY s.score DESC, s.id DESC), '[]'::json),
+        'count', COUNT(*),
+        'next', CASE WHEN COUNT(*) = %s
+            THEN (array_agg(s.score || ':' || s.id ORDER BY s.score, s.id))[1] END
+    )::text, 'UTF8')
+    FROM page s
+    """
+
+
+async def rerank_side_sites(
+    bbox: tuple[float, float, float, float],
+    weights: dict[str, float],
+    min_score: float,
+    limit: int,
+    offset: int,
+) -> dict:
+    """One page of side sites ranked by a weight profile; `next` is the offset of the following page."""
+    try:
+        matrix = await get_feature_matrix()
+    except psycopg.errors.UndefinedTable:
+        raise HTTPException(503, "Side-site scores not built yet (run scripts/build_side_site_scores.sh)")
+    ids, scores = await run_in_threadpool(rank, matrix, weights, bbox, min_score)
+    page_ids = ids[offset:offset + limit].tolist()
+    page_scores = dict(zip(page_ids, scores[offset:offset + limit].tolist()))
+
+    async with connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                SELECT id, to_jsonb(s) - 'geom' - 'computed_at', ST_AsGeoJSON(geom)::json
+                FROM side_site_scores s
+                WHERE id = ANY(%s)
+                """,
+                (page_ids,),
+            )
+            rows = {r[0]: r for r in await cur.fetchall()}
+
+    features = []
+    for site_id in page_ids:
+        if site_id not in rows:
+            continue
+        _, properties, geometry = rows[site_id]
+        properties["base_score"] = properties["score"]
+        properties["score"] = round(page_scores[site_id], 3)
+        features.append({"type": "Feature", "geometry": geometry, "properties": properties})
+
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "count": len(features),
+        "total": len(ids),
+        "weights": weights,
+        "next": str(offset + limit) if offset + limit < len(ids) else None,
+    }
 
 
 @app.get("/api/side_sites")
-def get_side_sites(
+async def get_side_sites(
     bbox: str = Query(None, description="xmin,ymin,xmax,ymax"),
     lng: float = Query(None),
     lat: float = Query(None),
     radius: float = Query(500, description="Radius in metres (used with lng/lat)"),
+    min_score: float = Query(0.3, description="Only sites scoring above this"),
+    limit: int = Query(SIDE_SITE_PAGE_LIMIT, ge=1, le=SIDE_SITE_MAX_PAGE_LIMIT),
+    after: str = Query(None, description="'next' token from the previous page"),
+    profile: str = Query(None, description=f"Re-rank with a weight profile: {', '.join(PROFILES)}"),
+    weights: str = Query(None, description="Per-component weight overrides, e.g. rzlt:0.5,shape:0.1"),
 ):
-    """Detect side-site / infill development candidates within a bounding box or radius."""
+    """Side-site / infill development candidates within a bounding box or radius, best first.
+
+    With profile/weights the precomputed features are re-scored in memory (scoring.py)
+    instead of ordering by the stored score.
+    """
     if bbox:
         try:
             xmin, ymin, xmax, ymax = [float(v) for v in bbox.split(",")]
@@ -1202,34 +1156,34 @@ def get_side_sites(
     else:
         raise HTTPException(400, "Provide either bbox or lng+lat parameters")
 
-    conn = get_conn()
+    if profile or weights:
+        try:
+            resolved = parse_weights(profile, weights)
+            offset = int(after) if after else 0
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        return await rerank_side_sites((xmin, ymin, xmax, ymax), resolved, min_score, limit, offset)
+
+    params = [xmin, ymin, xmax, ymax, min_score]
+    if after:
+        try:
+            after_score, after_id = after.split(":")
+            params += [str(float(after_score)), int(after_id)]
+        except ValueError:
+            raise HTTPException(400, "after must be a 'next' token from a previous page")
+    params += [limit, limit]
+
     try:
-        with conn.cursor() as cur:
-            cur.execute("SET statement_timeout = '30s'")
-            cur.execute(SIDE_SITE_SQL, (xmin, ymin, xmax, ymax))
-            cols = [d[0] for d in cur.description]
-            rows = cur.fetchall()
-    except Exception as e:
-        conn.rollback()
+        async with connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(side_site_page_sql(keyset=bool(after)), params)
+                body = (await cur.fetchone())[0]
+    except psycopg.errors.UndefinedTable:
+        raise HTTPException(503, "Side-site scores not built yet (run scripts/build_side_site_scores.sh)")
+    except psycopg.Error as e:
         raise HTTPException(500, f"Side site query failed: {e}")
-    finally:
-        put_conn(conn)
-
-    features = []
-    for row in rows:
-        props = dict(zip(cols, row))
-        geom = props.pop("geometry", None)
-        features.append({
-            "type": "Feature",
-            "geometry": geom,
-            "properties": props,
-        })
 
-    return {
-        "type": "FeatureCollection",
-        "features": features,
-        "count": len(features),
-    }
+    return Response(content=bytes(body), media_type=GEOJSON_MEDIA_TYPE)
 
 
 # ── AI-powered analytics (Hypothesis-Driven Explore Pipeline) ────────────────
@@ -1237,9 +1191,12 @@ def get_side_sites(
 ALLOWED_TABLES = {
     "sold_properties", "cadastral_freehold", "cadastral_leasehold",
     "rzlt", "dlr_planning_polygons", "dlr_planning_points",
-    "census_small_areas", "urban_areas",
+    "census_small_areas", "urban_areas", "parcel_adjacency",
 }
 
+# Precomputed tables outside the layers registry; their build scripts bump table_versions
+DERIVED_TABLES = {"parcel_adjacency", "parcel_context", "side_site_scores"}
+
 SQL_BLOCKLIST = re.compile(
     r'\b(DROP|DELETE|INSERT|UPDATE|ALTER|CREATE|TRUNCATE|GRANT|REVOKE|COPY|EXECUTE|DO)\b',
     re.IGNORECASE,
@@ -1284,7 +1241,7 @@ CRITICAL SQL RULES:
 1. LIMIT to 50 rows max.
 2. Use NULLIF(x, 0) to prevent division by zero.
 3. Filter sale_price > 0 on sold_properties.
-4. For ST_DWithin with metre distances, cast to geography: ST_DWithin(a.geom::geography, b.geom::geography, 500)
+4. For ST_DWithin with metre distances, use the indexed ITM column: ST_DWithin(a.geom_itm, b.geom_itm, 500)
 5. Cadastral tables (2M+ rows): ALWAYS include a spatial filter.
 6. Never use column aliases in WHERE/HAVING — repeat the expression.
 7. You do NOT need geometry columns (no ST_AsGeoJSON, no lng/lat) — this is for stats, not map display.
@@ -1306,7 +1263,7 @@ CRITICAL SQL RULES:
 1. LIMIT to 50 rows max per query.
 2. Use NULLIF(x, 0) to prevent division by zero.
 3. Filter sale_price > 0 on sold_properties.
-4. For ST_DWithin with metre distances, cast to geography.
+4. For ST_DWithin with metre distances, use the indexed geom_itm column.
 5. Cadastral tables: ALWAYS include a spatial filter.
 6. Never use column aliases in WHERE/HAVING.
 7. You do NOT need geometry columns — this is for comparative stats, not map display.
@@ -1340,7 +1297,11 @@ TABLE: cadastral_freehold (land ownership parcels — ~2M rows, LARGE, geom is P
   nationalcadastralreference TEXT
   gml_id TEXT
   area_sqm NUMERIC
+  sa_pub2022 TEXT             -- census Small Area containing the parcel (join census_small_areas.sa_pub2022)
+  rzlt_ogc_fid INTEGER        -- RZLT zone on this parcel (join rzlt.ogc_fid); NULL = not on RZLT land
+  urban_area_code TEXT        -- urban area containing the parcel (join urban_areas.urban_area_code)
   geom GEOMETRY(Polygon, 4326)
+  -- Use these keys for equi-joins to census/RZLT/urban areas instead of ST_Intersects.
   -- SPATIAL INDEX on geom. ALWAYS use spatial filter (ST_MakeEnvelope or ST_DWithin) to avoid full table scans.
 
 TABLE: cadastral_leasehold (leasehold parcels — ~200k rows, geom is Polygon)
@@ -1410,6 +1371,14 @@ TABLE: census_small_areas (Census 2022 demographics by Small Area — ~4600 Dubl
   -- KEY USE: Cross-reference with other tables to enrich site analysis with demographics.
   -- Example: Find RZLT sites in areas with high vacancy rates, or parcels in high-density young-professional areas.
 
+TABLE: parcel_adjacency (precomputed parcel adjacency graph — one row per touching pair, both directions)
+  parcel_type TEXT            -- 'freehold' (joins cadastral_freehold) or 'leasehold' (cadastral_leasehold)
+  a INTEGER                   -- ogc_fid of a parcel
+  b INTEGER                   -- ogc_fid of a parcel touching it
+  shared_edge_m DOUBLE PRECISION  -- length of the shared boundary in metres (0 = corner touch)
+  PRIMARY KEY (parcel_type, a, b)
+  -- Use this instead of ST_Touches for neighbours: it's an index lookup, not a geometry test.
+
 TABLE: urban_areas (Urban area boundary polygons — ~11 Dublin rows, geom is Polygon)
   ogc_fid SERIAL PRIMARY KEY
   urban_area_name TEXT         -- e.g. 'Dublin City', 'Swords', 'Bray'
@@ -1419,37 +1388,39 @@ TABLE: urban_areas (Urban area boundary polygons — ~11 Dublin rows, geom is Po
 
 COORDINATE SYSTEMS:
 - All geometries stored in EPSG:4326 (WGS84)
-- For accurate distance/area calculations, use ST_Transform(geom, 2157) (Irish Transverse Mercator)
+- Every table also has geom_itm = ST_Transform(geom, 2157) (Irish Transverse Mercator, metres) with its own SPATIAL INDEX
+- For accurate distance/area calculations, use geom_itm instead of transforming geom
 - Dublin center is approximately (-6.26, 53.35)
 
 POSTGIS FUNCTIONS YOU CAN USE:
-- ST_DWithin(geog1, geog2, distance_metres) — use with ::geography cast for metre-based distance
-- ST_Area(ST_Transform(geom, 2157)) — area in square metres
+- ST_DWithin(a.geom_itm, b.geom_itm, distance_metres) — metre-based distance, uses the index
+- ST_Transform(ST_SetSRID(ST_MakePoint(lng, lat), 4326), 2157) — an ITM point to compare with geom_itm
+- ST_Area(geom_itm) — area in square metres
 - ST_Intersects(a.geom, b.geom) — spatial join between layers
 - ST_MakeEnvelope(xmin, ymin, xmax, ymax, 4326) — bounding box
 - ST_Centroid(geom) — centroid point of a polygon
 - ST_X(point), ST_Y(point) — extract coordinates from a POINT geometry
 - ST_AsGeoJSON(geom)::json — geometry as GeoJSON for frontend
 - ST_Buffer(geom::geography, distance_metres)::geometry — buffer around a geometry
-- ST_Perimeter(ST_Transform(geom, 2157)) — perimeter in metres (use EPSG:2157 for accuracy)
-- ST_Touches(a.geom, b.geom) — true if geometries share a boundary (adjacency detection)
+- ST_Perimeter(geom_itm) — perimeter in metres
+- ST_Touches(a.geom, b.geom) — true if geometries share a boundary (prefer parcel_adjacency for parcels)
 - ST_NPoints(geom) — number of vertices in a geometry
-- Compactness ratio: 4 * PI() * ST_Area(ST_Transform(geom, 2157)) / NULLIF(POWER(ST_Perimeter(ST_Transform(geom, 2157)), 2), 0) — 1.0 = circle, lower = elongated/irregular
+- Compactness ratio: 4 * PI() * ST_Area(geom_itm) / NULLIF(POWER(ST_Perimeter(geom_itm), 2), 0) — 1.0 = circle, lower = elongated/irregular
 
 SIDE SITE / INFILL DETECTION PATTERNS:
 Side sites are small parcels (80-500 sqm) between existing houses — high-value development opportunities.
 Key signals to combine:
 - Shape: compactness ratio < 0.5 indicates elongated/irregular shape (typical of side gardens)
 - Size: area_sqm BETWEEN 80 AND 500 (large enough to build, too small for existing house+garden)
-- Adjacency: COUNT of neighboring parcels via ST_Touches >= 2 (flanked by developed plots)
+- Adjacency: COUNT of neighboring parcels in parcel_adjacency >= 2 (flanked by developed plots)
 - No planning: LEFT JOIN planning tables IS NULL (no recent applications = likely undeveloped)
-- RZLT overlap: ST_Intersects with rzlt table (owner taxed 3%/year for not developing)
-- Residential context: census owner_occupied_pct > 50% in containing small area
+- RZLT overlap: f.rzlt_ogc_fid IS NOT NULL (owner taxed 3%/year for not developing)
+- Residential context: census owner_occupied_pct > 50% in the small area (JOIN census_small_areas cs ON cs.sa_pub2022 = f.sa_pub2022)
 Example pattern:
   WITH candidates AS (
     SELECT f.ogc_fid, f.nationalcadastralreference, f.area_sqm, f.geom,
-      4 * PI() * ST_Area(ST_Transform(f.geom, 2157))
-        / NULLIF(POWER(ST_Perimeter(ST_Transform(f.geom, 2157)), 2), 0) AS compactness
+      4 * PI() * ST_Area(f.geom_itm)
+        / NULLIF(POWER(ST_Perimeter(f.geom_itm), 2), 0) AS compactness
     FROM cadastral_freehold f
     WHERE f.geom && ST_MakeEnvelope(xmin, ymin, xmax, ymax, 4326)
       AND f.area_sqm BETWEEN 80 AND 500
@@ -1459,7 +1430,7 @@ Example pattern:
   FROM candidates c
   WHERE c.compactness < 0.5
   ORDER BY c.area_sqm DESC LIMIT 25;
-NOTE: For neighbor_count, use a lateral join or subquery with ST_Touches — but always include a spatial filter on the outer table first to avoid full scans."""
+NOTE: For neighbor_count, use (SELECT COUNT(*) FROM parcel_adjacency e WHERE e.parcel_type = 'freehold' AND e.a = f.ogc_fid) — and still spatially filter the outer table first."""
 
 HYPOTHESIS_PROMPT = f"""You are LandOS AI, an expert Dublin property & land development analyst.
 The user is a property developer. They ask questions. You answer them by forming hypotheses and writing SQL to test them.
@@ -1490,7 +1461,7 @@ CRITICAL SQL RULES (FOLLOW EXACTLY — violations cause runtime errors):
 
 7. When using CTEs that join tables, always qualify ambiguous column names with the table alias.
 
-8. For ST_DWithin with metre distances, cast to geography: ST_DWithin(a.geom::geography, b.geom::geography, 500)
+8. For ST_DWithin with metre distances, use the indexed ITM column: ST_DWithin(a.geom_itm, b.geom_itm, 500). Never cast to ::geography or ST_Transform inside ST_DWithin — that skips the spatial index.
 
 9. NEVER use GROUP BY with geometry columns directly. Instead, use a subquery or CTE to aggregate first, then join back to get geometry.
 
@@ -1631,7 +1602,7 @@ ERROR:
 SQL RULES:
 - Always SELECT ST_AsGeoJSON(geometry) AS geometry for spatial columns
 - Table/column names are lowercase
-- Use ST_Transform(geometry, 2157) for area/distance calculations (Irish TM)
+- Use the indexed geom_itm column (EPSG:2157, Irish TM) for area/distance calculations
 - Always include a geometry column in results
 - LIMIT 25 max
 - READ ONLY — no INSERT/UPDATE/DELETE
@@ -1670,7 +1641,7 @@ USER QUERY: {user_query}
 SQL RULES:
 - Always SELECT ST_AsGeoJSON(geometry) AS geometry
 - Table/column names are lowercase
-- Use ST_Transform(geometry, 2157) for area/distance
+- Use the indexed geom_itm column (EPSG:2157) for area/distance
 - LIMIT 25
 - Keep it simple — one table, minimal WHERE clauses
 - Focus on the most relevant table for the user's intent
@@ -1732,11 +1703,16 @@ async def call_gemini_with_prompt(system_prompt: str, messages: list, max_tokens
         },
     }
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        resp = await client.post(
-            f"{GEMINI_URL}?key={GEMINI_API_KEY}",
-            json=body,
-        )
+    # Identical prompt + conversation + model + config → reuse the earlier answer
+    cache = get_llm_cache()
+    key = cache_key(GEMINI_MODEL, system_prompt, gemini_contents, body["generationConfig"])
+    if cache:
+        # SQLite read under the cache lock: keep it off the event loop
+        cached = await run_in_threadpool(cache.get, key)
+        if cached is not None:
+            return cached
+
+    resp = await request_with_retry("gemini", "POST", f"{GEMINI_URL}?key={GEMINI_API_KEY}", json=body)
 
     if resp.status_code != 200:
         raise HTTPException(status_code=502, detail=f"Gemini API error: {resp.status_code}")
@@ -1745,12 +1721,17 @@ async def call_gemini_with_prompt(system_prompt: str, messages: list, max_tokens
     text = data["candidates"][0]["content"]["parts"][0]["text"]
 
     try:
-        return json.loads(text)
+        result = json.loads(text)
     except json.JSONDecodeError:
         match = re.search(r'\{.*\}', text, re.DOTALL)
-        if match:
-            return json.loads(match.group())
-        return {}
+        if not match:
+            return {}
+        result = json.loads(match.group())
+
+    # Only cache usable answers; an empty/unparseable reply is retried next time
+    if cache and result:
+        await run_in_threadpool(cache.put, key, result)
+    return result
 
 
 def validate_sql(sql: str) -> str | None:
@@ -1777,6 +1758,64 @@ def validate_sql(sql: str) -> str | None:
     return None
 
 
+# Quoted literals/identifiers, whitespace runs, or anything else
+SQL_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+SQL_TIGHT_PUNCTUATION = set("(),;=<>")
+
+
+def normalize_sql(sql: str) -> str:
+    """Canonical form of a query for cache keys.
+
+    Lowercases everything outside quotes, collapses whitespace and drops it next to
+    brackets, commas and comparison operators. String literals and quoted identifiers
+    are kept byte-for-byte, so queries that differ only in a literal never collide.
+    """
+    parts = []
+    for token in SQL_TOKEN_RE.findall(sql.strip().rstrip(";").strip()):
+        if token[0] in "'\"":
+            parts.append(token)
+        elif token.isspace():
+            parts.append(" ")
+        else:
+            parts.append(token.lower())
+    out = []
+    for i, part in enumerate(parts):
+        if part == " ":
+            prev_char = out[-1][-1] if out else ""
+            next_char = parts[i + 1][0] if i + 1 < len(parts) else ""
+            if prev_char in SQL_TIGHT_PUNCTUATION or next_char in SQL_TIGHT_PUNCTUATION:
+                continue
+        out.append(part)
+    return "".join(out)
+
+
+def referenced_tables(sql: str) -> list[str]:
+    return sorted((ALLOWED_TABLES | DERIVED_TABLES) & set(re.findall(r'\b(\w+)\b', sql.lower())))
+
+
+async def hypothesis_cache_key(sql: str) -> str | None:
+    """Normalized SQL plus the version of every table it touches, or None if one has none.
+
+    Reloading a layer bumps its data_version, an incremental merge its change_version, and
+    rebuilding a derived table its table_versions row, which retires exactly the cached
+    results that read it; results over other tables stay valid. Queries touching a table
+    with no version at all are not cached, since nothing would ever retire them.
+    """
+    versions = {
+        entry["table_name"]: [entry["data_version"], entry["change_version"]]
+        for entry in (await get_registry()).values()
+    }
+    derived = await get_table_versions()
+    tables = referenced_tables(sql)
+    key_versions = {}
+    for table in tables:
+        version = derived.get(table) if table in DERIVED_TABLES else versions.get(table)
+        if version is None:
+            return None
+        key_versions[table] = version
+    return cache_key(normalize_sql(sql), key_versions)
+
+
 POINT_TABLES = {"sold_properties", "dlr_planning_points"}
 
 
@@ -1831,8 +1870,8 @@ def compile_query_plan(plan: dict) -> str:
         center = spatial.get("center", {})
         radius = spatial.get("radius_m", 500)
         where_parts.append(
-            f"ST_DWithin({table}.geom::geography, "
-            f"ST_SetSRID(ST_MakePoint({center.get('lng', -6.26)}, {center.get('lat', 53.35)}), 4326)::geography, "
+            f"ST_DWithin({table}.geom_itm, "
+            f"ST_Transform(ST_SetSRID(ST_MakePoint({center.get('lng', -6.26)}, {center.get('lat', 53.35)}), 4326), 2157), "
             f"{radius})"
         )
 
@@ -1867,60 +1906,63 @@ def compile_query_plan(plan: dict) -> str:
     return sql
 
 
-def execute_hypothesis_sql(sql: str) -> dict:
-    """Execute a single SQL query safely. Returns {rows: [...], error: str|None, row_count: int}."""
+async def fetch_read_only(conn: psycopg.AsyncConnection, query: str) -> tuple[list[str], list[tuple]]:
+    """Run one query in its own READ ONLY transaction with a 10s statement timeout."""
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute("SET TRANSACTION READ ONLY")
+            await cur.execute("SET LOCAL statement_timeout = '10s'")
+            await cur.execute(query)
+            return [col.name for col in cur.description], await cur.fetchall()
+
+
+async def execute_hypothesis_sql(sql: str, semaphore: asyncio.Semaphore | None = None) -> dict:
+    """Execute a single SQL query safely. Returns {rows: [...], error: str|None, row_count: int}.
+
+    Successful results are cached (see hypothesis_cache_key); a cached hit returns at once
+    with "cached": True and never waits for the semaphore.
+    """
     # Validate
     error = validate_sql(sql)
     if error:
         return {"rows": [], "error": error, "row_count": 0}
 
+    cache = get_sql_cache()
+    key = await hypothesis_cache_key(sql) if cache else None
+    if key:
+        # SQLite read under the cache lock: keep it off the event loop
+        cached = await run_in_threadpool(cache.get, key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    async with semaphore or nullcontext():
+        result = await run_hypothesis_sql(sql)
+    if key and not result["error"]:
+        await run_in_threadpool(cache.put, key, result)
+    return result
+
+
+async def run_hypothesis_sql(sql: str) -> dict:
+
     # Strip trailing semicolons (common Gemini output that breaks subquery wrapping)
     clean_sql = sql.strip().rstrip(";")
 
     # Wrap with row limit
     wrapped_sql = f"SELECT * FROM ({clean_sql}) AS _hypothesis_result LIMIT 25"
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SET statement_timeout = '10s'")
-            cur.execute("BEGIN READ ONLY")
+        async with connection() as conn:
             try:
-                cur.execute(wrapped_sql)
-                columns = [desc[0] for desc in cur.description]
-                raw_rows = cur.fetchall()
-            except Exception as e:
-                cur.execute("ROLLBACK")
-                cur.execute("RESET statement_timeout")
+                columns, raw_rows = await fetch_read_only(conn, wrapped_sql)
+            except psycopg.Error:
                 # Try executing without wrapper (some CTEs don't wrap well)
-                try:
-                    cur.execute("BEGIN READ ONLY")
-                    limited_sql = clean_sql
-                    if "LIMIT" not in clean_sql.upper()[-30:]:
-                        limited_sql = clean_sql + " LIMIT 25"
-                    cur.execute(limited_sql)
-                    columns = [desc[0] for desc in cur.description]
-                    raw_rows = cur.fetchall()
-                except Exception as e2:
-                    cur.execute("ROLLBACK")
-                    cur.execute("RESET statement_timeout")
-                    put_conn(conn)
-                    return {"rows": [], "error": str(e2)[:300], "row_count": 0}
-            finally:
-                try:
-                    cur.execute("ROLLBACK")
-                    cur.execute("RESET statement_timeout")
-                except Exception:
-                    pass
+                limited_sql = clean_sql
+                if "LIMIT" not in clean_sql.upper()[-30:]:
+                    limited_sql = clean_sql + " LIMIT 25"
+                columns, raw_rows = await fetch_read_only(conn, limited_sql)
     except Exception as e:
-        try:
-            put_conn(conn)
-        except Exception:
-            pass
         return {"rows": [], "error": str(e)[:300], "row_count": 0}
 
-    put_conn(conn)
-
     # Process rows into dicts
     rows = []
     for raw_row in raw_rows:
@@ -2068,6 +2110,95 @@ async def generate_fallback_hypothesis(user_query: str) -> dict | None:
 
 # ── Intent Router & Handlers ─────────────────────────────────────────────────
 
+# ── Concurrent hypothesis query execution ──────────────────────────────────
+
+# Max hypothesis queries one chat request runs against the database at once
+HYPOTHESIS_QUERY_CONCURRENCY = int(os.getenv("HYPOTHESIS_QUERY_CONCURRENCY", "4"))
+MAX_SQL_RETRIES = 2
+
+
+def hypothesis_query_sql(query: dict) -> str:
+    """Return the query's SQL, compiling its query_plan (and storing the result) if needed."""
+    sql = query.get("sql", "")
+    query_plan = query.get("query_plan")
+    if query_plan and not sql.strip():
+        sql = compile_query_plan(query_plan)
+        query["sql"] = sql  # store compiled SQL for debugging/evaluation
+    return sql
+
+
+
+
+async def execute_queries(queries: list[dict], semaphore: asyncio.Semaphore) -> tuple[int, int]:
+    """Run every query with SQL concurrently, storing q["result"]. Returns (total, successful)."""
+    runnable = [q for q in queries if hypothesis_query_sql(q).strip()]
+    results = await asyncio.gather(*(execute_hypothesis_sql(q["sql"], semaphore) for q in runnable))
+    for q, result in zip(runnable, results):
+        q["result"] = result
+    return len(runnable), sum(1 for r in results if not r.get("error"))
+
+
+async def run_agentic_query(
+    hypothesis: dict,
+    query: dict,
+    semaphore: asyncio.Semaphore,
+    emit: Callable[[str, dict], None],
+) -> int:
+    """Execute one hypothesis query, asking Gemini to fix errors or broaden empty results.
+
+    Stores query["result"], reports retries through emit(event, data) and returns the
+    number of attempts. Only uncached database execution counts against the semaphore.
+    """
+    sql = query["sql"]
+    result = None
+    attempts = 0
+    for attempt in range(MAX_SQL_RETRIES + 1):
+        result = await execute_hypothesis_sql(sql, semaphore)
+        attempts += 1
+
+        # Case 1: SQL error — ask Gemini to fix it
+        if result.get("error") and attempt < MAX_SQL_RETRIES:
+            emit("tool_action", {
+                "action": "sql_retry",
+                "attempt": attempt + 1,
+                "error": result["error"][:200],
+                "hypothesis": hypothesis.get("name", ""),
+            })
+            try:
+                fix = await retry_failed_sql(sql, result["error"])
+                new_sql = fix.get("corrected_sql", "")
+                if new_sql.strip():
+                    sql = new_sql
+                    continue  # retry with corrected SQL
+            except Exception:
+                pass
+            break  # couldn't get a fix from Gemini
+
+        # Case 2: Empty results — ask Gemini to broaden
+        elif result["row_count"] == 0 and not result.get("error") and attempt == 0:
+            emit("tool_action", {
+                "action": "sql_broaden",
+                "hypothesis": hypothesis.get("name", ""),
+                "description": query.get("description", ""),
+            })
+            try:
+                broader = await broaden_empty_sql(sql, query.get("description", ""))
+                new_sql = broader.get("corrected_sql", "")
+                if new_sql.strip():
+                    sql = new_sql
+                    continue  # retry with broadened SQL
+            except Exception:
+                pass
+            break  # couldn't broaden
+
+        # Case 3: Success or exhausted retries
+        else:
+            break
+
+    query["result"] = result
+    return attempts
+
+
 async def route_intent(messages: list[ChatMessage]) -> dict:
     """Lightweight Gemini call to classify user intent."""
     result = await call_gemini_with_prompt(
@@ -2115,7 +2246,7 @@ async def handle_stat_question(messages: list[ChatMessage], map_context: MapCont
     if not sql.strip():
         return {"type": "stat_answer", "message": "I couldn't form a query for that. Try rephrasing?", "stats": []}
 
-    query_result = execute_hypothesis_sql(sql)
+    query_result = await execute_hypothesis_sql(sql)
     if query_result.get("error"):
         return {"type": "stat_answer", "message": f"Query failed: {query_result['error'][:200]}. Try rephrasing your question.", "stats": []}
 
@@ -2162,17 +2293,11 @@ async def handle_area_comparison(messages: list[ChatMessage], map_context: MapCo
     result = await call_gemini_with_prompt(prompt, messages, max_tokens=2048)
     queries = result.get("queries", [])
 
+    total, successful = await execute_queries(queries, asyncio.Semaphore(HYPOTHESIS_QUERY_CONCURRENCY))
     all_rows = []
-    total = 0
-    successful = 0
     for q in queries:
-        sql = q.get("sql", "")
-        if sql.strip():
-            q["result"] = execute_hypothesis_sql(sql)
-            total += 1
-            if not q["result"].get("error"):
-                successful += 1
-                all_rows.extend(q["result"]["rows"])
+        if q.get("result") and not q["result"].get("error"):
+            all_rows.extend(q["result"]["rows"])
 
     if not all_rows:
         return {
@@ -2289,7 +2414,7 @@ def build_flat_results(hypotheses: list[dict], evaluation: dict) -> list[dict]:
     site_picks = evaluation.get("sites", [])
     results = []
 
-    for rank, pick in enumerate(site_picks):
+    for position, pick in enumerate(site_picks):
         h_idx = pick.get("hypothesis_index", 0)
         q_idx = pick.get("query_index", 0)
         r_idx = pick.get("row_index", 0)
@@ -2320,7 +2445,7 @@ def build_flat_results(hypotheses: list[dict], evaluation: dict) -> list[dict]:
         except (IndexError, KeyError):
             tagged_table = None
         row["_table"] = tagged_table if tagged_table in ALLOWED_TABLES else infer_table(row)
-        row["_rank"] = rank
+        row["_rank"] = position
         results.append(row)
 
     # Fallback: if evaluation didn't pick sites, gather the best from each hypothesis
@@ -2412,6 +2537,16 @@ def determine_object_type(evaluation: dict, results: list[dict]) -> tuple[str, l
     return obj_type, available_views, choropleth_metric, heatmap_weight_column
 
 
+@app.get("/api/ai/cache")
+async def get_llm_cache_stats():
+    """Return Gemini response and hypothesis SQL cache hit/miss counts and occupancy."""
+    llm_cache, sql_cache = get_llm_cache(), get_sql_cache()
+    return {
+        "llm": {"enabled": True, **(await run_in_threadpool(llm_cache.stats))} if llm_cache else {"enabled": False},
+        "sql": {"enabled": True, **(await run_in_threadpool(sql_cache.stats))} if sql_cache else {"enabled": False},
+    }
+
+
 @app.post("/api/ai/chat")
 async def ai_chat(req: ChatRequest):
     """AI-powered property analytics chat with intent routing.
@@ -2469,24 +2604,11 @@ async def ai_chat(req: ChatRequest):
     # site_search, follow_up, site_detail → full 3-phase hypothesis pipeline
     hypotheses = await generate_hypotheses(req.messages, req.map_context, conv_ctx)
 
-    # Phase 2: Execute all SQL queries safely (supports both raw SQL and query plans)
-    total_queries = 0
-    successful_queries = 0
-    for hypothesis in hypotheses:
-        for query in hypothesis.get("sql_queries", []):
-            sql = query.get("sql", "")
-            query_plan = query.get("query_plan")
-
-            # Compile query plan to SQL if no raw SQL provided
-            if query_plan and not sql.strip():
-                sql = compile_query_plan(query_plan)
-                query["sql"] = sql  # store compiled SQL for debugging/evaluation
-
-            if sql.strip():
-                query["result"] = execute_hypothesis_sql(sql)
-                total_queries += 1
-                if not query["result"].get("error"):
-                    successful_queries += 1
+    # Phase 2: Execute all SQL queries concurrently (supports both raw SQL and query plans)
+    total_queries, successful_queries = await execute_queries(
+        [q for h in hypotheses for q in h.get("sql_queries", [])],
+        asyncio.Semaphore(HYPOTHESIS_QUERY_CONCURRENCY),
+    )
 
     # Phase 3: Evaluate results and rank best sites
     evaluation = await evaluate_hypotheses(user_query, hypotheses)
@@ -2613,77 +2735,55 @@ async def ai_chat_stream(req: ChatRequest):
             "names": [h.get("name", "") for h in hypotheses],
         })
 
-        # Phase 2: Execute SQL with agentic retry loop
+        # Phase 2: Execute SQL with agentic retry loop, all queries concurrently.
+        # Workers push SSE events onto a queue; None marks a finished query.
         yield sse("status", {"phase": "executing", "message": "Testing hypotheses against the database..."})
-        total_queries = 0
-        successful_queries = 0
-        MAX_SQL_RETRIES = 2
-
-        for h_idx, hypothesis in enumerate(hypotheses):
-            for q_idx, query in enumerate(hypothesis.get("sql_queries", [])):
-                sql = query.get("sql", "")
-                query_plan = query.get("query_plan")
-                if query_plan and not sql.strip():
-                    sql = compile_query_plan(query_plan)
-                    query["sql"] = sql
-                if not sql.strip():
-                    continue
-
-                # Agentic retry loop
-                result = None
-                for attempt in range(MAX_SQL_RETRIES + 1):
-                    result = execute_hypothesis_sql(sql)
-                    total_queries += 1
-
-                    # Case 1: SQL error — ask Gemini to fix it
-                    if result.get("error") and attempt < MAX_SQL_RETRIES:
-                        yield sse("tool_action", {
-                            "action": "sql_retry",
-                            "attempt": attempt + 1,
-                            "error": result["error"][:200],
-                            "hypothesis": hypothesis.get("name", ""),
-                        })
-                        try:
-                            fix = await retry_failed_sql(sql, result["error"])
-                            new_sql = fix.get("corrected_sql", "")
-                            if new_sql.strip():
-                                sql = new_sql
-                                continue  # retry with corrected SQL
-                        except Exception:
-                            pass
-                        break  # couldn't get a fix from Gemini
-
-                    # Case 2: Empty results — ask Gemini to broaden
-                    elif result["row_count"] == 0 and not result.get("error") and attempt == 0:
-                        yield sse("tool_action", {
-                            "action": "sql_broaden",
-                            "hypothesis": hypothesis.get("name", ""),
-                            "description": query.get("description", ""),
-                        })
-                        try:
-                            broader = await broaden_empty_sql(sql, query.get("description", ""))
-                            new_sql = broader.get("corrected_sql", "")
-                            if new_sql.strip():
-                                sql = new_sql
-                                continue  # retry with broadened SQL
-                        except Exception:
-                            pass
-                        break  # couldn't broaden
-
-                    # Case 3: Success or exhausted retries
-                    else:
-                        break
+        semaphore = asyncio.Semaphore(HYPOTHESIS_QUERY_CONCURRENCY)
+        events: asyncio.Queue = asyncio.Queue()
+
+        def emit(event_type: str, data: dict):
+            events.put_nowait((event_type, data))
 
-                query["result"] = result
-                if result and not result.get("error"):
-                    successful_queries += 1
-                    yield sse("query_complete", {
+        async def run_query(h_idx: int, q_idx: int, hypothesis: dict, query: dict) -> int:
+            try:
+                attempts = await run_agentic_query(hypothesis, query, semaphore, emit)
+                if not query["result"].get("error"):
+                    emit("query_complete", {
                         "hypothesis_index": h_idx,
                         "query_index": q_idx,
                         "hypothesis_total": len(hypotheses),
-                        "row_count": result["row_count"],
+                        "row_count": query["result"]["row_count"],
                         "description": query.get("description", ""),
+                        "cached": query["result"].get("cached", False),
                     })
+                return attempts
+            finally:
+                events.put_nowait(None)
+
+        tasks = [
+            asyncio.create_task(run_query(h_idx, q_idx, hypothesis, query))
+            for h_idx, hypothesis in enumerate(hypotheses)
+            for q_idx, query in enumerate(hypothesis.get("sql_queries", []))
+            if hypothesis_query_sql(query).strip()
+        ]
+        try:
+            running = len(tasks)
+            while running:
+                event = await events.get()
+                if event is None:
+                    running -= 1
+                else:
+                    yield sse(*event)
+            attempts = await asyncio.gather(*tasks)
+        finally:
+            # Client went away mid-stream: stop the remaining queries
+            for task in tasks:
+                task.cancel()
+        total_queries = sum(attempts)
+        successful_queries = sum(
+            1 for h in hypotheses for q in h.get("sql_queries", [])
+            if q.get("result") and not q["result"].get("error")
+        )
 
         # Quality check: if too few results, try a fallback hypothesis
         total_rows = sum(
@@ -2700,13 +2800,9 @@ async def ai_chat_stream(req: ChatRequest):
             try:
                 fallback = await generate_fallback_hypothesis(user_query)
                 if fallback:
-                    for q in fallback.get("sql_queries", []):
-                        fb_sql = q.get("sql", "")
-                        if fb_sql.strip():
-                            q["result"] = execute_hypothesis_sql(fb_sql)
-                            total_queries += 1
-                            if not q["result"].get("error"):
-                                successful_queries += 1
+                    fb_total, fb_successful = await execute_queries(fallback.get("sql_queries", []), semaphore)
+                    total_queries += fb_total
+                    successful_queries += fb_successful
                     hypotheses.append(fallback)
             except Exception:
                 pass
@@ -2718,13 +2814,9 @@ async def ai_chat_stream(req: ChatRequest):
             try:
                 fallback = await generate_fallback_hypothesis(user_query)
                 if fallback:
-                    for q in fallback.get("sql_queries", []):
-                        fb_sql = q.get("sql", "")
-                        if fb_sql.strip():
-                            q["result"] = execute_hypothesis_sql(fb_sql)
-                            total_queries += 1
-                            if not q["result"].get("error"):
-                                successful_queries += 1
+                    fb_total, fb_successful = await execute_queries(fallback.get("sql_queries", []), semaphore)
+                    total_queries += fb_total
+                    successful_queries += fb_successful
                     hypotheses.append(fallback)
             except Exception:
                 pass
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(Path(__file__).parent / ".llm_cache.sqlite"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(6 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+# Hypothesis SQL results. Keys include each touched table's data_version, so a long TTL is safe.
+SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", "")
+SQL_CACHE_TTL_S = float(os.getenv("SQL_CACHE_TTL_S", str(24 * 3600)))
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "1000"))
+
+# Prune expired/overflow rows from SQLite every N puts rather than on every write
+PRUNE_EVERY = 100
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (dict key order doesn't matter)."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of JSON-serializable values, optionally persisted to SQLite.
+
+    Values are stored as JSON text, so every get() returns a fresh copy the caller can
+    mutate. With a path, entries survive restarts and are shared by API workers.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._puts = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_created_at ON entries (created_at)")
+
+    def get(self, key: str) -> Any | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT expires_at, value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return json.loads(entry[1])
+
+    def put(self, key: str, value: Any):
+        now = time.time()
+        entry = (now + self.ttl_s, json.dumps(value, default=str))
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (key, entry[1], entry[0], now),
+                )
+                self._puts += 1
+                if self._puts % PRUNE_EVERY == 0:
+                    self._prune(now)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            persisted = (
+                self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] if self._db is not None else None
+            )
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self._memory),
+                "persisted_entries": persisted,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+            }
+
+    def _remember(self, key: str, entry: tuple[float, str]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key: str):
+        self._memory.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _prune(self, now: float):
+        self._db.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        self._db.execute(
+            "DELETE FROM entries WHERE key IN "
+            "(SELECT key FROM entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+_llm_cache: ResponseCache | None = None
+
+
+def get_llm_cache() -> ResponseCache | None:
+    """Return the Gemini response cache, or None when LLM_CACHE_TTL_S is 0 (disabled)."""
+    global _llm_cache
+    if _llm_cache is None and LLM_CACHE_TTL_S > 0:
+        _llm_cache = ResponseCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_S, LLM_CACHE_PATH or None)
+    return _llm_cache
+
+
+_sql_cache: ResponseCache | None = None
+
+
+def get_sql_cache() -> ResponseCache | None:
+    """Return the hypothesis SQL result cache, or None when SQL_CACHE_TTL_S is 0 (disabled)."""
+    global _sql_cache
+    if _sql_cache is None and SQL_CACHE_TTL_S > 0:
+        _sql_cache = ResponseCache(SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL_S, SQL_CACHE_PATH or None)
+    return _sql_cache
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import numpy as np
+
+from db import connection
+from layers import get_table_versions
+
+# Without a side_site_scores table_versions row, how long the in-process matrix is trusted.
+FEATURE_MATRIX_TTL_S = 300
+
+FEATURES_SQL = """
+SELECT id, lng, lat, area_sqm, compactness, neighbor_count, has_planning, on_rzlt,
+       COALESCE(owner_occupied_pct, 0)
+FROM side_site_scores
+ORDER BY id
+"""
+
+COMPONENTS = ("size", "shape", "neighbors", "no_planning", "rzlt", "residential")
+
+# Weight profiles over COMPONENTS. "default" reproduces side_site_scores.score.
+PROFILES = {
+    "default": {"size": 0.20, "shape": 0.20, "neighbors": 0.15, "no_planning": 0.15, "rzlt": 0.15, "residential": 0.15},
+    "rzlt": {"size": 0.15, "shape": 0.10, "neighbors": 0.10, "no_planning": 0.15, "rzlt": 0.40, "residential": 0.10},
+    "infill": {"size": 0.20, "shape": 0.30, "neighbors": 0.30, "no_planning": 0.10, "rzlt": 0.0, "residential": 0.10},
+    "residential": {"size": 0.20, "shape": 0.15, "neighbors": 0.15, "no_planning": 0.10, "rzlt": 0.0, "residential": 0.40},
+}
+
+_matrix: dict[str, np.ndarray] = {}
+_matrix_version: int | None = None
+_loaded_at = 0.0
+_lock = asyncio.Lock()
+
+
+def matrix_from_rows(rows: list[tuple]) -> dict[str, np.ndarray]:
+    """Columnar feature arrays plus each scoring component, computed once per load."""
+    cols = list(zip(*rows)) if rows else [()] * 9
+    ids, lng, lat, area, compactness, neighbors, has_planning, on_rzlt, owner_occupied = cols
+    area = np.asarray(area, dtype=np.float64)
+    # NULL compactness (degenerate perimeter) scores like a compact parcel
+    compactness = np.asarray([1.0 if c is None else c for c in compactness], dtype=np.float64)
+    neighbors = np.asarray(neighbors, dtype=np.int32)
+
+    # Same piecewise curves as scripts/build_side_site_scores.sh
+    size = np.where(
+        (area >= 150) & (area <= 350), 1.0,
+        np.where(area < 150, (area - 80.0) / 70.0, (500.0 - area) / 150.0),
+    )
+    shape = np.where(compactness < 0.3, 1.0, np.where(compactness < 0.5, (0.5 - compactness) / 0.2, 0.0))
+    neighbor_score = np.select([neighbors >= 3, neighbors == 2, neighbors == 1], [1.0, 0.7, 0.3], 0.0)
+
+    return {
+        "id": np.asarray(ids, dtype=np.int64),
+        "lng": np.asarray(lng, dtype=np.float64),
+        "lat": np.asarray(lat, dtype=np.float64),
+        "size": size,
+        "shape": shape,
+        "neighbors": neighbor_score,
+        "no_planning": 1.0 - np.asarray(has_planning, dtype=np.float64),
+        "rzlt": np.asarray(on_rzlt, dtype=np.float64),
+        "residential": np.where(np.asarray(owner_occupied, dtype=np.float64) > 50, 1.0, 0.3),
+    }
+
+
+async def load_feature_matrix() -> dict[str, np.ndarray]:
+    async with connection() as conn:
+        cur = await conn.execute(FEATURES_SQL)
+        return matrix_from_rows(await cur.fetchall())
+
+
+async def get_feature_matrix() -> dict[str, np.ndarray]:
+    """Return the cached side-site feature matrix, re-read when side_site_scores' table_versions row moves.
+
+    A rebuild bumps that row, so the matrix follows it within the table_versions TTL; a table
+    built before table_versions existed is re-read every FEATURE_MATRIX_TTL_S instead.
+    """
+    global _matrix, _matrix_version, _loaded_at
+    version = (await get_table_versions()).get("side_site_scores")
+    async with _lock:
+        if version is None:
+            stale = time.monotonic() - _loaded_at > FEATURE_MATRIX_TTL_S
+        else:
+            stale = version != _matrix_version
+        if stale:
+            _matrix = await load_feature_matrix()
+            _matrix_version, _loaded_at = version, time.monotonic()
+        return _matrix
+
+
+def parse_weights(profile: str | None, weights: str | None) -> dict[str, float]:
+    """Resolve a named profile, optionally overridden by "component:weight,..." pairs."""
+    if profile and profile not in PROFILES:
+        raise ValueError(f"profile must be one of {', '.join(PROFILES)}")
+    resolved = dict(PROFILES[profile or "default"])
+    for pair in (weights or "").split(","):
+        if not pair.strip():
+            continue
+        name, _, value = pair.partition(":")
+        name = name.strip()
+        if name not in COMPONENTS:
+            raise ValueError(f"weights components must be among {', '.join(COMPONENTS)}")
+        resolved[name] = float(value)
+    return resolved
+
+
+def rank(
+    matrix: dict[str, np.ndarray],
+    weights: dict[str, float],
+    bbox: tuple[float, float, float, float],
+    min_score: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Score every candidate centred in the bbox; return (ids, scores) best first."""
+    west, south, east, north = bbox
+    inside = (matrix["lng"] >= west) & (matrix["lng"] <= east) & (matrix["lat"] >= south) & (matrix["lat"] <= north)
+    idx = np.flatnonzero(inside)
+
+    scores = np.zeros(idx.size)
+    for name, weight in weights.items():
+        if weight:
+            scores += weight * matrix[name][idx]
+
+    keep = scores > min_score
+    idx, scores = idx[keep], scores[keep]
+    # Highest score first, ties by id descending (the same order as the SQL keyset path)
+    order = np.lexsort((-matrix["id"][idx], -scores))
+    return matrix["id"][idx][order], scores[order]
@@ -0,0 +1,129 @@
+"""Pre-render vector tiles for every registered layer into the SQLite tile archive.
+
+Run from the backend directory:
+    python seed_tiles.py                      # all layers, Dublin, zooms 10-17
+    python seed_tiles.py --changed-only       # reseed whole layers whose data_version moved
+    python seed_tiles.py --layers rzlt urban_areas --maxzoom 15
+
+The API serves archived tiles first (see tile_archive.py), so a seeded layer costs
+zero database hits until a loader bumps its data_version.
+
+--changed-only picks layers, not tiles: a layer whose data_version moved is dropped
+from the archive and every tile of it in the bbox/zoom range is rendered again,
+since a full reload gives no record of where the data changed. Incremental planning
+merges (ingest_planning.py) re-render only the tiles around each change instead.
+"""
+import argparse
+import time
+from multiprocessing import Pool
+
+import psycopg
+
+from db import connect
+from layers import read_registry
+from tile_archive import TILE_ARCHIVE_PATH, open_archive, read_coverage, tms_row, write_coverage
+from tiles import tile_bytes, tile_query, tiles_in_bbox
+
+# Matches DUBLIN_W/S/E/N in scripts/load_data.sh
+DUBLIN_BBOX = (-6.45, 53.22, -6.05, 53.45)
+
+COMMIT_EVERY = 500
+PROGRESS_EVERY_S = 2.0
+
+_worker_layers: dict[str, dict] = {}
+_worker_conn: psycopg.Connection | None = None
+
+
+def init_worker(registry: dict[str, dict]):
+    # One sync connection per worker process; the API's async pool isn't used here
+    global _worker_layers, _worker_conn
+    _worker_layers = registry
+    _worker_conn = connect()
+
+
+def render_task(task: tuple[str, int, int, int]) -> tuple[str, int, int, int, bytes]:
+    layer, z, x, y = task
+    query = tile_query(_worker_layers[layer], z, x, y)
+    data = tile_bytes(_worker_conn.execute(*query).fetchone()) if query else b""
+    return layer, z, x, y, data
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Seed the vector tile archive.")
+    parser.add_argument("--output", default=TILE_ARCHIVE_PATH, help="archive path (default: %(default)s)")
+    parser.add_argument("--layers", nargs="*", help="layer names to seed (default: every registered layer)")
+    parser.add_argument("--bbox", type=float, nargs=4, default=DUBLIN_BBOX, metavar=("W", "S", "E", "N"))
+    parser.add_argument("--minzoom", type=int, default=10)
+    parser.add_argument("--maxzoom", type=int, default=17)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--changed-only", action="store_true",
+        help="skip layers already seeded at their current data_version (others are reseeded in full)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with connect() as conn:
+        registry = read_registry(conn)
+    names = args.layers or list(registry)
+    unknown = [n for n in names if n not in registry]
+    if unknown:
+        raise SystemExit(f"Unknown layers: {', '.join(unknown)}")
+
+    db = open_archive(args.output)
+    coverage = read_coverage(db)
+    if args.changed_only:
+        names = [n for n in names if coverage.get(n, {}).get("version") != registry[n]["data_version"]]
+    if not names:
+        print("==> Archive is up to date.")
+        return
+
+    west, south, east, north = args.bbox
+    tasks = []
+    for name in names:
+        # Drop the layer's coverage first so the API never serves half-seeded tiles
+        write_coverage(db, name, None)
+        db.execute("DELETE FROM tiles WHERE layer = ?", (name,))
+        for z in range(max(args.minzoom, registry[name]["min_zoom"]), args.maxzoom + 1):
+            tasks.extend((name, *t) for t in tiles_in_bbox(west, south, east, north, z))
+    db.commit()
+    print(f"==> Seeding {len(tasks)} tiles for {', '.join(names)} with {args.workers} workers...")
+
+    started = last_report = time.monotonic()
+    done = stored = 0
+    with Pool(args.workers, initializer=init_worker, initargs=(registry,)) as pool:
+        for layer, z, x, y, data in pool.imap_unordered(render_task, tasks, chunksize=32):
+            done += 1
+            if data:
+                db.execute(
+                    "INSERT OR REPLACE INTO tiles (layer, zoom_level, tile_column, tile_row, tile_data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (layer, z, x, tms_row(z, y), data),
+                )
+                stored += 1
+            if done % COMMIT_EVERY == 0:
+                db.commit()
+            now = time.monotonic()
+            if now - last_report > PROGRESS_EVERY_S:
+                print(f"    {done}/{len(tasks)} tiles, {done / (now - started):.0f} tiles/s")
+                last_report = now
+
+    for name in names:
+        write_coverage(db, name, {
+            "version": registry[name]["data_version"],
+            "bbox": [west, south, east, north],
+            "minzoom": args.minzoom,
+            "maxzoom": args.maxzoom,
+        })
+    db.commit()
+    db.close()
+
+    elapsed = time.monotonic() - started
+    print(f"==> Done: {done} tiles ({stored} non-empty) in {elapsed:.1f}s, {done / max(elapsed, 1e-9):.0f} tiles/s")
+    print(f"    Archive: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
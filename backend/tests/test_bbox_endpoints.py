@@ -0,0 +1,54 @@
+"""The bbox GeoJSON endpoints resolve their source table per zoom without a database."""
+import pytest
+from fastapi.testclient import TestClient
+
+import layers
+import main
+
+REGISTRY = {
+    "cadastral_freehold": {"table_name": "cadastral_freehold", "generalized_zooms": [12, 14, 16]},
+    "census_small_areas": {"table_name": "census_small_areas", "generalized_zooms": [12, 14, 16]},
+}
+
+BBOX = "-6.3,53.3,-6.2,53.4"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    tables = []
+
+    async def fake_registry():
+        return REGISTRY
+
+    async def fake_feature_collection(table, properties, bbox, **kwargs):
+        tables.append(table)
+        return b'{"type":"FeatureCollection","features":[],"next":null}'
+
+    monkeypatch.setattr(layers, "get_registry", fake_registry)
+    monkeypatch.setattr(main, "query_feature_collection", fake_feature_collection)
+    # No context manager: the lifespan (pool, HTTP clients) is not started
+    test_client = TestClient(main.app)
+    test_client.tables = tables
+    return test_client
+
+
+@pytest.mark.parametrize("path, zoom, table", [
+    ("/api/parcels", None, "cadastral_freehold"),
+    ("/api/parcels", 13, "cadastral_freehold_z14"),
+    ("/api/parcels", 17, "cadastral_freehold"),
+    # Not registered: always the full table
+    ("/api/parcels_leasehold", None, "cadastral_leasehold"),
+    ("/api/parcels_leasehold", 13, "cadastral_leasehold"),
+    ("/api/census_small_areas", None, "census_small_areas"),
+    ("/api/census_small_areas", 11.5, "census_small_areas_z12"),
+])
+def test_bbox_endpoint_source_table(client, path, zoom, table):
+    params = {"bbox": BBOX} if zoom is None else {"bbox": BBOX, "zoom": zoom}
+    response = client.get(path, params=params)
+    assert response.status_code == 200
+    assert client.tables == [table]
+
+
+@pytest.mark.parametrize("path", ["/api/parcels", "/api/parcels_leasehold", "/api/census_small_areas"])
+def test_bbox_endpoint_rejects_bad_bbox(client, path):
+    assert client.get(path, params={"bbox": "1,2,3"}).status_code == 400
@@ -0,0 +1,39 @@
+"""AI query exports run before the response starts, so a bad query is a 400, not a cut stream."""
+import psycopg
+import pytest
+from fastapi.testclient import TestClient
+
+import export
+import main
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_stream_features(query, params, fmt, **kwargs):
+        calls.append(params)
+        if "boom" in query.as_string(None):
+            raise psycopg.errors.UndefinedColumn('column "boom" does not exist')
+        yield b'{"type":"Feature"}\n'
+
+    monkeypatch.setattr(export, "stream_features", fake_stream_features)
+    return calls
+
+
+def post(sql):
+    # No context manager: the lifespan (pool, HTTP clients) is not started
+    return TestClient(main.app).post("/api/export/query", json={"sql": sql})
+
+
+def test_query_error_is_a_400(calls):
+    response = post("SELECT boom FROM rzlt")
+    assert response.status_code == 400
+    assert "boom" in response.json()["detail"]
+
+
+def test_literal_percent_is_not_a_placeholder(calls):
+    response = post("SELECT * FROM rzlt WHERE site_name ILIKE '%Dub%'")
+    assert response.status_code == 200
+    assert response.content == b'{"type":"Feature"}\n'
+    assert calls == [None]
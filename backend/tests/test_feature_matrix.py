@@ -0,0 +1,54 @@
+"""The side-site feature matrix reloads when side_site_scores' table_versions row moves."""
+import asyncio
+
+import pytest
+
+import scoring
+
+ROWS = [(1, -6.25, 53.35, 200.0, 0.2, 3, False, True, 60.0)]
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    versions = {"side_site_scores": 1}
+    calls = []
+
+    async def fake_table_versions():
+        return versions
+
+    async def fake_load():
+        calls.append(versions.get("side_site_scores"))
+        return scoring.matrix_from_rows(ROWS)
+
+    monkeypatch.setattr(scoring, "get_table_versions", fake_table_versions)
+    monkeypatch.setattr(scoring, "load_feature_matrix", fake_load)
+    monkeypatch.setattr(scoring, "_matrix_version", None)
+    monkeypatch.setattr(scoring, "_loaded_at", 0.0)
+    return versions, calls
+
+
+def get():
+    return asyncio.run(scoring.get_feature_matrix())
+
+
+def test_reloads_only_on_version_change(loads):
+    versions, calls = loads
+    get()
+    get()
+    assert calls == [1]
+
+    versions["side_site_scores"] = 2
+    get()
+    assert calls == [1, 2]
+
+
+def test_unversioned_table_falls_back_to_ttl(loads, monkeypatch):
+    versions, calls = loads
+    versions.clear()
+    get()
+    get()
+    assert calls == [None]
+
+    monkeypatch.setattr(scoring, "_loaded_at", scoring._loaded_at - scoring.FEATURE_MATRIX_TTL_S - 1)
+    get()
+    assert calls == [None, None]
@@ -0,0 +1,47 @@
+"""Hypothesis SQL cache keys follow every table version and skip unversioned tables."""
+import asyncio
+
+import pytest
+
+import main
+
+REGISTRY = {
+    "cadastral_freehold": {"table_name": "cadastral_freehold", "data_version": 3, "change_version": 0},
+    "rzlt": {"table_name": "rzlt", "data_version": 1, "change_version": 0},
+}
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    derived = {"parcel_context": 1}
+
+    async def fake_registry():
+        return REGISTRY
+
+    async def fake_table_versions():
+        return derived
+
+    monkeypatch.setattr(main, "get_registry", fake_registry)
+    monkeypatch.setattr(main, "get_table_versions", fake_table_versions)
+    return derived
+
+
+def key(sql):
+    return asyncio.run(main.hypothesis_cache_key(sql))
+
+
+def test_layer_query_is_cached(versions):
+    assert key("SELECT * FROM cadastral_freehold") == key("select *  from CADASTRAL_FREEHOLD;")
+
+
+def test_derived_table_rebuild_retires_key(versions):
+    sql = "SELECT * FROM parcel_context pc JOIN cadastral_freehold p ON p.ogc_fid = pc.parcel_id"
+    before = key(sql)
+    assert before is not None
+    versions["parcel_context"] = 2
+    assert key(sql) != before
+
+
+def test_unversioned_table_is_not_cached(versions):
+    assert key("SELECT * FROM side_site_scores") is None
+    assert key("SELECT * FROM parcel_adjacency") is None
@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from tiles import lonlat_to_tile
+
+TILE_ARCHIVE_PATH = os.getenv("TILE_ARCHIVE_PATH", str(Path(__file__).parent / "tile_archive.sqlite"))
+
+# Borrows the MBTiles table layout but keys tiles by layer too, so every layer shares
+# one file; MBTiles readers can't open it (it's only read by TileArchive below)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    layer TEXT NOT NULL,
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    tile_data BLOB NOT NULL,
+    PRIMARY KEY (layer, zoom_level, tile_column, tile_row)
+);
+"""
+
+
+def tms_row(z: int, y: int) -> int:
+    # Rows are stored in TMS order (origin bottom-left), as in MBTiles
+    return 2 ** z - 1 - y
+
+
+def open_archive(path: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")
+    db.executescript(SCHEMA)
+    db.execute("INSERT OR IGNORE INTO metadata (name, value) VALUES ('format', 'pbf')")
+    return db
+
+
+def read_coverage(db: sqlite3.Connection) -> dict[str, dict]:
+    """Per-layer seeding record: {layer: {version, bbox, minzoom, maxzoom}}."""
+    rows = db.execute("SELECT name, value FROM metadata WHERE name LIKE 'layer:%'").fetchall()
+    return {name.split(":", 1)[1]: json.loads(value) for name, value in rows}
+
+
+def write_coverage(db: sqlite3.Connection, layer: str, coverage: dict | None):
+    if coverage is None:
+        db.execute("DELETE FROM metadata WHERE name = ?", (f"layer:{layer}",))
+    else:
+        db.execute(
+            "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+            (f"layer:{layer}", json.dumps(coverage)),
+        )
+
+
+class TileArchive:
+    """Read-only view of the pre-seeded SQLite tile archive (one tile table shared by all layers).
+
+    Empty tiles aren't stored: a tile inside a layer's seeded bbox/zoom range that has no
+    row is known to be empty, so the API answers it without touching PostGIS. A layer's
+    tiles are only used while the archive was seeded at the layer's current data_version.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = open_archive(path, readonly=True)
+        self._data_version = None
+        self._coverage: dict[str, dict] = {}
+
+    def get(self, layer: str, version: int, z: int, x: int, y: int) -> bytes | None:
+        """Return the archived tile (b"" for a known-empty tile), or None if not covered."""
+        with self._lock:
+            self._refresh()
+            cov = self._coverage.get(layer)
+            if not cov or cov["version"] != version or not cov["minzoom"] <= z <= cov["maxzoom"]:
+                return None
+            west, south, east, north = cov["bbox"]
+            x0, y0 = lonlat_to_tile(west, north, z)
+            x1, y1 = lonlat_to_tile(east, south, z)
+            if not (x0 <= x <= x1 and y0 <= y <= y1):
+                return None
+            row = self._db.execute(
+                "SELECT tile_data FROM tiles WHERE layer = ? AND zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (layer, z, x, tms_row(z, y)),
+            ).fetchone()
+        return bytes(row[0]) if row else b""
+
+    def _refresh(self):
+        # PRAGMA data_version changes whenever another connection (the seeder) commits
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._coverage = read_coverage(self._db)
+            self._data_version = data_version
+
+
+_archive: TileArchive | None = None
+
+
+def get_tile_archive() -> TileArchive | None:
+    """Return the seeded tile archive, or None if TILE_ARCHIVE_PATH doesn't exist."""
+    global _archive
+    if _archive is None and TILE_ARCHIVE_PATH and os.path.exists(TILE_ARCHIVE_PATH):
+        _archive = TileArchive(TILE_ARCHIVE_PATH)
+    return _archive
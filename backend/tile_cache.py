@@ -0,0 +1,142 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+TILE_CACHE_PATH = os.getenv("TILE_CACHE_PATH", str(Path(__file__).parent / ".tile_cache.sqlite"))
+TILE_CACHE_MAX_BYTES = int(os.getenv("TILE_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Only rewrite last_access on a hit when it is older than this (keeps hits read-only)
+ACCESS_RESOLUTION_S = 60
+# Evict down to this fraction of the budget so eviction doesn't run on every put
+EVICT_TARGET_RATIO = 0.9
+
+
+def tile_etag(version: int, data: bytes) -> str:
+    return f'"{version}-{hashlib.sha1(data).hexdigest()[:16]}"'
+
+
+class TileCache:
+    """On-disk LRU tile store keyed by layer/z/x/y, tagged with the layer's data_version.
+
+    A tile cached under an older data_version is treated as a miss and dropped, so a
+    loader bumping `layers.data_version` invalidates the layer without an API restart.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tiles (
+                layer TEXT NOT NULL,
+                z INTEGER NOT NULL,
+                x INTEGER NOT NULL,
+                y INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                etag TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (layer, z, x, y)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tiles_last_access ON tiles (last_access)")
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+        self._versions: dict[str, int] = {}
+
+    def get(self, layer: str, version: int, z: int, x: int, y: int) -> tuple[bytes, str] | None:
+        """Return (tile, etag) if cached for this data_version, else None."""
+        with self._lock:
+            self._purge_stale(layer, version)
+            row = self._db.execute(
+                "SELECT data, etag, last_access FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                (layer, z, x, y),
+            ).fetchone()
+            if row is None:
+                return None
+            data, etag, last_access = row
+            now = time.time()
+            if now - last_access > ACCESS_RESOLUTION_S:
+                self._db.execute(
+                    "UPDATE tiles SET last_access = ? WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                    (now, layer, z, x, y),
+                )
+            return bytes(data), etag
+
+    def put(self, layer: str, version: int, z: int, x: int, y: int, data: bytes) -> str:
+        """Store a rendered tile and return its ETag. Evicts least-recently-used tiles over budget."""
+        etag = tile_etag(version, data)
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                (layer, z, x, y),
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO tiles (layer, z, x, y, version, data, etag, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (layer, z, x, y, version, data, etag, len(data), time.time()),
+            )
+            self._total_bytes += len(data) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return etag
+
+    def invalidate(self, layer: str, tiles: list[tuple[int, int, int]] | None = None):
+        """Drop cached tiles for a layer — all of them, or just the given (z, x, y) list."""
+        with self._lock:
+            if tiles is None:
+                self._db.execute("DELETE FROM tiles WHERE layer = ?", (layer,))
+            else:
+                self._db.executemany(
+                    "DELETE FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                    [(layer, z, x, y) for z, x, y in tiles],
+                )
+            self._recount()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        return {"tiles": count, "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+    def _purge_stale(self, layer: str, version: int):
+        # Runs once per observed version change, not per request
+        if self._versions.get(layer) == version:
+            return
+        self._db.execute("DELETE FROM tiles WHERE layer = ? AND version <> ?", (layer, version))
+        self._versions[layer] = version
+        self._recount()
+
+    def _evict(self):
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        while self._total_bytes > target:
+            victims = self._db.execute(
+                "SELECT layer, z, x, y, size FROM tiles ORDER BY last_access LIMIT 500"
+            ).fetchall()
+            if not victims:
+                break
+            self._db.executemany(
+                "DELETE FROM tiles WHERE layer = ? AND z = ? AND x = ? AND y = ?",
+                [v[:4] for v in victims],
+            )
+            self._total_bytes -= sum(v[4] for v in victims)
+
+    def _recount(self):
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM tiles").fetchone()[0]
+
+
+_cache: TileCache | None = None
+
+
+def get_tile_cache() -> TileCache | None:
+    """Return the process-wide tile cache, or None when TILE_CACHE_PATH is empty (disabled)."""
+    global _cache
+    if _cache is None and TILE_CACHE_PATH:
+        _cache = TileCache(TILE_CACHE_PATH, TILE_CACHE_MAX_BYTES)
+    return _cache
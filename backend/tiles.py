@@ -0,0 +1,103 @@
+import math
+
+from psycopg import sql
+
+from db import connection
+from layers import table_for_zoom
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+# Short max-age + ETag: browsers revalidate cheaply and pick up reloads within minutes
+TILE_CACHE_CONTROL = "public, max-age=300"
+TILE_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+# Postgres types ST_AsMVT can't encode natively are cast before encoding
+NUMERIC_TYPES = {"numeric"}
+TEXT_CAST_TYPES = {"date", "timestamp without time zone", "timestamp with time zone", "json", "jsonb"}
+
+
+def tile_in_range(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def lonlat_to_tile(lng: float, lat: float, z: int) -> tuple[int, int]:
+    """Return the XYZ tile containing a WGS84 point at zoom z."""
+    n = 2 ** z
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(west: float, south: float, east: float, north: float, z: int):
+    """Yield every (z, x, y) tile intersecting a WGS84 bounding box."""
+    x0, y0 = lonlat_to_tile(west, north, z)
+    x1, y1 = lonlat_to_tile(east, south, z)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield z, x, y
+
+
+def property_expr(column: str, data_type: str) -> sql.Composable:
+    col = sql.SQL("t.{}").format(sql.Identifier(column))
+    if data_type in NUMERIC_TYPES:
+        col = sql.SQL("{}::float8").format(col)
+    elif data_type in TEXT_CAST_TYPES:
+        col = sql.SQL("{}::text").format(col)
+    return sql.SQL("{} AS {}").format(col, sql.Identifier(column))
+
+
+def build_tile_sql(layer: dict, table: str) -> sql.Composed:
+    """Build the ST_AsMVT query for a registered layer from its `layers` metadata."""
+    columns = [
+        sql.SQL("t.{} AS mvt_id").format(sql.Identifier(layer["id_column"])),
+        *(property_expr(c, layer["column_types"][c]) for c in layer["tile_columns"]),
+    ]
+    return sql.SQL(
+        """
+        WITH bounds AS (
+            SELECT
+                ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS env,
+                ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => %(margin)s), 4326) AS filter_env
+        ),
+        mvtgeom AS (
+            SELECT
+                {columns},
+                ST_AsMVTGeom(ST_Transform(t.geom, 3857), bounds.env, {extent}, {buffer}, true) AS geom
+            FROM {table} t, bounds
+            WHERE t.geom && bounds.filter_env
+        )
+        SELECT ST_AsMVT(mvtgeom, %(layer)s, {extent}, 'geom', 'mvt_id')
+        FROM mvtgeom
+        WHERE geom IS NOT NULL
+        """
+    ).format(
+        columns=sql.SQL(", ").join(columns),
+        table=sql.Identifier(table),
+        extent=sql.Literal(MVT_EXTENT),
+        buffer=sql.Literal(MVT_BUFFER),
+    )
+
+
+def tile_query(layer: dict, z: int, x: int, y: int) -> tuple[sql.Composed, dict] | None:
+    """Return (query, params) for one tile, or None if the tile is empty below min_zoom.
+
+    Reads the layer's generalized table for this zoom when one exists.
+    """
+    if z < layer["min_zoom"]:
+        return None
+    params = {"z": z, "x": x, "y": y, "margin": MVT_BUFFER / MVT_EXTENT, "layer": layer["name"]}
+    return build_tile_sql(layer, table_for_zoom(layer, z)), params
+
+
+def tile_bytes(row: tuple | None) -> bytes:
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+async def render_tile(layer: dict, z: int, x: int, y: int) -> bytes:
+    """Render one Mapbox Vector Tile for a registered layer."""
+    query = tile_query(layer, z, x, y)
+    if query is None:
+        return b""
+    async with connection() as conn:
+        cur = await conn.execute(*query)
+        return tile_bytes(await cur.fetchone())
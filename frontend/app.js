@@ -1,5 +1,8 @@
 const API = "http://localhost:8000/api";
+const TILES = "http://localhost:8000/tiles";
 const PARCEL_MIN_ZOOM = 15;
+const PARCEL_TILE_MIN_ZOOM = 14; // tiles use simplified geometry below full detail
+const TILE_MAX_ZOOM = 17; // beyond this MapLibre overzooms the last tile
 
 // ── Circle analysis state ────────────────────────────────────────────────────
 let circleMode = false;
@@ -54,18 +57,25 @@ document.getElementById("basemap-toggle").addEventListener("click", () => {
   document.getElementById("basemap-icon-map").style.display = isSatellite ? "" : "none";
 });
 
-// ── GeoJSON sources + layers for cadastral parcels ───────────────────────────
+// ── Vector tile sources + layers for cadastral parcels ───────────────────────
+function parcelTileSource(layerName) {
+  return {
+    type: "vector",
+    tiles: [`${TILES}/${layerName}/{z}/{x}/{y}.mvt`],
+    minzoom: PARCEL_TILE_MIN_ZOOM,
+    maxzoom: TILE_MAX_ZOOM,
+  };
+}
+
 map.on("load", () => {
   // Freehold — orange
-  map.addSource("cadastral-freehold", {
-    type: "geojson",
-    data: { type: "FeatureCollection", features: [] },
-  });
+  map.addSource("cadastral-freehold", parcelTileSource("cadastral_freehold"));
 
   map.addLayer({
     id: "cadastral_freehold-fill",
     type: "fill",
     source: "cadastral-freehold",
+    "source-layer": "cadastral_freehold",
     paint: {
       "fill-color": "rgba(255, 165, 0, 0.15)",
       "fill-outline-color": "rgba(255, 140, 0, 0)",
@@ -76,6 +86,7 @@ map.on("load", () => {
     id: "cadastral_freehold-outline",
     type: "line",
     source: "cadastral-freehold",
+    "source-layer": "cadastral_freehold",
     paint: {
       "line-color": "#ff8c00",
       "line-width": 1,
@@ -86,6 +97,7 @@ map.on("load", () => {
     id: "cadastral_freehold-selected",
     type: "fill",
     source: "cadastral-freehold",
+    "source-layer": "cadastral_freehold",
     filter: ["==", ["id"], -1],
     paint: {
       "fill-color": "rgba(255, 200, 0, 0.4)",
@@ -94,15 +106,13 @@ map.on("load", () => {
   });
 
   // Leasehold — blue
-  map.addSource("cadastral-leasehold", {
-    type: "geojson",
-    data: { type: "FeatureCollection", features: [] },
-  });
+  map.addSource("cadastral-leasehold", parcelTileSource("cadastral_leasehold"));
 
   map.addLayer({
     id: "cadastral_leasehold-fill",
     type: "fill",
     source: "cadastral-leasehold",
+    "source-layer": "cadastral_leasehold",
     paint: {
       "fill-color": "rgba(100, 149, 237, 0.15)",
       "fill-outline-color": "rgba(100, 149, 237, 0)",
@@ -113,6 +123,7 @@ map.on("load", () => {
     id: "cadastral_leasehold-outline",
     type: "line",
     source: "cadastral-leasehold",
+    "source-layer": "cadastral_leasehold",
     paint: {
       "line-color": "#6495ed",
       "line-width": 1,
@@ -123,6 +134,7 @@ map.on("load", () => {
     id: "cadastral_leasehold-selected",
     type: "fill",
     source: "cadastral-leasehold",
+    "source-layer": "cadastral_leasehold",
     filter: ["==", ["id"], -1],
     paint: {
       "fill-color": "rgba(100, 200, 255, 0.4)",
@@ -573,6 +585,32 @@ map.on("load", () => {
   loadLayers();
 });
 
+// ── Paged bbox GeoJSON (keyset pages linked by `next`) ───────────────────────
+const MAX_BBOX_PAGES = 10;
+const bboxLoadGeneration = {}; // sourceId → counter; a newer viewport load stops older paging
+
+async function loadPagedGeoJSON(sourceId, url, label) {
+  const generation = (bboxLoadGeneration[sourceId] || 0) + 1;
+  bboxLoadGeneration[sourceId] = generation;
+  const features = [];
+  let next = null;
+  try {
+    for (let page = 0; page < MAX_BBOX_PAGES; page++) {
+      const pageUrl = next == null ? url : `${url}${url.includes("?") ? "&" : "?"}after=${encodeURIComponent(next)}`;
+      const geojson = await fetch(pageUrl).then((r) => r.json());
+      if (bboxLoadGeneration[sourceId] !== generation) return;
+      features.push(...(geojson.features || []));
+      // Render each page as it arrives
+      const src = map.getSource(sourceId);
+      if (src) src.setData({ type: "FeatureCollection", features });
+      next = geojson.next;
+      if (next == null) return;
+    }
+  } catch (err) {
+    console.error(`Failed to load ${label}:`, err);
+  }
+}
+
 // ── Load parcels for current viewport ───────────────────────────────────────
 let parcelLoadTimer = null;
 
@@ -588,56 +626,17 @@ function loadParcels() {
     bounds.getNorth().toFixed(6),
   ].join(",");
 
-  // Cadastral parcels (freehold + leasehold) — only show above zoom 15
-  if (zoom < PARCEL_MIN_ZOOM) {
-    const srcF = map.getSource("cadastral-freehold");
-    const srcL = map.getSource("cadastral-leasehold");
-    if (srcF) srcF.setData({ type: "FeatureCollection", features: [] });
-    if (srcL) srcL.setData({ type: "FeatureCollection", features: [] });
-  } else {
-    // Freehold
-    if (isLayerVisible("cadastral_freehold")) {
-      fetch(`${API}/parcels?bbox=${bbox}`)
-        .then((r) => r.json())
-        .then((geojson) => {
-          const src = map.getSource("cadastral-freehold");
-          if (src) src.setData(geojson);
-        })
-        .catch((err) => console.error("Failed to load freehold parcels:", err));
-    }
-
-    // Leasehold
-    if (isLayerVisible("cadastral_leasehold")) {
-      fetch(`${API}/parcels_leasehold?bbox=${bbox}`)
-        .then((r) => r.json())
-        .then((geojson) => {
-          const src = map.getSource("cadastral-leasehold");
-          if (src) src.setData(geojson);
-        })
-        .catch((err) => console.error("Failed to load leasehold parcels:", err));
-    }
-  }
+  // Cadastral parcels (freehold + leasehold) are vector tile sources —
+  // MapLibre requests and caches their tiles itself (zoom 14+).
 
   // RZLT (visible at all zoom levels)
   if (isLayerVisible("rzlt")) {
-    fetch(`${API}/rzlt?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("rzlt");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load RZLT:", err));
+    loadPagedGeoJSON("rzlt", `${API}/rzlt?bbox=${bbox}`, "RZLT");
   }
 
   // DLR Planning Applications — polygons (zoom 13+)
   if (zoom >= 13 && isLayerVisible("dlr_planning_polygons")) {
-    fetch(`${API}/planning_apps?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("dlr-planning-polygons");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load DLR planning polygons:", err));
+    loadPagedGeoJSON("dlr-planning-polygons", `${API}/planning_apps?bbox=${bbox}`, "DLR planning polygons");
   } else if (zoom < 13) {
     const srcPoly = map.getSource("dlr-planning-polygons");
     if (srcPoly) srcPoly.setData({ type: "FeatureCollection", features: [] });
@@ -645,13 +644,7 @@ function loadParcels() {
 
   // DLR Planning Applications — points (zoom 12+)
   if (zoom >= 12 && isLayerVisible("dlr_planning_points")) {
-    fetch(`${API}/planning_apps_points?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("dlr-planning-points");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load DLR planning points:", err));
+    loadPagedGeoJSON("dlr-planning-points", `${API}/planning_apps_points?bbox=${bbox}`, "DLR planning points");
   } else if (zoom < 12) {
     const srcPts = map.getSource("dlr-planning-points");
     if (srcPts) srcPts.setData({ type: "FeatureCollection", features: [] });
@@ -659,13 +652,7 @@ function loadParcels() {
 
   // Census Small Areas (zoom 12+)
   if (zoom >= 12 && isLayerVisible("census_small_areas")) {
-    fetch(`${API}/census_small_areas?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("census-small-areas");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load census small areas:", err));
+    loadPagedGeoJSON("census-small-areas", `${API}/census_small_areas?bbox=${bbox}&zoom=${Math.floor(zoom)}`, "census small areas");
   } else if (zoom < 12) {
     const srcCensus = map.getSource("census-small-areas");
     if (srcCensus) srcCensus.setData({ type: "FeatureCollection", features: [] });
@@ -673,35 +660,17 @@ function loadParcels() {
 
   // Urban Areas (all zoom levels when visible)
   if (isLayerVisible("urban_areas")) {
-    fetch(`${API}/urban_areas?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("urban-areas");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load urban areas:", err));
+    loadPagedGeoJSON("urban-areas", `${API}/urban_areas?bbox=${bbox}`, "urban areas");
   }
 
   // SD LAP Boundaries (all zoom levels when visible)
   if (isLayerVisible("sd_lap_boundaries")) {
-    fetch(`${API}/lap_boundaries?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("sd-lap-boundaries");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load SD LAP boundaries:", err));
+    loadPagedGeoJSON("sd-lap-boundaries", `${API}/lap_boundaries?bbox=${bbox}`, "SD LAP boundaries");
   }
 
   // SD Planning Register (zoom 13+)
   if (zoom >= 13 && isLayerVisible("sd_planning_register")) {
-    fetch(`${API}/sd_planning_register?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("sd-planning-register");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load SD planning register:", err));
+    loadPagedGeoJSON("sd-planning-register", `${API}/sd_planning_register?bbox=${bbox}`, "SD planning register");
   } else if (zoom < 13) {
     const srcSD = map.getSource("sd-planning-register");
     if (srcSD) srcSD.setData({ type: "FeatureCollection", features: [] });
@@ -709,13 +678,7 @@ function loadParcels() {
 
   // Sold Properties — points (zoom 13+)
   if (zoom >= 13 && isLayerVisible("sold_properties")) {
-    fetch(`${API}/sold_properties?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("sold-properties");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load sold properties:", err));
+    loadPagedGeoJSON("sold-properties", `${API}/sold_properties?bbox=${bbox}`, "sold properties");
   } else if (zoom < 13) {
     const srcSold = map.getSource("sold-properties");
     if (srcSold) srcSold.setData({ type: "FeatureCollection", features: [] });
@@ -723,13 +686,7 @@ function loadParcels() {
 
   // Side Sites — infill candidates (zoom 15+ like parcels)
   if (zoom >= PARCEL_MIN_ZOOM && isLayerVisible("side_sites")) {
-    fetch(`${API}/side_sites?bbox=${bbox}`)
-      .then((r) => r.json())
-      .then((geojson) => {
-        const src = map.getSource("side-sites");
-        if (src) src.setData(geojson);
-      })
-      .catch((err) => console.error("Failed to load side sites:", err));
+    loadPagedGeoJSON("side-sites", `${API}/side_sites?bbox=${bbox}`, "side sites");
   } else if (zoom < PARCEL_MIN_ZOOM) {
     const srcSide = map.getSource("side-sites");
     if (srcSide) srcSide.setData({ type: "FeatureCollection", features: [] });
@@ -754,14 +711,71 @@ map.on("zoomend", scheduleParcels);
 function updateZoomHint(zoom) {
   const hint = document.getElementById("zoom-hint");
   const zoomLevel = Math.round(zoom * 10) / 10;
-  if (zoom < PARCEL_MIN_ZOOM) {
-    hint.textContent = `Zoom in to see parcels (zoom ${PARCEL_MIN_ZOOM}+) · Zoom: ${zoomLevel}`;
+  if (zoom < PARCEL_TILE_MIN_ZOOM) {
+    hint.textContent = `Zoom in to see parcels (zoom ${PARCEL_TILE_MIN_ZOOM}+) · Zoom: ${zoomLevel}`;
   } else {
     hint.textContent = `Zoom: ${zoomLevel}`;
   }
   hint.style.opacity = "1";
 }
 
+// ── Enriched parcel details (batch prefetch + single fetch) ──────────────────
+const enrichedParcelCache = new Map(); // "freehold:123" → enriched payload
+const ENRICHED_BATCH_SIZE = 500;
+
+function fetchEnrichedParcel(id, parcelType) {
+  const cached = enrichedParcelCache.get(`${parcelType}:${id}`);
+  if (cached) return Promise.resolve(cached);
+  return fetch(`${API}/parcel/${id}/enriched?parcel_type=${parcelType}`).then((r) => {
+    if (!r.ok) throw new Error(`Error ${r.status}`);
+    return r.json();
+  });
+}
+
+// Stream enrichment for a list of parcels from POST /parcels/enriched (NDJSON)
+async function prefetchEnrichedParcels(parcelType, ids) {
+  const todo = [...new Set(ids)].filter((id) => !enrichedParcelCache.has(`${parcelType}:${id}`));
+  for (let i = 0; i < todo.length; i += ENRICHED_BATCH_SIZE) {
+    const resp = await fetch(`${API}/parcels/enriched`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ parcel_type: parcelType, ids: todo.slice(i, i + ENRICHED_BATCH_SIZE) }),
+    });
+    if (!resp.ok) return;
+
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split("\n");
+      buffer = lines.pop(); // keep incomplete line in buffer
+      for (const line of lines) {
+        if (!line) continue;
+        const data = JSON.parse(line);
+        if (data.parcel) enrichedParcelCache.set(`${parcelType}:${data.parcel.id}`, data);
+      }
+    }
+  }
+}
+
+function prefetchResultParcels(results) {
+  const byType = { freehold: [], leasehold: [] };
+  results.forEach((r) => {
+    const id = r.ogc_fid || r.id;
+    if (!id) return;
+    if (r._table === "cadastral_freehold") byType.freehold.push(id);
+    else if (r._table === "cadastral_leasehold") byType.leasehold.push(id);
+  });
+  Object.entries(byType).forEach(([parcelType, ids]) => {
+    if (ids.length > 0) {
+      prefetchEnrichedParcels(parcelType, ids).catch((e) => console.warn("Enrichment prefetch failed:", e));
+    }
+  });
+}
+
 // ── Parcel click (works for both freehold and leasehold) ─────────────────────
 function setupParcelClick(fillLayerId, selectedLayerId, parcelType) {
   map.on("click", fillLayerId, (e) => {
@@ -777,10 +791,18 @@ function setupParcelClick(fillLayerId, selectedLayerId, parcelType) {
     map.setFilter(selectedLayerId, ["==", ["id"], id]);
 
     // Fetch enriched details and open flyout
-    fetch(`${API}/parcel/${id}/enriched?parcel_type=${parcelType}`)
-      .then((r) => r.json())
+    fetchEnrichedParcel(id, parcelType)
       .then((data) => showEnrichedParcelFlyout(data))
-      .catch(() => showParcelFlyout(props));
+      .catch(() =>
+        showParcelFlyout({
+          id,
+          national_ref: props.nationalcadastralreference,
+          inspire_id: props.gml_id,
+          area_sqm: props.area_sqm != null ? Math.round(props.area_sqm * 10) / 10 : null,
+          area_acres: props.area_sqm != null ? Math.round((props.area_sqm / 4046.86) * 1000) / 1000 : null,
+          type: parcelType,
+        })
+      );
   });
 
   map.on("mouseenter", fillLayerId, () => {
@@ -1824,7 +1846,7 @@ function renderLayerPanel(layers) {
       if (!visible) {
         // Clear source data when hiding
         const src = map.getSource(sourceName);
-        if (src) src.setData({ type: "FeatureCollection", features: [] });
+        if (src && src.setData) src.setData({ type: "FeatureCollection", features: [] });
       } else {
         // Reload data when showing
         loadParcels();
@@ -3365,8 +3387,7 @@ function selectAiResult(idx, results) {
   } else if (table === "cadastral_freehold" || table === "cadastral_leasehold") {
     const parcelId = result.ogc_fid || result.id;
     const pType = table === "cadastral_freehold" ? "freehold" : "leasehold";
-    fetch(`${API}/parcel/${parcelId}/enriched?parcel_type=${pType}`)
-      .then((r) => r.json())
+    fetchEnrichedParcel(parcelId, pType)
       .then((data) => showEnrichedParcelFlyout(data))
       .catch(() => showParcelFlyout({
         id: parcelId,
@@ -3420,6 +3441,7 @@ function renderRealization(data) {
   agentMapState.results = results;
   agentMapState.choroplethMetric = data.choropleth_metric || null;
   agentMapState.heatmapWeightColumn = data.heatmap_weight_column || null;
+  prefetchResultParcels(results);
 
   if (objType === "polygon_highlights") {
     renderPolygonHighlightsRealization(results);
@@ -0,0 +1,46 @@
+#!/usr/bin/env bash
+# LandOS — Add an indexed EPSG:2157 (ITM) copy of the geometry to spatial tables
+# Run from the project root: bash scripts/add_itm_geometry.sh [table ...]
+# (defaults to every table the API runs metre-based radius queries against)
+#
+# Adds geom_itm = ST_Transform(geom, 2157) as a STORED generated column with its
+# own GiST index. Radius queries can then use ST_DWithin(geom_itm, <ITM point>, r),
+# which is an index lookup, instead of ST_Transform(geom, 2157) per row, which is
+# a full table scan. Safe to re-run; loaders call it after (re)creating a table.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+
+set -e
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+
+TABLES=("$@")
+if [ ${#TABLES[@]} -eq 0 ]; then
+  TABLES=(
+    cadastral_freehold cadastral_leasehold sold_properties census_small_areas
+    dlr_planning_polygons dlr_planning_points rzlt urban_areas
+  )
+fi
+
+for TABLE in "${TABLES[@]}"; do
+  EXISTS=$(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -A \
+    -c "SELECT to_regclass('public.$TABLE') IS NOT NULL;")
+  if [ "$EXISTS" != "t" ]; then
+    echo "==> Skipping $TABLE (table not loaded)"
+    continue
+  fi
+
+  echo "==> Adding indexed ITM geometry to $TABLE..."
+  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1 <<SQL
+ALTER TABLE $TABLE
+  ADD COLUMN IF NOT EXISTS geom_itm geometry(Geometry, 2157)
+  GENERATED ALWAYS AS (ST_Transform(geom, 2157)) STORED;
+CREATE INDEX IF NOT EXISTS idx_${TABLE}_geom_itm ON $TABLE USING GIST (geom_itm);
+ANALYZE $TABLE;
+SQL
+done
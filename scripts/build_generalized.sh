@@ -0,0 +1,131 @@
+#!/usr/bin/env bash
+# LandOS — Build zoom-level generalized copies of polygon layers
+# Run from the project root: bash scripts/build_generalized.sh [--schema shadow] [table ...]
+# (defaults to cadastral_freehold cadastral_leasehold census_small_areas)
+#
+# For each table and each zoom level below, creates <table>_z<zoom> with every
+# attribute column and geometry simplified (ST_SimplifyPreserveTopology) then
+# snapped to a grid. Tolerances are ~half a screen pixel at that zoom, so the
+# tile and bbox endpoints can serve <table>_z<zoom> for any request at or below
+# that zoom without visible loss. The levels are recorded in
+# layers.generalized_zooms and the layer's data_version is bumped. Each copy is
+# built and indexed in the shadow schema and only then moved over the live one,
+# so tiles keep being served from the previous copy while it builds.
+#
+# With --schema shadow the copies are built from shadow.<table> (a reload that
+# has not been swapped in yet) and left in the shadow schema; swap_shadow_table()
+# (scripts/shadow_tables.sh) then moves them into public together with the table,
+# so the live table and its generalized copies always come from the same load.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+#   - The source tables already loaded (load_data.sh / load_census.sh)
+
+set -e
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+
+SCHEMA=public
+if [ "$1" = "--schema" ]; then
+  SCHEMA="$2"
+  shift 2
+fi
+TABLES=("$@")
+if [ ${#TABLES[@]} -eq 0 ]; then
+  TABLES=(cadastral_freehold cadastral_leasehold census_small_areas)
+fi
+
+# zoom:tolerance (degrees) — 1px at zoom z is ~360 / (256 * 2^z) degrees of longitude
+LEVELS=("12:0.00017" "14:0.000043" "16:0.000011")
+
+echo "==> Installing generalization function..."
+PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1 <<'SQL'
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS generalized_zooms INTEGER[];
+CREATE SCHEMA IF NOT EXISTS shadow;
+
+-- Builds shadow.<src>_z<zoom> from src_schema.<src>; copies of a live table are swapped in at once
+DROP FUNCTION IF EXISTS build_generalized_table(TEXT, INTEGER, DOUBLE PRECISION);
+CREATE OR REPLACE FUNCTION build_generalized_table(
+  src TEXT, zoom INTEGER, tolerance DOUBLE PRECISION, src_schema TEXT DEFAULT 'public'
+)
+RETURNS BIGINT AS $$
+DECLARE
+  dst TEXT := src || '_z' || zoom;
+  cols TEXT;
+  n BIGINT;
+BEGIN
+  -- Every stored attribute column except the geometries, in table order
+  SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position)
+  INTO cols
+  FROM information_schema.columns
+  WHERE table_schema = src_schema AND table_name = src
+    AND column_name NOT IN ('geom', 'geom_itm')
+    AND is_generated = 'NEVER';
+
+  EXECUTE format('DROP TABLE IF EXISTS shadow.%I', dst);
+  EXECUTE format(
+    'CREATE TABLE shadow.%I AS
+     SELECT %s, g.geom
+     FROM %I.%I t,
+     LATERAL (
+       SELECT ST_CollectionExtract(ST_MakeValid(
+         ST_SnapToGrid(ST_SimplifyPreserveTopology(t.geom, %s), %s)
+       ), 3) AS geom
+     ) g
+     WHERE NOT ST_IsEmpty(g.geom)',
+    dst, cols, src_schema, src, tolerance, tolerance / 4
+  );
+  GET DIAGNOSTICS n = ROW_COUNT;
+  EXECUTE format('CREATE INDEX %I ON shadow.%I USING GIST (geom)', 'idx_' || dst || '_geom', dst);
+  EXECUTE format('ANALYZE shadow.%I', dst);
+  IF src_schema <> 'public' THEN
+    -- Moved in with its source table by swap_shadow_table()
+    RETURN n;
+  END IF;
+  -- Swap: the live copy is only locked from here until this call commits
+  EXECUTE format('DROP TABLE IF EXISTS public.%I', dst);
+  EXECUTE format('ALTER TABLE shadow.%I SET SCHEMA public', dst);
+  RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+SQL
+
+for TABLE in "${TABLES[@]}"; do
+  EXISTS=$(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -A \
+    -c "SELECT to_regclass('$SCHEMA.$TABLE') IS NOT NULL;")
+  if [ "$EXISTS" != "t" ]; then
+    echo "==> Skipping $TABLE (table not loaded)"
+    continue
+  fi
+
+  ZOOMS=()
+  for LEVEL in "${LEVELS[@]}"; do
+    ZOOM="${LEVEL%%:*}"
+    TOLERANCE="${LEVEL##*:}"
+    echo "==> Generalizing $TABLE for zoom <= $ZOOM (tolerance $TOLERANCE°)..."
+    ROWS=$(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -A -v ON_ERROR_STOP=1 \
+      -c "SELECT build_generalized_table('$TABLE', $ZOOM, $TOLERANCE, '$SCHEMA');")
+    echo "    ${TABLE}_z${ZOOM}: $ROWS features, $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -A \
+      -c "SELECT SUM(ST_NPoints(geom)) FROM $SCHEMA.${TABLE}_z${ZOOM};") vertices"
+    ZOOMS+=("$ZOOM")
+  done
+
+  ZOOM_LIST=$(IFS=,; echo "${ZOOMS[*]}")
+  # Shadow copies go live (and bump data_version) with their table's swap
+  BUMP=$([ "$SCHEMA" = "public" ] && echo 1 || echo 0)
+  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
+UPDATE layers
+SET generalized_zooms = ARRAY[$ZOOM_LIST],
+    data_version = data_version + $BUMP
+WHERE table_name = '$TABLE';
+SQL
+  echo "    Full resolution: $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -A \
+    -c "SELECT SUM(ST_NPoints(geom)) FROM $SCHEMA.$TABLE;") vertices"
+done
+
+echo ""
+echo "==> Done. Tile and bbox endpoints pick the generalized tables up within 30s."
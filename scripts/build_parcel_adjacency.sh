@@ -0,0 +1,147 @@
+#!/usr/bin/env bash
+# LandOS — Build the parcel adjacency graph (parcel_adjacency edge table)
+# Run from the project root:
+#   bash scripts/build_parcel_adjacency.sh                   # full rebuild, freehold + leasehold
+#   bash scripts/build_parcel_adjacency.sh --schema shadow   # full rebuild from shadow.cadastral_*, left in shadow
+#   bash scripts/build_parcel_adjacency.sh --area W S E N    # rebuild edges of parcels centred in this bbox
+#
+# Stores one row per ordered pair of touching parcels of the same type, with the
+# length of their shared boundary in metres (0 for corner-only contact). Both
+# directions are stored, so neighbours of a parcel are an index lookup on (type, a).
+# The full rebuild partitions Dublin into grid cells by the centroid of parcel a
+# and runs them in parallel (PARALLEL, default 4); every edge is found twice,
+# once from each side, so cells never write the same row. A full rebuild fills
+# shadow.parcel_adjacency and then replaces the live edges in one transaction
+# (scripts/shadow_tables.sh); with --schema shadow it reads the reloaded
+# shadow.cadastral_* tables and leaves the edges for `shadow_tables.sh swap --with`.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+#   - Cadastral tables loaded, with geom_itm (scripts/add_itm_geometry.sh)
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+export PGPASSWORD="$DB_PASS"
+PSQL=(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1)
+
+# Dublin bbox, GRID, PARALLEL, grid_cells and in_grid_cell()
+source "$SCRIPT_DIR/grid_cells.sh"
+
+AREA=()
+FROM=public
+if [ "$1" = "--area" ]; then
+  AREA=("$2" "$3" "$4" "$5")
+  if [ -z "$5" ]; then
+    echo "Usage: $0 [--schema shadow | --area W S E N]"
+    exit 1
+  fi
+elif [ "$1" = "--schema" ]; then
+  FROM="$2"
+fi
+
+echo "==> Installing parcel_adjacency table and functions..."
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare
+install_grid_cell_sql
+"${PSQL[@]}" <<'SQL'
+CREATE TABLE IF NOT EXISTS parcel_adjacency (
+  parcel_type TEXT NOT NULL,
+  a INTEGER NOT NULL,
+  b INTEGER NOT NULL,
+  shared_edge_m DOUBLE PRECISION NOT NULL,
+  PRIMARY KEY (parcel_type, a, b)
+);
+
+-- Rebuilds the outgoing edges of parcels of p_type centred in p_area (all if NULL) in
+-- p_into.parcel_adjacency, reading p_from.cadastral_<p_type> if it is there
+DROP FUNCTION IF EXISTS refresh_parcel_adjacency(TEXT, geometry);
+CREATE OR REPLACE FUNCTION refresh_parcel_adjacency(
+  p_type TEXT, p_area geometry DEFAULT NULL, p_into TEXT DEFAULT 'public', p_from TEXT DEFAULT 'public'
+)
+RETURNS INTEGER AS $fn$
+DECLARE
+  parcels TEXT := input_table(p_from, 'cadastral_' || p_type);
+  edges TEXT := format('%I.parcel_adjacency', p_into);
+  n INTEGER;
+BEGIN
+  IF to_regclass(parcels) IS NULL THEN
+    RETURN 0;
+  END IF;
+
+  EXECUTE format($q$
+    DELETE FROM %s e
+    USING %s p
+    WHERE e.parcel_type = %L AND e.a = p.ogc_fid
+      AND ($1 IS NULL OR (p.geom && $1 AND in_grid_cell(ST_Centroid(p.geom), $1)))
+  $q$, edges, parcels, p_type) USING p_area;
+
+  EXECUTE format($q$
+    INSERT INTO %s (parcel_type, a, b, shared_edge_m)
+    SELECT %L, p.ogc_fid, n.ogc_fid,
+           ST_Length(ST_CollectionExtract(ST_Intersection(p.geom_itm, n.geom_itm), 2))
+    FROM %s p
+    JOIN %s n
+      ON n.geom && p.geom
+     AND n.ogc_fid != p.ogc_fid
+     AND ST_Touches(n.geom, p.geom)
+    WHERE $1 IS NULL OR (p.geom && $1 AND in_grid_cell(ST_Centroid(p.geom), $1))
+    ON CONFLICT (parcel_type, a, b) DO UPDATE SET shared_edge_m = EXCLUDED.shared_edge_m
+  $q$, edges, p_type, parcels, parcels) USING p_area;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END;
+$fn$ LANGUAGE plpgsql;
+SQL
+
+if [ ${#AREA[@]} -eq 4 ]; then
+  # Pad by ~20m so the parcels bordering the changed area get their reverse edges too
+  echo "==> Rebuilding adjacency in ${AREA[*]}..."
+  for TYPE in freehold leasehold; do
+    ROWS=$("${PSQL[@]}" -t -A -c "
+      SELECT refresh_parcel_adjacency('$TYPE', ST_Expand(
+        ST_MakeEnvelope(${AREA[0]}, ${AREA[1]}, ${AREA[2]}, ${AREA[3]}, 4326), 0.0003));")
+    echo "    $TYPE: $ROWS edges"
+  done
+  bash "$SCRIPT_DIR/shadow_tables.sh" bump parcel_adjacency
+  exit 0
+fi
+
+echo "==> Building adjacency graph in shadow (${GRID}x${GRID} grid, $PARALLEL in parallel)..."
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare parcel_adjacency
+"${PSQL[@]}" -q -c "CREATE TABLE shadow.parcel_adjacency (LIKE public.parcel_adjacency INCLUDING ALL);"
+for TYPE in freehold leasehold; do
+  EXISTS=$("${PSQL[@]}" -t -A -c "SELECT to_regclass(input_table('$FROM', 'cadastral_$TYPE')) IS NOT NULL;")
+  if [ "$EXISTS" != "t" ]; then
+    echo "    Skipping $TYPE (table not loaded)"
+    continue
+  fi
+
+  # One "W S E N" line per grid cell, fanned out to parallel psql sessions
+  grid_cells |
+  xargs -P "$PARALLEL" -L 1 sh -c '
+    psql -h "$0" -p "$1" -U "$2" -d "$3" -v ON_ERROR_STOP=1 -t -A -q \
+      -c "SELECT refresh_parcel_adjacency('"'"'$4'"'"', ST_MakeEnvelope($6, $7, $8, $9, 4326), '"'"'shadow'"'"', '"'"'$5'"'"');" > /dev/null
+  ' "$DB_HOST" "$DB_PORT" "$DB_USER" "$DB_NAME" "$TYPE" "$FROM"
+
+  echo "    $TYPE: $("${PSQL[@]}" -t -A -c "SELECT COUNT(*) FROM shadow.parcel_adjacency WHERE parcel_type = '$TYPE';") edges"
+done
+"${PSQL[@]}" -q -c "ANALYZE shadow.parcel_adjacency;"
+
+if [ "$FROM" != "public" ]; then
+  echo ""
+  echo "==> Done. shadow.parcel_adjacency goes live with: shadow_tables.sh swap ... --with parcel_adjacency"
+  exit 0
+fi
+
+# Replaces the live edges in one transaction and retires cached AI results that read them
+"${PSQL[@]}" -q -c "SELECT refill_from_shadow('parcel_adjacency');" > /dev/null
+"${PSQL[@]}" -q -c "ANALYZE parcel_adjacency;"
+
+echo ""
+echo "==> Done. Neighbour and assemblage lookups now read parcel_adjacency."
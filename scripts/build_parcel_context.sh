@@ -0,0 +1,280 @@
+#!/usr/bin/env bash
+# LandOS — Build the parcel_context table behind /api/parcel/{id}/enriched
+# Run from the project root:
+#   bash scripts/build_parcel_context.sh                   # full rebuild, freehold + leasehold
+#   bash scripts/build_parcel_context.sh --schema shadow   # full rebuild from shadow.cadastral_*, left in shadow
+#   bash scripts/build_parcel_context.sh --area W S E N    # refresh parcels affected by a change in this bbox
+#
+# One row per parcel with its RZLT overlap, containing census Small Area, nearest
+# DLR planning applications and 500m sold-property aggregates, so the enrichment
+# endpoint is a single primary-key lookup. The full rebuild runs grid cells in
+# parallel (PARALLEL, default 4). --area pads the bbox by the 500m enrichment
+# radius and recomputes only parcels whose centroid falls inside it. A full
+# rebuild fills shadow.parcel_context and then replaces the live rows in one
+# transaction (scripts/shadow_tables.sh); with --schema shadow it reads the
+# reloaded shadow.cadastral_* tables and leaves the rows for
+# `shadow_tables.sh swap --with`.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+#   - Cadastral tables loaded, with geom_itm (scripts/add_itm_geometry.sh)
+#   - Optional: parcel keys (scripts/build_parcel_keys.sh) for the census equi-join
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+export PGPASSWORD="$DB_PASS"
+PSQL=(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1)
+
+# Dublin bbox, GRID, PARALLEL, grid_cells and in_grid_cell()
+source "$SCRIPT_DIR/grid_cells.sh"
+
+AREA=()
+FROM=public
+if [ "$1" = "--area" ]; then
+  AREA=("$2" "$3" "$4" "$5")
+  if [ ${#AREA[@]} -ne 4 ] || [ -z "$5" ]; then
+    echo "Usage: $0 [--schema shadow | --area W S E N]"
+    exit 1
+  fi
+elif [ "$1" = "--schema" ]; then
+  FROM="$2"
+fi
+
+echo "==> Installing parcel_context table and functions..."
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare
+install_grid_cell_sql
+"${PSQL[@]}" <<'SQL'
+CREATE TABLE IF NOT EXISTS parcel_context (
+  parcel_type TEXT NOT NULL,
+  parcel_id INTEGER NOT NULL,
+  national_ref TEXT,
+  inspire_id TEXT,
+  area_sqm DOUBLE PRECISION,
+  centroid_lng DOUBLE PRECISION NOT NULL,
+  centroid_lat DOUBLE PRECISION NOT NULL,
+  on_rzlt BOOLEAN NOT NULL DEFAULT false,
+  rzlt_overlap JSONB NOT NULL DEFAULT '[]',
+  nearby_planning JSONB NOT NULL DEFAULT '[]',
+  sales_count INTEGER NOT NULL DEFAULT 0,
+  avg_sale_price INTEGER NOT NULL DEFAULT 0,
+  median_sale_price INTEGER NOT NULL DEFAULT 0,
+  avg_price_per_sqm INTEGER NOT NULL DEFAULT 0,
+  recent_sales JSONB NOT NULL DEFAULT '[]',
+  sa_pub2022 TEXT,
+  census JSONB,
+  computed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (parcel_type, parcel_id)
+);
+CREATE INDEX IF NOT EXISTS idx_parcel_context_centroid
+  ON parcel_context USING GIST (ST_SetSRID(ST_MakePoint(centroid_lng, centroid_lat), 4326));
+
+-- Computes context rows for parcels whose centroid lies in p_area and whose id is in
+-- p_ids (either filter skipped when NULL), reading p_from.cadastral_<p_type> if it is
+-- there. Input layers that aren't loaded contribute empty values instead of failing.
+DROP FUNCTION IF EXISTS parcel_context_rows(TEXT, geometry);
+DROP FUNCTION IF EXISTS parcel_context_rows(TEXT, geometry, INTEGER[]);
+CREATE OR REPLACE FUNCTION parcel_context_rows(
+  p_type TEXT, p_area geometry DEFAULT NULL, p_ids INTEGER[] DEFAULT NULL, p_from TEXT DEFAULT 'public'
+)
+RETURNS SETOF parcel_context AS $fn$
+DECLARE
+  parcels TEXT := input_table(p_from, 'cadastral_' || p_type);
+  rzlt_sql TEXT := 'SELECT NULL::jsonb AS items';
+  planning_sql TEXT := 'SELECT NULL::jsonb AS items';
+  sales_sql TEXT := 'SELECT 0::bigint AS cnt, NULL::numeric AS avg_sale, NULL::float8 AS median_sale, NULL::numeric AS avg_psm';
+  recent_sql TEXT := 'SELECT NULL::jsonb AS items';
+  census_sql TEXT := 'SELECT NULL::text AS sa_pub2022, NULL::jsonb AS census';
+  sa_key TEXT := 'NULL::text';
+  census_match TEXT := 'ST_Intersects(cs.geom, p.c)';
+BEGIN
+  IF to_regclass('public.rzlt') IS NOT NULL THEN
+    rzlt_sql := $q$
+      SELECT jsonb_agg(jsonb_build_object(
+        'zone_desc', zone_desc, 'site_area', site_area,
+        'local_authority_name', local_authority_name, 'zone_gzt', zone_gzt
+      )) AS items
+      FROM (SELECT * FROM rzlt r WHERE ST_Intersects(r.geom, p.geom) LIMIT 5) x
+    $q$;
+  END IF;
+
+  IF to_regclass('public.dlr_planning_polygons') IS NOT NULL THEN
+    planning_sql := $q$
+      SELECT jsonb_agg(jsonb_build_object(
+        'plan_ref', plan_ref, 'decision', decision, 'description', descrptn,
+        'registered_date', reg_date::text, 'decision_date', dec_date::text, 'distance_m', distance_m
+      ) ORDER BY distance_m) AS items
+      FROM (
+        SELECT plan_ref, decision, descrptn, reg_date, dec_date,
+               ROUND(ST_Distance(pp.geom_itm, p.c_itm)::numeric, 0)::int AS distance_m
+        FROM dlr_planning_polygons pp
+        WHERE ST_DWithin(pp.geom_itm, p.c_itm, 500)
+        ORDER BY distance_m
+        LIMIT 5
+      ) x
+    $q$;
+  END IF;
+
+  IF to_regclass('public.sold_properties') IS NOT NULL THEN
+    sales_sql := $q$
+      SELECT
+        COUNT(*) AS cnt,
+        ROUND(AVG(sale_price)) AS avg_sale,
+        ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY sale_price)) AS median_sale,
+        ROUND(AVG(CASE WHEN floor_area_m2 > 0 THEN sale_price / floor_area_m2 END)) AS avg_psm
+      FROM sold_properties sp
+      WHERE ST_DWithin(sp.geom_itm, p.c_itm, 500)
+        AND sp.sale_price > 0 AND sp.sale_price < 10000000
+    $q$;
+    recent_sql := $q$
+      SELECT jsonb_agg(jsonb_build_object(
+        'address', address, 'sale_price', sale_price, 'sale_date', sale_date::text,
+        'property_type', property_type, 'distance_m', distance_m
+      ) ORDER BY sale_date DESC NULLS LAST) AS items
+      FROM (
+        SELECT address, sale_price, sale_date, property_type,
+               ROUND(ST_Distance(sp.geom_itm, p.c_itm)::numeric, 0)::int AS distance_m
+        FROM sold_properties sp
+        WHERE ST_DWithin(sp.geom_itm, p.c_itm, 500)
+          AND sp.sale_price > 0 AND sp.sale_price < 10000000
+        ORDER BY sale_date DESC NULLS LAST
+        LIMIT 5
+      ) x
+    $q$;
+  END IF;
+
+  -- Stored parcel keys (scripts/build_parcel_keys.sh) turn the census lookup into an equi-join
+  IF EXISTS (
+    SELECT 1 FROM pg_attribute
+    WHERE attrelid = parcels::regclass AND attname = 'sa_pub2022' AND NOT attisdropped
+  ) THEN
+    sa_key := 'sa_pub2022';
+    census_match := 'cs.sa_pub2022 = p.sa_key';
+  END IF;
+
+  IF to_regclass('public.census_small_areas') IS NOT NULL THEN
+    census_sql := $q$
+      SELECT cs.sa_pub2022::text AS sa_pub2022, jsonb_build_object(
+        'small_area_id', cs.sa_pub2022,
+        'total_population', cs.total_population,
+        'population_density', cs.population_density::float8,
+        'owner_occupied_pct', cs.owner_occupied_pct::float8,
+        'rented_pct', cs.rented_pct::float8,
+        'vacancy_rate', cs.vacancy_rate::float8,
+        'employment_rate', cs.employment_rate::float8,
+        'third_level_pct', cs.third_level_pct::float8,
+        'avg_household_size', cs.avg_household_size::float8
+      ) AS census
+      FROM census_small_areas cs
+      WHERE $q$ || census_match || $q$ AND cs.total_population IS NOT NULL
+      LIMIT 1
+    $q$;
+  END IF;
+
+  RETURN QUERY EXECUTE format($q$
+    WITH p AS (
+      SELECT ogc_fid, nationalcadastralreference, gml_id, area_sqm, geom, %s AS sa_key,
+             ST_Centroid(geom) AS c,
+             ST_Transform(ST_Centroid(geom), 2157) AS c_itm
+      FROM %s
+      WHERE ($1 IS NULL OR (geom && $1 AND in_grid_cell(ST_Centroid(geom), $1)))
+        AND ($2 IS NULL OR ogc_fid = ANY($2))
+    )
+    SELECT
+      %L::text, p.ogc_fid::int, p.nationalcadastralreference::text, p.gml_id::text, p.area_sqm::float8,
+      ST_X(p.c), ST_Y(p.c),
+      r.items IS NOT NULL, COALESCE(r.items, '[]'::jsonb),
+      COALESCE(pl.items, '[]'::jsonb),
+      s.cnt::int, COALESCE(s.avg_sale, 0)::int, COALESCE(s.median_sale, 0)::int, COALESCE(s.avg_psm, 0)::int,
+      COALESCE(rs.items, '[]'::jsonb),
+      cs.sa_pub2022, cs.census,
+      now()
+    FROM p
+    LEFT JOIN LATERAL (%s) r ON true
+    LEFT JOIN LATERAL (%s) pl ON true
+    CROSS JOIN LATERAL (%s) s
+    LEFT JOIN LATERAL (%s) rs ON true
+    LEFT JOIN LATERAL (%s) cs ON true
+  $q$, sa_key, parcels, p_type, rzlt_sql, planning_sql, sales_sql, recent_sql, census_sql)
+  USING p_area, p_ids;
+END;
+$fn$ LANGUAGE plpgsql STABLE;
+
+-- Replaces the context rows in p_into.parcel_context for parcels centred in p_area
+-- (every parcel of the type if NULL)
+DROP FUNCTION IF EXISTS refresh_parcel_context(TEXT, geometry);
+CREATE OR REPLACE FUNCTION refresh_parcel_context(
+  p_type TEXT, p_area geometry DEFAULT NULL, p_into TEXT DEFAULT 'public', p_from TEXT DEFAULT 'public'
+)
+RETURNS INTEGER AS $fn$
+DECLARE
+  target TEXT := format('%I.parcel_context', p_into);
+  n INTEGER;
+BEGIN
+  IF to_regclass(input_table(p_from, 'cadastral_' || p_type)) IS NULL THEN
+    RETURN 0;
+  END IF;
+  EXECUTE format($q$
+    DELETE FROM %s
+    WHERE parcel_type = $1
+      AND ($2 IS NULL OR in_grid_cell(ST_SetSRID(ST_MakePoint(centroid_lng, centroid_lat), 4326), $2))
+  $q$, target) USING p_type, p_area;
+  EXECUTE format('INSERT INTO %s SELECT * FROM parcel_context_rows($1, $2, NULL, $3)', target)
+  USING p_type, p_area, p_from;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END;
+$fn$ LANGUAGE plpgsql;
+SQL
+
+if [ ${#AREA[@]} -eq 4 ]; then
+  echo "==> Refreshing parcel context around ${AREA[*]} (+500m)..."
+  for TYPE in freehold leasehold; do
+    ROWS=$("${PSQL[@]}" -t -A -c "
+      SELECT refresh_parcel_context('$TYPE', ST_Transform(ST_Buffer(ST_Transform(
+        ST_MakeEnvelope(${AREA[0]}, ${AREA[1]}, ${AREA[2]}, ${AREA[3]}, 4326), 2157), 500), 4326));")
+    echo "    $TYPE: $ROWS parcels"
+  done
+  bash "$SCRIPT_DIR/shadow_tables.sh" bump parcel_context
+  exit 0
+fi
+
+echo "==> Rebuilding parcel context in shadow (${GRID}x${GRID} grid, $PARALLEL in parallel)..."
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare parcel_context
+"${PSQL[@]}" -q -c "CREATE TABLE shadow.parcel_context (LIKE public.parcel_context INCLUDING ALL);"
+for TYPE in freehold leasehold; do
+  EXISTS=$("${PSQL[@]}" -t -A -c "SELECT to_regclass(input_table('$FROM', 'cadastral_$TYPE')) IS NOT NULL;")
+  if [ "$EXISTS" != "t" ]; then
+    echo "    Skipping $TYPE (table not loaded)"
+    continue
+  fi
+
+  # One "W S E N" line per grid cell, fanned out to parallel psql sessions
+  grid_cells |
+  xargs -P "$PARALLEL" -L 1 sh -c '
+    psql -h "$0" -p "$1" -U "$2" -d "$3" -v ON_ERROR_STOP=1 -t -A -q \
+      -c "SELECT refresh_parcel_context('"'"'$4'"'"', ST_MakeEnvelope($6, $7, $8, $9, 4326), '"'"'shadow'"'"', '"'"'$5'"'"');" > /dev/null
+  ' "$DB_HOST" "$DB_PORT" "$DB_USER" "$DB_NAME" "$TYPE" "$FROM"
+
+  echo "    $TYPE: $("${PSQL[@]}" -t -A -c "SELECT COUNT(*) FROM shadow.parcel_context WHERE parcel_type = '$TYPE';") parcels"
+done
+"${PSQL[@]}" -q -c "ANALYZE shadow.parcel_context;"
+
+if [ "$FROM" != "public" ]; then
+  echo ""
+  echo "==> Done. shadow.parcel_context goes live with: shadow_tables.sh swap ... --with parcel_context"
+  exit 0
+fi
+
+# Replaces the live rows in one transaction and retires cached AI results that read them
+"${PSQL[@]}" -q -c "SELECT refill_from_shadow('parcel_context');" > /dev/null
+"${PSQL[@]}" -q -c "ANALYZE parcel_context;"
+
+echo ""
+echo "==> Done. /api/parcel/{id}/enriched now reads parcel_context."
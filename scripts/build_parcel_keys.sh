@@ -0,0 +1,151 @@
+#!/usr/bin/env bash
+# LandOS — Store census / RZLT / urban-area foreign keys on every cadastral parcel
+# Run from the project root:
+#   bash scripts/build_parcel_keys.sh                              # live tables
+#   bash scripts/build_parcel_keys.sh --schema shadow freehold     # shadow.cadastral_freehold, before its swap
+#
+# Adds and fills three columns on cadastral_freehold and cadastral_leasehold:
+#   sa_pub2022       census Small Area containing the parcel centroid
+#   rzlt_ogc_fid     RZLT zone overlapping the parcel most (NULL = not on RZLT land)
+#   urban_area_code  urban area containing the parcel centroid
+# computed once by a bulk spatial join, so queries can equi-join
+# (p.sa_pub2022 = cs.sa_pub2022) instead of running polygon predicates per row.
+# Grid cells run in parallel (PARALLEL, default 4); rows whose keys haven't
+# changed are not rewritten. Layers that aren't loaded leave their key NULL.
+# Loaders re-run it after any of the four tables is reloaded, and run it with
+# --schema shadow on a reloaded cadastral table before it is swapped in, so the
+# table that goes live already carries its keys.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+#   - Cadastral tables loaded (load_data.sh)
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+export PGPASSWORD="$DB_PASS"
+PSQL=(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1)
+
+# Dublin bbox, GRID, PARALLEL, grid_cells and in_grid_cell()
+source "$SCRIPT_DIR/grid_cells.sh"
+
+SCHEMA=public
+if [ "$1" = "--schema" ]; then
+  SCHEMA="$2"
+  shift 2
+fi
+TYPES=("$@")
+if [ ${#TYPES[@]} -eq 0 ]; then
+  TYPES=(freehold leasehold)
+fi
+
+echo "==> Installing parcel key function..."
+install_grid_cell_sql
+"${PSQL[@]}" <<'SQL'
+DO $$
+BEGIN
+  IF to_regclass('public.census_small_areas') IS NOT NULL THEN
+    CREATE INDEX IF NOT EXISTS idx_census_small_areas_sa_pub2022 ON census_small_areas (sa_pub2022);
+  END IF;
+  IF to_regclass('public.urban_areas') IS NOT NULL THEN
+    CREATE INDEX IF NOT EXISTS idx_urban_areas_urban_area_code ON urban_areas (urban_area_code);
+  END IF;
+END $$;
+
+-- Recomputes the keys of parcels of p_type centred in the box p_area (all if NULL), in
+-- p_schema.cadastral_<p_type>; the lookup layers are always the live ones
+DROP FUNCTION IF EXISTS refresh_parcel_keys(TEXT, geometry);
+CREATE OR REPLACE FUNCTION refresh_parcel_keys(
+  p_type TEXT, p_area geometry DEFAULT NULL, p_schema TEXT DEFAULT 'public'
+)
+RETURNS INTEGER AS $fn$
+DECLARE
+  parcels TEXT := format('%I.%I', p_schema, 'cadastral_' || p_type);
+  census_sql TEXT := 'SELECT NULL::text AS sa_pub2022';
+  rzlt_sql TEXT := 'SELECT NULL::int AS ogc_fid';
+  urban_sql TEXT := 'SELECT NULL::text AS urban_area_code';
+  n INTEGER;
+BEGIN
+  IF to_regclass('public.census_small_areas') IS NOT NULL THEN
+    census_sql := 'SELECT cs.sa_pub2022::text FROM census_small_areas cs WHERE ST_Intersects(cs.geom, p.c) LIMIT 1';
+  END IF;
+  IF to_regclass('public.rzlt') IS NOT NULL THEN
+    rzlt_sql := $q$
+      SELECT r.ogc_fid::int FROM rzlt r
+      WHERE r.geom && p.geom AND ST_Intersects(r.geom, p.geom)
+      ORDER BY ST_Area(ST_Intersection(r.geom, p.geom)) DESC
+      LIMIT 1
+    $q$;
+  END IF;
+  IF to_regclass('public.urban_areas') IS NOT NULL THEN
+    urban_sql := 'SELECT u.urban_area_code::text FROM urban_areas u WHERE ST_Intersects(u.geom, p.c) LIMIT 1';
+  END IF;
+
+  EXECUTE format($q$
+    UPDATE %s t
+    SET sa_pub2022 = k.sa_pub2022, rzlt_ogc_fid = k.rzlt_ogc_fid, urban_area_code = k.urban_area_code
+    FROM (
+      SELECT p.ogc_fid, cs.sa_pub2022, r.ogc_fid AS rzlt_ogc_fid, u.urban_area_code
+      FROM (
+        SELECT t.ogc_fid, t.geom, cc.c
+        FROM %s t, LATERAL (SELECT ST_Centroid(t.geom) AS c) cc
+        WHERE $1 IS NULL OR (t.geom && $1 AND in_grid_cell(cc.c, $1))
+      ) p
+      LEFT JOIN LATERAL (%s) cs ON true
+      LEFT JOIN LATERAL (%s) r ON true
+      LEFT JOIN LATERAL (%s) u ON true
+    ) k
+    WHERE t.ogc_fid = k.ogc_fid
+      AND (t.sa_pub2022, t.rzlt_ogc_fid, t.urban_area_code)
+          IS DISTINCT FROM (k.sa_pub2022, k.rzlt_ogc_fid, k.urban_area_code)
+  $q$, parcels, parcels, census_sql, rzlt_sql, urban_sql) USING p_area;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END;
+$fn$ LANGUAGE plpgsql;
+SQL
+
+for TYPE in "${TYPES[@]}"; do
+  TABLE="$SCHEMA.cadastral_$TYPE"
+  EXISTS=$("${PSQL[@]}" -t -A -c "SELECT to_regclass('$TABLE') IS NOT NULL;")
+  if [ "$EXISTS" != "t" ]; then
+    echo "==> Skipping $TABLE (table not loaded)"
+    continue
+  fi
+
+  echo "==> Computing keys for $TABLE (${GRID}x${GRID} grid, $PARALLEL in parallel)..."
+  "${PSQL[@]}" -q <<SQL
+ALTER TABLE $TABLE
+  ADD COLUMN IF NOT EXISTS sa_pub2022 TEXT,
+  ADD COLUMN IF NOT EXISTS rzlt_ogc_fid INTEGER,
+  ADD COLUMN IF NOT EXISTS urban_area_code TEXT;
+SQL
+
+  # One "W S E N" line per grid cell, fanned out to parallel psql sessions
+  grid_cells |
+  xargs -P "$PARALLEL" -L 1 sh -c '
+    psql -h "$0" -p "$1" -U "$2" -d "$3" -v ON_ERROR_STOP=1 -t -A -q \
+      -c "SELECT refresh_parcel_keys('"'"'$4'"'"', ST_MakeEnvelope($6, $7, $8, $9, 4326), '"'"'$5'"'"');" > /dev/null
+  ' "$DB_HOST" "$DB_PORT" "$DB_USER" "$DB_NAME" "$TYPE" "$SCHEMA"
+
+  "${PSQL[@]}" <<SQL
+CREATE INDEX IF NOT EXISTS idx_cadastral_${TYPE}_sa_pub2022 ON $TABLE (sa_pub2022);
+CREATE INDEX IF NOT EXISTS idx_cadastral_${TYPE}_rzlt_ogc_fid ON $TABLE (rzlt_ogc_fid) WHERE rzlt_ogc_fid IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_cadastral_${TYPE}_urban_area_code ON $TABLE (urban_area_code);
+ANALYZE $TABLE;
+SELECT COUNT(*) AS parcels, COUNT(sa_pub2022) AS with_small_area,
+       COUNT(rzlt_ogc_fid) AS on_rzlt, COUNT(urban_area_code) AS in_urban_area
+FROM $TABLE;
+SQL
+
+  if [ "$SCHEMA" = "public" ]; then
+    # Keys changed in place: retire cached AI results without invalidating tiles
+    "${PSQL[@]}" -q -c "UPDATE layers SET change_version = change_version + 1 WHERE table_name = 'cadastral_$TYPE';"
+  fi
+done
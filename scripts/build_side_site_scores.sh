@@ -0,0 +1,271 @@
+#!/usr/bin/env bash
+# LandOS — Precompute side-site / infill scores for every Dublin freehold parcel
+# Run from the project root:
+#   bash scripts/build_side_site_scores.sh                   # full rebuild
+#   bash scripts/build_side_site_scores.sh --schema shadow   # full rebuild from shadow tables, left in shadow
+#   bash scripts/build_side_site_scores.sh --area W S E N    # refresh parcels centred in this bbox
+#
+# Scores every 80–500 sqm freehold parcel once (compactness, touching neighbours,
+# planning and RZLT overlap, census context) into side_site_scores, indexed by
+# geometry and score. /api/side_sites is then a bbox + ORDER BY score lookup.
+# The full rebuild runs grid cells in parallel (PARALLEL, default 4), fills
+# shadow.side_site_scores and then replaces the live rows in one transaction
+# (scripts/shadow_tables.sh). With --schema shadow it reads the reloaded
+# shadow.cadastral_freehold and shadow.parcel_adjacency and leaves the rows for
+# `shadow_tables.sh swap --with`.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+#   - cadastral_freehold loaded, with geom_itm (scripts/add_itm_geometry.sh)
+#   - Optional: parcel_adjacency (scripts/build_parcel_adjacency.sh) for neighbour counts
+#   - Optional: parcel keys (scripts/build_parcel_keys.sh) for census/RZLT equi-joins
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+export PGPASSWORD="$DB_PASS"
+PSQL=(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1)
+
+# Dublin bbox, GRID, PARALLEL, grid_cells and in_grid_cell()
+source "$SCRIPT_DIR/grid_cells.sh"
+
+AREA=()
+FROM=public
+if [ "$1" = "--area" ]; then
+  AREA=("$2" "$3" "$4" "$5")
+  if [ -z "$5" ]; then
+    echo "Usage: $0 [--schema shadow | --area W S E N]"
+    exit 1
+  fi
+elif [ "$1" = "--schema" ]; then
+  FROM="$2"
+fi
+
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare
+EXISTS=$("${PSQL[@]}" -t -A -c "SELECT to_regclass(input_table('$FROM', 'cadastral_freehold')) IS NOT NULL;")
+if [ "$EXISTS" != "t" ]; then
+  echo "==> Skipping side-site scores (cadastral_freehold not loaded)"
+  exit 0
+fi
+
+echo "==> Installing side_site_scores table and functions..."
+install_grid_cell_sql
+"${PSQL[@]}" <<'SQL'
+CREATE TABLE IF NOT EXISTS side_site_scores (
+  id INTEGER PRIMARY KEY,
+  national_ref TEXT,
+  area_sqm NUMERIC,
+  area_acres NUMERIC,
+  compactness NUMERIC,
+  neighbor_count INTEGER NOT NULL,
+  has_planning BOOLEAN NOT NULL,
+  on_rzlt BOOLEAN NOT NULL,
+  owner_occupied_pct NUMERIC,
+  vacancy_rate NUMERIC,
+  score NUMERIC NOT NULL,
+  lng DOUBLE PRECISION NOT NULL,
+  lat DOUBLE PRECISION NOT NULL,
+  geom geometry(Geometry, 4326) NOT NULL,
+  computed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_side_site_scores_geom ON side_site_scores USING GIST (geom);
+CREATE INDEX IF NOT EXISTS idx_side_site_scores_score ON side_site_scores (score DESC, id DESC);
+
+-- Scores freehold side-site candidates whose centroid lies in p_area (all if NULL),
+-- reading p_from.cadastral_freehold and p_from.parcel_adjacency if they are there.
+-- Input layers that aren't loaded count as "no overlap" instead of failing.
+DROP FUNCTION IF EXISTS side_site_rows(geometry);
+CREATE OR REPLACE FUNCTION side_site_rows(p_area geometry DEFAULT NULL, p_from TEXT DEFAULT 'public')
+RETURNS SETOF side_site_scores AS $fn$
+DECLARE
+  parcels TEXT := input_table(p_from, 'cadastral_freehold');
+  edges TEXT := input_table(p_from, 'parcel_adjacency');
+  planning_sql TEXT := 'false';
+  rzlt_sql TEXT := 'false';
+  census_sql TEXT := 'SELECT NULL::numeric AS owner_occupied_pct, NULL::numeric AS vacancy_rate';
+  key_columns TEXT := 'NULL::text AS sa_pub2022, NULL::int AS rzlt_ogc_fid';
+  neighbor_sql TEXT := format($q$
+    SELECT COUNT(*) FROM %s n
+    WHERE n.geom && ST_Expand(f.geom, 0.0001)
+      AND ST_Touches(n.geom, f.geom)
+      AND n.ogc_fid != f.ogc_fid
+  $q$, parcels);
+BEGIN
+  -- The prebuilt adjacency graph (scripts/build_parcel_adjacency.sh) makes this a join
+  IF to_regclass(edges) IS NOT NULL THEN
+    neighbor_sql := format($q$
+      SELECT COUNT(*) FROM %s e WHERE e.parcel_type = 'freehold' AND e.a = f.ogc_fid
+    $q$, edges);
+  END IF;
+  IF to_regclass('public.dlr_planning_polygons') IS NOT NULL THEN
+    planning_sql := 'EXISTS (SELECT 1 FROM dlr_planning_polygons p WHERE ST_Intersects(p.geom, c.geom))';
+  END IF;
+  IF to_regclass('public.rzlt') IS NOT NULL THEN
+    rzlt_sql := 'EXISTS (SELECT 1 FROM rzlt r WHERE ST_Intersects(r.geom, c.geom))';
+  END IF;
+  IF to_regclass('public.census_small_areas') IS NOT NULL THEN
+    census_sql := $q$
+      SELECT cs.owner_occupied_pct::numeric, cs.vacancy_rate::numeric
+      FROM census_small_areas cs
+      WHERE ST_Intersects(cs.geom, ST_Centroid(c.geom))
+      LIMIT 1
+    $q$;
+  END IF;
+  -- Stored parcel keys (scripts/build_parcel_keys.sh) replace the polygon probes with equi-joins
+  IF EXISTS (
+    SELECT 1 FROM pg_attribute
+    WHERE attrelid = parcels::regclass AND attname = 'sa_pub2022' AND NOT attisdropped
+  ) THEN
+    key_columns := 'f.sa_pub2022, f.rzlt_ogc_fid';
+    rzlt_sql := 'c.rzlt_ogc_fid IS NOT NULL';
+    IF to_regclass('public.census_small_areas') IS NOT NULL THEN
+      census_sql := $q$
+        SELECT cs.owner_occupied_pct::numeric, cs.vacancy_rate::numeric
+        FROM census_small_areas cs
+        WHERE cs.sa_pub2022 = c.sa_pub2022
+        LIMIT 1
+      $q$;
+    END IF;
+  END IF;
+
+  RETURN QUERY EXECUTE format($q$
+    WITH candidates AS (
+      SELECT
+        f.ogc_fid,
+        f.nationalcadastralreference,
+        f.area_sqm,
+        f.geom,
+        4 * PI() * ST_Area(f.geom_itm)
+          / NULLIF(POWER(ST_Perimeter(f.geom_itm), 2), 0)
+          AS compactness,
+        (%s) AS neighbor_count,
+        %s
+      FROM %s f
+      WHERE f.area_sqm BETWEEN 80 AND 500
+        AND ($1 IS NULL OR (f.geom && $1 AND in_grid_cell(ST_Centroid(f.geom), $1)))
+    ),
+    with_context AS (
+      SELECT c.*, %s AS has_planning, %s AS on_rzlt, cs.owner_occupied_pct, cs.vacancy_rate
+      FROM candidates c
+      LEFT JOIN LATERAL (%s) cs ON true
+    ),
+    scored AS (
+      SELECT *,
+        -- Size score: peaks at 150-350 sqm
+        CASE
+          WHEN area_sqm BETWEEN 150 AND 350 THEN 1.0
+          WHEN area_sqm BETWEEN 80 AND 150 THEN (area_sqm - 80.0) / 70.0
+          ELSE (500.0 - area_sqm) / 150.0
+        END * 0.20
+        -- Shape score: lower compactness = more elongated = higher score
+        + CASE
+          WHEN compactness < 0.3 THEN 1.0
+          WHEN compactness < 0.5 THEN (0.5 - compactness) / 0.2
+          ELSE 0.0
+        END * 0.20
+        -- Neighbor score
+        + CASE
+          WHEN neighbor_count >= 3 THEN 1.0
+          WHEN neighbor_count = 2 THEN 0.7
+          WHEN neighbor_count = 1 THEN 0.3
+          ELSE 0.0
+        END * 0.15
+        -- No planning = likely undeveloped
+        + CASE WHEN NOT has_planning THEN 1.0 ELSE 0.0 END * 0.15
+        -- RZLT = motivated seller
+        + CASE WHEN on_rzlt THEN 1.0 ELSE 0.0 END * 0.15
+        -- Residential context
+        + CASE WHEN COALESCE(owner_occupied_pct, 0) > 50 THEN 1.0 ELSE 0.3 END * 0.15
+        AS score
+      FROM with_context
+    )
+    SELECT
+      ogc_fid::int,
+      nationalcadastralreference::text,
+      ROUND(area_sqm::numeric, 1),
+      ROUND(area_sqm::numeric / 4046.86, 3),
+      ROUND(compactness::numeric, 3),
+      neighbor_count::int,
+      has_planning,
+      on_rzlt,
+      ROUND(COALESCE(owner_occupied_pct, 0)::numeric, 1),
+      ROUND(COALESCE(vacancy_rate, 0)::numeric, 1),
+      ROUND(score::numeric, 3),
+      ST_X(ST_Centroid(geom)),
+      ST_Y(ST_Centroid(geom)),
+      geom,
+      now()
+    FROM scored
+  $q$, neighbor_sql, key_columns, parcels, planning_sql, rzlt_sql, census_sql)
+  USING p_area;
+END;
+$fn$ LANGUAGE plpgsql STABLE;
+
+-- Replaces the scores in p_into.side_site_scores for candidates centred in p_area
+-- (every candidate if NULL)
+DROP FUNCTION IF EXISTS refresh_side_site_scores(geometry);
+CREATE OR REPLACE FUNCTION refresh_side_site_scores(
+  p_area geometry DEFAULT NULL, p_into TEXT DEFAULT 'public', p_from TEXT DEFAULT 'public'
+)
+RETURNS INTEGER AS $fn$
+DECLARE
+  target TEXT := format('%I.side_site_scores', p_into);
+  n INTEGER;
+BEGIN
+  EXECUTE format($q$
+    DELETE FROM %s
+    WHERE $1 IS NULL
+       OR (geom && $1 AND in_grid_cell(ST_SetSRID(ST_MakePoint(lng, lat), 4326), $1))
+  $q$, target) USING p_area;
+  EXECUTE format('INSERT INTO %s SELECT * FROM side_site_rows($1, $2)', target)
+  USING p_area, p_from;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END;
+$fn$ LANGUAGE plpgsql;
+SQL
+
+if [ ${#AREA[@]} -eq 4 ]; then
+  # Pad by ~20m so parcels whose neighbour count changed at the edge are rescored
+  echo "==> Refreshing side-site scores in ${AREA[*]}..."
+  ROWS=$("${PSQL[@]}" -t -A -c "
+    SELECT refresh_side_site_scores(ST_Expand(
+      ST_MakeEnvelope(${AREA[0]}, ${AREA[1]}, ${AREA[2]}, ${AREA[3]}, 4326), 0.0003));")
+  echo "    $ROWS candidates"
+  "${PSQL[@]}" -q -c "ANALYZE side_site_scores;"
+  bash "$SCRIPT_DIR/shadow_tables.sh" bump side_site_scores
+  exit 0
+fi
+
+echo "==> Scoring side sites in shadow (${GRID}x${GRID} grid, $PARALLEL in parallel)..."
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare side_site_scores
+"${PSQL[@]}" -q -c "CREATE TABLE shadow.side_site_scores (LIKE public.side_site_scores INCLUDING ALL);"
+
+# One "W S E N" line per grid cell, fanned out to parallel psql sessions
+grid_cells |
+xargs -P "$PARALLEL" -L 1 sh -c '
+  psql -h "$0" -p "$1" -U "$2" -d "$3" -v ON_ERROR_STOP=1 -t -A -q \
+    -c "SELECT refresh_side_site_scores(ST_MakeEnvelope($5, $6, $7, $8, 4326), '"'"'shadow'"'"', '"'"'$4'"'"');" > /dev/null
+' "$DB_HOST" "$DB_PORT" "$DB_USER" "$DB_NAME" "$FROM"
+
+"${PSQL[@]}" -q -c "ANALYZE shadow.side_site_scores;"
+echo "    $("${PSQL[@]}" -t -A -c "SELECT COUNT(*) FROM shadow.side_site_scores;") candidates scored"
+
+if [ "$FROM" != "public" ]; then
+  echo ""
+  echo "==> Done. shadow.side_site_scores goes live with: shadow_tables.sh swap ... --with side_site_scores"
+  exit 0
+fi
+
+# Replaces the live rows in one transaction and retires cached AI results that read them
+"${PSQL[@]}" -q -c "SELECT refill_from_shadow('side_site_scores');" > /dev/null
+"${PSQL[@]}" -q -c "ANALYZE side_site_scores;"
+
+echo ""
+echo "==> Done. /api/side_sites now reads side_site_scores."
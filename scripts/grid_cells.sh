@@ -0,0 +1,47 @@
+# LandOS — Grid cells shared by the parallel build scripts
+# Sourced (not run) by build_parcel_keys.sh, build_parcel_adjacency.sh,
+# build_parcel_context.sh and build_side_site_scores.sh, after they set PSQL.
+#
+# The full rebuilds split Dublin into GRID x GRID cells and give each cell the
+# parcels whose centroid falls in it, so parallel psql sessions never write the
+# same row. Two rules make that a partition:
+#   - the outer cells run to the edge of the world (±180/±90): the ingester keeps
+#     every parcel that touches the Dublin bbox, including those centred outside it
+#   - a cell is a half-open box (west/south edges in, east/north edges out), so a
+#     centroid on a shared edge belongs to exactly one cell
+
+# Dublin bounding box (matches scripts/load_data.sh)
+DUBLIN_W=-6.45
+DUBLIN_S=53.22
+DUBLIN_E=-6.05
+DUBLIN_N=53.45
+GRID="${GRID:-8}"
+PARALLEL="${PARALLEL:-4}"
+
+# Prints one "W S E N" line per grid cell, for xargs to fan out
+grid_cells() {
+  python3 - "$GRID" "$DUBLIN_W" "$DUBLIN_S" "$DUBLIN_E" "$DUBLIN_N" <<'PY'
+import sys
+grid = int(sys.argv[1])
+w, s, e, n = map(float, sys.argv[2:6])
+xs = [w + i * (e - w) / grid for i in range(grid + 1)]
+ys = [s + j * (n - s) / grid for j in range(grid + 1)]
+xs[0], xs[-1], ys[0], ys[-1] = -180, 180, -90, 90
+for i in range(grid):
+    for j in range(grid):
+        print(f"{xs[i]} {ys[j]} {xs[i + 1]} {ys[j + 1]}")
+PY
+}
+
+# Installs in_grid_cell(point, cell): is the point inside the cell's half-open box?
+# Only the cell's bounding box counts, so an incremental refresh over a buffered
+# area covers that area's box; its delete and refill use the same test.
+install_grid_cell_sql() {
+  "${PSQL[@]}" -q <<'SQL'
+CREATE OR REPLACE FUNCTION in_grid_cell(p_point geometry, p_cell geometry)
+RETURNS BOOLEAN AS $fn$
+  SELECT ST_X(p_point) >= ST_XMin(p_cell) AND ST_X(p_point) < ST_XMax(p_cell)
+     AND ST_Y(p_point) >= ST_YMin(p_cell) AND ST_Y(p_point) < ST_YMax(p_cell)
+$fn$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+SQL
+}
@@ -4,7 +4,8 @@
 #
 # Prerequisites:
 #   - Docker PostGIS running: docker compose up -d
-#   - ogr2ogr (GDAL) installed: brew install gdal
+#   - ogr2ogr (GDAL) installed: brew install gdal (planning/RZLT shapefiles)
+#   - Backend Python dependencies: pip install -r backend/requirements.txt (GML ingester)
 #   - GML file present at ./CP_IE_TE_CadastralParcelsFreehold.gml
 
 set -e
@@ -45,39 +46,19 @@ done
 echo "==> Enabling PostGIS extension..."
 PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -c "CREATE EXTENSION IF NOT EXISTS postgis;"
 
-echo "==> Dropping existing table if present..."
-PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -c "DROP TABLE IF EXISTS cadastral_freehold CASCADE;"
-
-echo "==> Loading GML into PostGIS (this will take several minutes for the 7GB file)..."
-PGPASSWORD="$DB_PASS" ogr2ogr \
-  -f "PostgreSQL" \
-  "PG:$PG_DSN" \
-  "$GML_FILE" \
-  -nln cadastral_freehold \
-  -lco SPATIAL_INDEX=YES \
-  -lco GEOMETRY_NAME=geom \
-  -t_srs EPSG:4326 \
-  -progress
-
-echo "==> Clipping to Dublin bounding box..."
-PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-DELETE FROM cadastral_freehold
-WHERE NOT ST_Intersects(
-  geom,
-  ST_MakeEnvelope($DUBLIN_W, $DUBLIN_S, $DUBLIN_E, $DUBLIN_N, 4326)
-);
-SQL
-
-echo "==> Adding area_sqm column (accurate area in Irish Transverse Mercator)..."
-PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-ALTER TABLE cadastral_freehold ADD COLUMN IF NOT EXISTS area_sqm DOUBLE PRECISION;
-UPDATE cadastral_freehold SET area_sqm = ST_Area(ST_Transform(geom, 2157));
-SQL
+# Every table below is built as shadow.<table> and swapped in when complete, so the
+# running API keeps serving the previous data for the whole reload
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare
 
-echo "==> Ensuring spatial index..."
-PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-CREATE INDEX IF NOT EXISTS idx_cadastral_freehold_geom ON cadastral_freehold USING GIST(geom);
-SQL
+echo "==> Streaming GML into PostGIS (clipped to Dublin while parsing; resumes if interrupted)..."
+# Parses, clips and COPYs in parallel into shadow.cadastral_freehold and indexes it
+# (backend/ingest_cadastral.py); it is swapped in at the end, once its keys, copies
+# and derived tables are built
+(cd "$PROJECT_ROOT/backend" && DATABASE_URL="$PG_DSN" python3 ingest_cadastral.py "$GML_FILE" \
+  --table cadastral_freehold \
+  --extent $DUBLIN_W $DUBLIN_S $DUBLIN_E $DUBLIN_N \
+  --workers "${INGEST_WORKERS:-4}" \
+  --no-swap)
 
 echo "==> Creating layers metadata table..."
 PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
@@ -88,19 +69,37 @@ CREATE TABLE IF NOT EXISTS layers (
   table_name TEXT NOT NULL,
   is_active BOOLEAN DEFAULT true,
   min_zoom INTEGER DEFAULT 15,
-  style JSONB
+  style JSONB,
+  id_column TEXT DEFAULT 'ogc_fid',
+  tile_columns TEXT[],
+  data_version INTEGER NOT NULL DEFAULT 1,
+  change_version INTEGER NOT NULL DEFAULT 0,
+  generalized_zooms INTEGER[]
 );
 
-INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+-- Tile metadata: feature id column + properties encoded into vector tiles
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS id_column TEXT DEFAULT 'ogc_fid';
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS tile_columns TEXT[];
+-- Bumped on every reload of the layer's table; the API's tile cache is keyed on it
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS data_version INTEGER NOT NULL DEFAULT 1;
+-- Bumped when scripts/refresh_planning.sh merges changed rows in place (tiles are invalidated per change)
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS change_version INTEGER NOT NULL DEFAULT 0;
+-- Zoom levels with a simplified <table>_z<zoom> copy (scripts/build_generalized.sh)
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS generalized_zooms INTEGER[];
+
+INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
 VALUES (
   'cadastral_freehold',
   'Cadastral Parcels (Freehold)',
   'cadastral_freehold',
   true,
-  15,
-  '{"fillColor": "rgba(255,165,0,0.15)", "strokeColor": "#ff8c00", "strokeWidth": 1}'
+  14,
+  '{"fillColor": "rgba(255,165,0,0.15)", "strokeColor": "#ff8c00", "strokeWidth": 1}',
+  'ogc_fid',
+  ARRAY['nationalcadastralreference', 'gml_id', 'area_sqm']
 )
-ON CONFLICT (name) DO NOTHING;
+ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+  min_zoom = EXCLUDED.min_zoom, data_version = layers.data_version + 1;
 SQL
 
 # ── DLR Planning Applications ─────────────────────────────────────────────────
@@ -109,8 +108,7 @@ DLR_POINTS="$PROJECT_ROOT/dlrplanningapps/DLR_PlanningAppsPoints.shp"
 
 if [ -f "$DLR_POLY" ]; then
   echo "==> Loading DLR Planning Applications (Polygons)..."
-  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
-    -c "DROP TABLE IF EXISTS dlr_planning_polygons CASCADE;"
+  bash "$SCRIPT_DIR/shadow_tables.sh" prepare dlr_planning_polygons
 
   PGPASSWORD="$DB_PASS" ogr2ogr \
     -f "PostgreSQL" \
@@ -118,25 +116,31 @@ if [ -f "$DLR_POLY" ]; then
     "$DLR_POLY" \
     -nln dlr_planning_polygons \
     -nlt PROMOTE_TO_MULTI \
+    -lco SCHEMA=shadow \
     -lco GEOMETRY_NAME=geom \
     -t_srs EPSG:4326 \
     -s_srs EPSG:2157 \
     -progress
 
   echo "    Indexing and registering layer..."
+  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+    -c "CREATE INDEX IF NOT EXISTS idx_dlr_planning_poly_geom ON shadow.dlr_planning_polygons USING GIST(geom);"
+  bash "$SCRIPT_DIR/shadow_tables.sh" swap dlr_planning_polygons
   PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-  CREATE INDEX IF NOT EXISTS idx_dlr_planning_poly_geom ON dlr_planning_polygons USING GIST(geom);
 
-  INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+  INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
   VALUES (
     'dlr_planning_polygons',
     'DLR Planning Apps (Areas)',
     'dlr_planning_polygons',
     true,
     13,
-    '{"fillColor": "rgba(46,204,113,0.2)", "strokeColor": "#2ecc71", "strokeWidth": 1.5}'
+    '{"fillColor": "rgba(46,204,113,0.2)", "strokeColor": "#2ecc71", "strokeWidth": 1.5}',
+    'ogc_fid',
+    ARRAY['plan_ref', 'decision', 'stage', 'descrptn', 'location', 'reg_date', 'dec_date']
   )
-  ON CONFLICT (name) DO NOTHING;
+  ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+    data_version = layers.data_version + 1;
 SQL
   echo "    Loaded $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM dlr_planning_polygons;") polygon features."
 else
@@ -145,14 +149,14 @@ fi
 
 if [ -f "$DLR_POINTS" ]; then
   echo "==> Loading DLR Planning Applications (Points)..."
-  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
-    -c "DROP TABLE IF EXISTS dlr_planning_points CASCADE;"
+  bash "$SCRIPT_DIR/shadow_tables.sh" prepare dlr_planning_points
 
   PGPASSWORD="$DB_PASS" ogr2ogr \
     -f "PostgreSQL" \
     "PG:$PG_DSN" \
     "$DLR_POINTS" \
     -nln dlr_planning_points \
+    -lco SCHEMA=shadow \
     -lco SPATIAL_INDEX=YES \
     -lco GEOMETRY_NAME=geom \
     -t_srs EPSG:4326 \
@@ -160,19 +164,24 @@ if [ -f "$DLR_POINTS" ]; then
     -progress
 
   echo "    Indexing and registering layer..."
+  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+    -c "CREATE INDEX IF NOT EXISTS idx_dlr_planning_pts_geom ON shadow.dlr_planning_points USING GIST(geom);"
+  bash "$SCRIPT_DIR/shadow_tables.sh" swap dlr_planning_points
   PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-  CREATE INDEX IF NOT EXISTS idx_dlr_planning_pts_geom ON dlr_planning_points USING GIST(geom);
 
-  INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+  INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
   VALUES (
     'dlr_planning_points',
     'DLR Planning Apps (Points)',
     'dlr_planning_points',
     true,
     12,
-    '{"fillColor": "#27ae60", "strokeColor": "#1e8449", "radius": 5}'
+    '{"fillColor": "#27ae60", "strokeColor": "#1e8449", "radius": 5}',
+    'ogc_fid',
+    ARRAY['plan_ref', 'decision', 'stage', 'descrptn', 'location', 'reg_date', 'dec_date']
   )
-  ON CONFLICT (name) DO NOTHING;
+  ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+    data_version = layers.data_version + 1;
 SQL
   echo "    Loaded $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM dlr_planning_points;") point features."
 else
@@ -182,9 +191,9 @@ fi
 # ── Sold Properties (from MongoDB) ────────────────────────────────────────────
 echo "==> Loading Sold Properties from MongoDB..."
 if docker ps --format '{{.Names}}' | grep -q mongodb-local; then
+  bash "$SCRIPT_DIR/shadow_tables.sh" prepare sold_properties
   PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-  DROP TABLE IF EXISTS sold_properties CASCADE;
-  CREATE TABLE sold_properties (
+  CREATE TABLE shadow.sold_properties (
     id SERIAL PRIMARY KEY,
     mongo_id TEXT,
     address TEXT,
@@ -200,7 +209,6 @@ if docker ps --format '{{.Names}}' | grep -q mongodb-local; then
     url TEXT,
     geom GEOMETRY(Point, 4326)
   );
-  CREATE INDEX idx_sold_properties_geom ON sold_properties USING GIST(geom);
 SQL
 
   # Export from MongoDB and load into PostGIS
@@ -237,19 +245,27 @@ print(f'Exported {len(docs)} sold properties')
   "
 
   PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
-    -c "\COPY sold_properties(mongo_id,address,sale_price,asking_price,beds,baths,property_type,energy_rating,agent_name,sale_date,floor_area_m2,url,geom) FROM '/tmp/sold_properties.tsv' WITH (FORMAT text, NULL '')"
+    -c "\COPY shadow.sold_properties(mongo_id,address,sale_price,asking_price,beds,baths,property_type,energy_rating,agent_name,sale_date,floor_area_m2,url,geom) FROM '/tmp/sold_properties.tsv' WITH (FORMAT text, NULL '')"
+
+  # Index after the bulk COPY, then swap in
+  PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+    -c "CREATE INDEX idx_sold_properties_geom ON shadow.sold_properties USING GIST(geom);"
+  bash "$SCRIPT_DIR/shadow_tables.sh" swap sold_properties
 
   PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-  INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+  INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
   VALUES (
     'sold_properties',
     'Sold Properties',
     'sold_properties',
     true,
     13,
-    '{"fillColor": "#e74c3c", "strokeColor": "#c0392b", "radius": 5}'
+    '{"fillColor": "#e74c3c", "strokeColor": "#c0392b", "radius": 5}',
+    'id',
+    ARRAY['address', 'sale_price', 'asking_price', 'beds', 'baths', 'property_type', 'sale_date', 'floor_area_m2']
   )
-  ON CONFLICT (name) DO NOTHING;
+  ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+    data_version = layers.data_version + 1;
 SQL
   echo "    Loaded $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM sold_properties;") sold properties."
 else
@@ -258,18 +274,65 @@ fi
 
 # ── Register RZLT layer (off by default — toggle on via UI) ──────────────────
 PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
 VALUES (
   'rzlt',
   'RZLT Sites (Residential Zoned Land Tax)',
   'rzlt',
   false,
   10,
-  '{"fillColor": "rgba(255,0,0,0.2)", "strokeColor": "#ff0000", "strokeWidth": 2}'
+  '{"fillColor": "rgba(255,0,0,0.2)", "strokeColor": "#ff0000", "strokeWidth": 2}',
+  'ogc_fid',
+  ARRAY['zone_desc', 'zone_gzt', 'gzt_desc', 'site_area', 'local_authority_name']
 )
-ON CONFLICT (name) DO UPDATE SET is_active = false;
+ON CONFLICT (name) DO UPDATE SET is_active = false,
+  id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns;
 SQL
 
+# ── Register leasehold parcels (only if the table has been loaded) ───────────
+PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
+INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
+SELECT
+  'cadastral_leasehold',
+  'Cadastral Parcels (Leasehold)',
+  'cadastral_leasehold',
+  true,
+  14,
+  '{"fillColor": "rgba(100,149,237,0.15)", "strokeColor": "#6495ed", "strokeWidth": 1}',
+  'ogc_fid',
+  ARRAY['nationalcadastralreference', 'gml_id', 'area_sqm']
+WHERE to_regclass('public.cadastral_leasehold') IS NOT NULL
+ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+  min_zoom = EXCLUDED.min_zoom;
+SQL
+
+# ── Indexed ITM geometry for metre-based radius queries ──────────────────────
+bash "$SCRIPT_DIR/add_itm_geometry.sh" cadastral_freehold cadastral_leasehold sold_properties \
+  dlr_planning_polygons dlr_planning_points rzlt
+
+# ── Generalized parcel geometry for low zooms ────────────────────────────────
+bash "$SCRIPT_DIR/build_generalized.sh" cadastral_leasehold
+
+# ── Census / RZLT / urban-area keys on every parcel ──────────────────────────
+# Live leasehold keys are refreshed in place (unchanged rows are not rewritten).
+# Keys and generalized copies of the reloaded freehold table are built on the
+# shadow table, so the cadastral_freehold that goes live already has them (AI SQL
+# and the assemblage RZLT filter join on the keys; low-zoom tiles read the _z copies)
+bash "$SCRIPT_DIR/build_parcel_keys.sh" leasehold
+bash "$SCRIPT_DIR/build_parcel_keys.sh" --schema shadow freehold
+bash "$SCRIPT_DIR/build_generalized.sh" --schema shadow cadastral_freehold
+
+# ── Derived parcel tables ────────────────────────────────────────────────────
+# Parcel enrichment (/api/parcel/{id}/enriched), the adjacency graph (neighbours,
+# assemblages) and side-site scores (/api/side_sites) are keyed on ogc_fid, so
+# they are built in shadow from shadow.cadastral_freehold and go live in the same
+# transaction as the table whose ids they hold
+bash "$SCRIPT_DIR/build_parcel_context.sh" --schema shadow
+bash "$SCRIPT_DIR/build_parcel_adjacency.sh" --schema shadow
+bash "$SCRIPT_DIR/build_side_site_scores.sh" --schema shadow
+bash "$SCRIPT_DIR/shadow_tables.sh" swap cadastral_freehold \
+  --with parcel_context parcel_adjacency side_site_scores
+
 echo ""
 echo "==> Done! Summary:"
 PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
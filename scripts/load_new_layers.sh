@@ -38,37 +38,43 @@ for i in $(seq 1 20); do
   sleep 3
 done
 
+# Tables are built as shadow.<table> and swapped in when complete (scripts/shadow_tables.sh)
+bash "$SCRIPT_DIR/shadow_tables.sh" prepare sd_lap_boundaries sd_planning_register
+
 # ── 1. South Dublin LAP Boundaries ───────────────────────────────────────────
 echo ""
 echo "==> Loading South Dublin LAP Boundaries (15 features)..."
 
-PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
-  -c "DROP TABLE IF EXISTS sd_lap_boundaries CASCADE;"
-
 PGPASSWORD="$DB_PASS" ogr2ogr \
   -f "PostgreSQL" \
   "PG:$PG_DSN" \
   "$LAP_GEOJSON" \
   -nln sd_lap_boundaries \
   -nlt PROMOTE_TO_MULTI \
+  -lco SCHEMA=shadow \
   -lco GEOMETRY_NAME=geom \
   -t_srs EPSG:4326 \
   -progress
 
 echo "    Indexing and registering layer..."
+PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+  -c "CREATE INDEX IF NOT EXISTS idx_sd_lap_geom ON shadow.sd_lap_boundaries USING GIST(geom);"
+bash "$SCRIPT_DIR/shadow_tables.sh" swap sd_lap_boundaries
 PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-CREATE INDEX IF NOT EXISTS idx_sd_lap_geom ON sd_lap_boundaries USING GIST(geom);
 
-INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
 VALUES (
   'sd_lap_boundaries',
   'SD Local Area Plans',
   'sd_lap_boundaries',
   false,
   9,
-  '{"fillColor": "rgba(155,89,182,0.1)", "strokeColor": "#9b59b6", "strokeWidth": 2}'
+  '{"fillColor": "rgba(155,89,182,0.1)", "strokeColor": "#9b59b6", "strokeWidth": 2}',
+  'ogc_fid',
+  ARRAY['objective', 'map_number', 'feature_type1', 'hyperlink']
 )
-ON CONFLICT (name) DO NOTHING;
+ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+  data_version = layers.data_version + 1;
 SQL
 
 echo "    Loaded $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM sd_lap_boundaries;") LAP boundary features."
@@ -77,37 +83,40 @@ echo "    Loaded $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$D
 echo ""
 echo "==> Loading South Dublin Planning Register (~32k features — may take a minute)..."
 
-PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
-  -c "DROP TABLE IF EXISTS sd_planning_register CASCADE;"
-
 PGPASSWORD="$DB_PASS" ogr2ogr \
   -f "PostgreSQL" \
   "PG:$PG_DSN" \
   "$PLANNING_GEOJSON" \
   -nln sd_planning_register \
   -nlt PROMOTE_TO_MULTI \
+  -lco SCHEMA=shadow \
   -lco GEOMETRY_NAME=geom \
   -t_srs EPSG:4326 \
   -progress
 
 echo "    Indexing and registering layer..."
+PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+  -c "CREATE INDEX IF NOT EXISTS idx_sd_planning_geom ON shadow.sd_planning_register USING GIST(geom);"
+bash "$SCRIPT_DIR/shadow_tables.sh" swap sd_planning_register
 PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" <<SQL
-CREATE INDEX IF NOT EXISTS idx_sd_planning_geom ON sd_planning_register USING GIST(geom);
 
-INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style)
+INSERT INTO layers (name, display_name, table_name, is_active, min_zoom, style, id_column, tile_columns)
 VALUES (
   'sd_planning_register',
   'SD Planning Register',
   'sd_planning_register',
   true,
   13,
-  '{"fillColor": "rgba(230,126,34,0.2)", "strokeColor": "#e67e22", "strokeWidth": 1.5}'
+  '{"fillColor": "rgba(230,126,34,0.2)", "strokeColor": "#e67e22", "strokeWidth": 1.5}',
+  'ogc_fid',
+  ARRAY['ref', 'regref', 'location', 'applicantname', 'status']
 )
-ON CONFLICT (name) DO NOTHING;
+ON CONFLICT (name) DO UPDATE SET id_column = EXCLUDED.id_column, tile_columns = EXCLUDED.tile_columns,
+  data_version = layers.data_version + 1;
 SQL
 
 echo "    Loaded $(PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM sd_planning_register;") SD planning register features."
 
 echo ""
-echo "==> Done! Restart the API server to pick up the new endpoints."
-echo "    cd backend && python main.py"
+echo "==> Done! The running API served the previous data until each swap and picks up"
+echo "    the reloaded layers within 30s (data_version was bumped, so cached tiles are invalidated)."
@@ -0,0 +1,81 @@
+#!/usr/bin/env bash
+# LandOS — Incremental refresh of the planning application registers
+# Run from the project root: bash scripts/refresh_planning.sh
+#
+# Loads each planning file present into shadow.<table>, then backend/ingest_planning.py
+# merges only new, changed and withdrawn applications (matched on plan_ref/regref) into
+# the live table, logs them in planning_changes, and invalidates just the tiles and
+# parcel_context/side_site_scores rows around them. If the file's columns no longer
+# match the live table, the table is swapped in whole instead (shadow_tables.sh swap).
+# The layers must already be registered by load_data.sh / load_new_layers.sh.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+#   - ogr2ogr (GDAL) installed: brew install gdal
+#   - Backend Python dependencies: pip install -r backend/requirements.txt
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(dirname "$SCRIPT_DIR")"
+
+DLR_POLY="$PROJECT_ROOT/dlrplanningapps/DLR_PlanningAppsPolygons.shp"
+DLR_POINTS="$PROJECT_ROOT/dlrplanningapps/DLR_PlanningAppsPoints.shp"
+PLANNING_GEOJSON="$PROJECT_ROOT/Planning_Register_911171319511293550.geojson"
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+PG_DSN="host=$DB_HOST port=$DB_PORT dbname=$DB_NAME user=$DB_USER password=$DB_PASS"
+
+# Must match SCHEMA_CHANGED_EXIT in backend/ingest_planning.py
+SCHEMA_CHANGED_EXIT=3
+
+# refresh_table <file> <table> <key> [ogr2ogr options...]
+refresh_table() {
+  local file="$1" table="$2" key="$3"
+  shift 3
+  if [ ! -f "$file" ]; then
+    echo "==> Skipping $table ($(basename "$file") not found)"
+    return
+  fi
+
+  echo "==> Loading $(basename "$file") into shadow.$table..."
+  bash "$SCRIPT_DIR/shadow_tables.sh" prepare "$table"
+  PGPASSWORD="$DB_PASS" ogr2ogr \
+    -f "PostgreSQL" \
+    "PG:$PG_DSN" \
+    "$file" \
+    -nln "$table" \
+    -lco SCHEMA=shadow \
+    -lco GEOMETRY_NAME=geom \
+    -t_srs EPSG:4326 \
+    "$@" \
+    -progress
+
+  local status=0
+  (cd "$PROJECT_ROOT/backend" && DATABASE_URL="$PG_DSN" python3 ingest_planning.py --table "$table" --key "$key") || status=$?
+  if [ "$status" -eq "$SCHEMA_CHANGED_EXIT" ]; then
+    PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" \
+      -c "CREATE INDEX IF NOT EXISTS idx_${table}_geom ON shadow.$table USING GIST(geom);"
+    bash "$SCRIPT_DIR/shadow_tables.sh" swap "$table"
+  elif [ "$status" -ne 0 ]; then
+    exit "$status"
+  fi
+}
+
+refresh_table "$DLR_POLY" dlr_planning_polygons plan_ref -nlt PROMOTE_TO_MULTI -s_srs EPSG:2157
+refresh_table "$DLR_POINTS" dlr_planning_points plan_ref -s_srs EPSG:2157
+refresh_table "$PLANNING_GEOJSON" sd_planning_register regref -nlt PROMOTE_TO_MULTI
+
+echo ""
+echo "==> Planning refresh complete. Recent changes:"
+PGPASSWORD="$DB_PASS" psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -c "
+  SELECT table_name, change, COUNT(*) AS applications
+  FROM planning_changes
+  WHERE changed_at > now() - interval '1 hour'
+  GROUP BY table_name, change
+  ORDER BY table_name, change;
+" 2>/dev/null || true
@@ -0,0 +1,204 @@
+#!/usr/bin/env bash
+# LandOS — Blue/green table reloads through a shadow schema
+# Run from the project root:
+#   bash scripts/shadow_tables.sh prepare [table ...]   # install swap functions, empty shadow.<table>
+#   bash scripts/shadow_tables.sh swap table [...] [--with derived ...]
+#                                                       # index + analyze shadow.<table>, swap it in
+#   bash scripts/shadow_tables.sh bump table [...]      # bump a derived table's table_versions row
+#
+# Loaders build each reloaded table as shadow.<table> while the API keeps serving
+# public.<table>. `swap` adds the indexed geom_itm column (as add_itm_geometry.sh
+# would), runs ANALYZE, then calls swap_shadow_table(), which in one transaction
+# drops public.<table>, moves shadow.<table> into public -- along with any
+# generalized shadow.<table>_z<zoom> copies built from it -- and bumps the layer's
+# data_version. Queries see the old table or the new one, never a missing or
+# half-loaded one; the API's registry picks the new data_version up within 30s,
+# which retires cached tiles and AI results for the old data without a restart.
+# Derived columns (parcel keys) and generalized copies are built against the
+# shadow table before the swap, so the table that goes live is already complete:
+#   bash scripts/build_parcel_keys.sh --schema shadow freehold
+#   bash scripts/build_generalized.sh --schema shadow cadastral_freehold
+#
+# Derived tables outside the layers registry (parcel_context, parcel_adjacency,
+# side_site_scores) are rebuilt whole into shadow.<table>, then
+# refill_from_shadow() replaces the live rows with them in one transaction and
+# bumps the table's table_versions row, which retires cached AI results that read
+# it. The live table is refilled rather than replaced because SQL functions
+# return its row type. Built with --schema shadow, they read the reloaded
+# shadow.cadastral_* tables, and `swap --with` refills them in the same
+# transaction that swaps the cadastral table in, so no parcel id is ever served
+# against the wrong table:
+#   bash scripts/build_parcel_context.sh --schema shadow
+#   bash scripts/shadow_tables.sh swap cadastral_freehold --with parcel_context
+# Incremental (--area) refreshes update the live table and call `bump`.
+#
+# Prerequisites:
+#   - Docker PostGIS running: docker compose up -d
+
+set -e
+
+DB_HOST="${DB_HOST:-localhost}"
+DB_PORT="${DB_PORT:-5433}"
+DB_NAME="${DB_NAME:-landos}"
+DB_USER="${DB_USER:-postgres}"
+DB_PASS="${DB_PASS:-postgres}"
+export PGPASSWORD="$DB_PASS"
+PSQL=(psql -h "$DB_HOST" -p "$DB_PORT" -U "$DB_USER" -d "$DB_NAME" -v ON_ERROR_STOP=1)
+
+# How long the swap waits for in-flight API queries to release the live table
+SWAP_LOCK_TIMEOUT="${SWAP_LOCK_TIMEOUT:-30s}"
+
+COMMAND="$1"
+shift || true
+
+case "$COMMAND" in
+  prepare)
+    "${PSQL[@]}" -q <<'SQL'
+CREATE SCHEMA IF NOT EXISTS shadow;
+
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 1,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- The table a build reads p_table from: the reloaded copy in p_schema if one is
+-- waiting there, else the live one
+CREATE OR REPLACE FUNCTION input_table(p_schema TEXT, p_table TEXT)
+RETURNS TEXT AS $fn$
+  SELECT format('%I.%I', CASE WHEN to_regclass(format('%I.%I', p_schema, p_table)) IS NOT NULL
+                              THEN p_schema ELSE 'public' END, p_table)
+$fn$ LANGUAGE sql STABLE;
+
+-- Replaces the rows of public.<p_table> with those of shadow.<p_table> and bumps its
+-- table_versions row; readers see the old rows until the caller's transaction commits
+CREATE OR REPLACE FUNCTION refill_from_shadow(p_table TEXT)
+RETURNS BIGINT AS $fn$
+DECLARE
+  n BIGINT;
+BEGIN
+  IF to_regclass(format('shadow.%I', p_table)) IS NULL THEN
+    RAISE EXCEPTION 'shadow.% has not been built', p_table;
+  END IF;
+  EXECUTE format('DELETE FROM public.%I', p_table);
+  EXECUTE format('INSERT INTO public.%I SELECT * FROM shadow.%I', p_table, p_table);
+  GET DIAGNOSTICS n = ROW_COUNT;
+  EXECUTE format('DROP TABLE shadow.%I', p_table);
+  INSERT INTO table_versions (table_name) VALUES (p_table)
+  ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1, updated_at = now();
+  RETURN n;
+END;
+$fn$ LANGUAGE plpgsql;
+
+-- Replaces public.<p_table> with shadow.<p_table> atomically; returns the new data_version
+CREATE OR REPLACE FUNCTION swap_shadow_table(p_table TEXT)
+RETURNS INTEGER AS $fn$
+DECLARE
+  version INTEGER;
+  gz_table TEXT;
+BEGIN
+  IF to_regclass(format('shadow.%I', p_table)) IS NULL THEN
+    RAISE EXCEPTION 'shadow.% has not been built', p_table;
+  END IF;
+  EXECUTE format('DROP TABLE IF EXISTS public.%I CASCADE', p_table);
+  EXECUTE format('ALTER TABLE shadow.%I SET SCHEMA public', p_table);
+  -- Generalized copies built from the shadow table (build_generalized.sh --schema shadow)
+  FOR gz_table IN
+    SELECT tablename FROM pg_tables
+    WHERE schemaname = 'shadow' AND tablename ~ ('^' || p_table || '_z[0-9]+$')
+  LOOP
+    EXECUTE format('DROP TABLE IF EXISTS public.%I', gz_table);
+    EXECUTE format('ALTER TABLE shadow.%I SET SCHEMA public', gz_table);
+  END LOOP;
+  -- A finished ingest (backend/ingest_cadastral.py) has nothing left to resume
+  IF to_regclass('public.ingest_checkpoint') IS NOT NULL THEN
+    DELETE FROM ingest_checkpoint WHERE target = p_table;
+  END IF;
+  IF to_regclass('public.layers') IS NOT NULL THEN
+    UPDATE layers SET data_version = data_version + 1 WHERE table_name = p_table
+    RETURNING data_version INTO version;
+  END IF;
+  RETURN version;
+END;
+$fn$ LANGUAGE plpgsql;
+SQL
+    for TABLE in "$@"; do
+      "${PSQL[@]}" -q <<SQL
+DROP TABLE IF EXISTS shadow.$TABLE CASCADE;
+DO \$\$
+DECLARE
+  gz_table TEXT;
+BEGIN
+  -- Leftover generalized copies from an earlier, unfinished reload
+  FOR gz_table IN
+    SELECT tablename FROM pg_tables WHERE schemaname = 'shadow' AND tablename ~ '^${TABLE}_z[0-9]+\$'
+  LOOP
+    EXECUTE format('DROP TABLE shadow.%I', gz_table);
+  END LOOP;
+END \$\$;
+SQL
+    done
+    ;;
+
+  swap)
+    TABLES=()
+    while [ $# -gt 0 ] && [ "$1" != "--with" ]; do
+      TABLES+=("$1")
+      shift
+    done
+    shift || true
+    DERIVED=("$@")
+
+    for TABLE in "${TABLES[@]}"; do
+      echo "==> Indexing shadow.$TABLE..."
+      "${PSQL[@]}" -q <<SQL
+DO \$\$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'shadow' AND table_name = '$TABLE' AND column_name = 'geom'
+  ) THEN
+    ALTER TABLE shadow.$TABLE
+      ADD COLUMN IF NOT EXISTS geom_itm geometry(Geometry, 2157)
+      GENERATED ALWAYS AS (ST_Transform(geom, 2157)) STORED;
+    CREATE INDEX IF NOT EXISTS idx_${TABLE}_geom_itm ON shadow.$TABLE USING GIST (geom_itm);
+  END IF;
+END \$\$;
+ANALYZE shadow.$TABLE;
+SQL
+    done
+
+    # Derived tables first: the cadastral swap takes the exclusive lock, so it goes last
+    echo "==> Swapping in ${TABLES[*]}${DERIVED[*]:+ with ${DERIVED[*]}}..."
+    {
+      echo "BEGIN;"
+      echo "SET LOCAL lock_timeout = '$SWAP_LOCK_TIMEOUT';"
+      for TABLE in "${DERIVED[@]}"; do
+        echo "SELECT refill_from_shadow('$TABLE');"
+      done
+      for TABLE in "${TABLES[@]}"; do
+        echo "SELECT swap_shadow_table('$TABLE');"
+      done
+      echo "COMMIT;"
+    } | "${PSQL[@]}" -q > /dev/null
+    ;;
+
+  bump)
+    for TABLE in "$@"; do
+      "${PSQL[@]}" -q <<SQL
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 1,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+INSERT INTO table_versions (table_name) VALUES ('$TABLE')
+ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1, updated_at = now();
+SQL
+    done
+    ;;
+
+  *)
+    echo "Usage: bash scripts/shadow_tables.sh prepare [table ...] | swap table [...] [--with derived ...] | bump table [...]"
+    exit 1
+    ;;
+esac